@@ -15,5 +15,17 @@ set -e
 python manage.py migrate
 set +e
 
-echo "Starting Django API with Gunicorn..."
+# Sem comando: o servidor de PDV_SERVIDOR (pdv_project/settings.py); workers em WEB_CONCURRENCY
+# No gunicorn, workers com threads (WEB_THREADS por worker): cada conexão de eventos (SSE)
+# aberta ocupa uma thread, e com workers síncronos um caixa conectado prenderia o worker inteiro
+if [ "$#" -eq 0 ]; then
+  if [ "$PDV_SERVIDOR" = "asgi" ]; then
+    set -- uvicorn pdv_project.asgi:application --host 0.0.0.0 --port 8000 --lifespan off
+  else
+    set -- gunicorn pdv_project.wsgi:application --bind 0.0.0.0:8000 \
+      --worker-class gthread --threads "${WEB_THREADS:-32}"
+  fi
+fi
+
+echo "Starting Django API: $1..."
 exec "$@"
\ No newline at end of file
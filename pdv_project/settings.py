@@ -1,8 +1,10 @@
 import os, datetime
+from decimal import Decimal
 from pathlib import Path
-from decouple import RepositoryEnv, Config
+from decouple import RepositoryEnv, Config, config as config_ambiente
 
-config = Config(RepositoryEnv('.env', encoding='latin-1'))
+# .env (modelo em .env.example) não vai para o git nem para a imagem: sem ele, só as variáveis de ambiente
+config = Config(RepositoryEnv('.env', encoding='latin-1')) if os.path.exists('.env') else config_ambiente
 
 DEBUG = config('DEBUG', default=False, cast=bool)
 SECRET_KEY = config('SECRET_KEY')
@@ -21,6 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework_simplejwt.token_blacklist',
     'rest_framework',
     'vendas',
@@ -34,12 +37,13 @@ SIMPLE_JWT = {
 }
 
 REST_FRAMEWORK = {
+    # orjson quando instalado (vendas/renderers.py); a API navegável só em desenvolvimento
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'vendas.renderers.JSONRapidoRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'vendas.parsers.JSONRapidoParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
@@ -51,10 +55,19 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Paginação por chave das listagens do PDV (vendas.pagination.KeysetPagination)
+PDV_PAGINACAO_TAMANHO = config('PDV_PAGINACAO_TAMANHO', default=50, cast=int)
+PDV_PAGINACAO_MAXIMO = config('PDV_PAGINACAO_MAXIMO', default=500, cast=int)
+
+# Máximo de vendas por envio em /api/pdv/vendas/lote/
+PDV_INGESTAO_LIMITE = config('PDV_INGESTAO_LIMITE', default=1000, cast=int)
+# Diferença aceita entre o preço informado pelo terminal e o do produto (fração: 0.05 = 5%)
+PDV_INGESTAO_TOLERANCIA_PRECO = config('PDV_INGESTAO_TOLERANCIA_PRECO', default='0', cast=Decimal)
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'vendas.middleware.ArquivosEstaticosMiddleware',  # WhiteNoise, também assíncrono
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -83,20 +96,84 @@ TEMPLATES = [
 WSGI_APPLICATION = 'pdv_project.wsgi.application'
 
 
+# Servidor da aplicação (entrypoint.sh): 'wsgi' roda o gunicorn com pdv_project.wsgi; 'asgi' roda o
+# uvicorn com pdv_project.asgi, e as actions assíncronas (vendas/assincrono.py) esperam o banco sem
+# ocupar uma thread. Os workers vêm de WEB_CONCURRENCY nos dois; no gunicorn, WEB_THREADS threads por worker.
+PDV_SERVIDOR = config('PDV_SERVIDOR', default='wsgi')
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# vendas.banco: o backend PostgreSQL do Django mais o search_path do esquema de cada empresa
+# (vendas/esquemas.py). Depois do migrate, `manage.py migrar_esquemas` migra os esquemas das empresas.
+# As conexões ficam abertas entre requisições (DB_CONN_MAX_AGE segundos) e são testadas antes
+# de reusadas. Com DB_POOL_MAXIMO > 0 usa o pool de conexões do Django (psycopg 3 e psycopg_pool,
+# em requirements.txt) no lugar das conexões persistentes.
+# Sob ASGI cada requisição usa uma thread nova, e a conexão persistente dela nunca seria reusada:
+# o padrão passa a ser fechar ao fim da requisição. Como cada requisição em andamento tem a sua
+# conexão, use o pool para reaproveitá-las e limitar quantas ficam abertas (max_connections).
+DB_POOL_MAXIMO = config('DB_POOL_MAXIMO', default=0, cast=int)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'vendas.banco',
         'NAME': config('DB_NAME'),
         'USER': config('DB_USER'),
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL_MAXIMO else config('DB_CONN_MAX_AGE', default=0 if PDV_SERVIDOR == 'asgi' else 60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'pool': {'min_size': config('DB_POOL_MINIMO', default=2, cast=int), 'max_size': DB_POOL_MAXIMO}} if DB_POOL_MAXIMO else {},
     }
 }
 
+# Réplicas de leitura (vendas/roteamento.py): DB_REPLICAS=host1,host2:5433, com o mesmo banco,
+# usuário e senha do primário. Nos testes as réplicas espelham o banco de teste do primário.
+PDV_BANCOS_LEITURA = []
+for numero, endereco in enumerate(filter(None, config('DB_REPLICAS', default='').split(',')), start=1):
+    host, _, porta = endereco.strip().partition(':')
+    DATABASES[f'replica_{numero}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': porta or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    PDV_BANCOS_LEITURA.append(f'replica_{numero}')
+
+# Segundos em que um usuário que gravou continua lendo do primário
+PDV_REPLICA_FIXAR = config('PDV_REPLICA_FIXAR', default=5, cast=int)
+
+DATABASE_ROUTERS = ['vendas.esquemas.RoteadorEsquemas', 'vendas.roteamento.RoteadorLeitura']
+
+# Cache
+# Em produção use um backend compartilhado entre os workers, ex.:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache e CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='pdv'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+    }
+}
+
+# Cache de catálogo em dois níveis (vendas.cache): LRU por processo na frente do CACHES[PDV_CACHE_ALIAS].
+# O TTL local limita por quanto tempo outro worker pode ver um registro já alterado.
+PDV_CACHE_ATIVO = config('PDV_CACHE_ATIVO', default=True, cast=bool)
+PDV_CACHE_ALIAS = 'default'
+PDV_CACHE_TTL = config('PDV_CACHE_TTL', default=300, cast=int)
+PDV_CACHE_LOCAL_TTL = config('PDV_CACHE_LOCAL_TTL', default=5, cast=int)
+PDV_CACHE_LOCAL_ITENS = config('PDV_CACHE_LOCAL_ITENS', default=10000, cast=int)
+
+# Avisos de alteração do catálogo para os caixas (vendas/notificacoes.py, GET empresas/<pk>/eventos/).
+# 'postgres' usa LISTEN/NOTIFY e alcança todos os processos; 'local' só o próprio processo; vazio desliga.
+# Sob WSGI cada conexão aberta ocupa uma thread do worker (entrypoint.sh: gthread, WEB_THREADS por worker); sob ASGI, não.
+PDV_NOTIFICACOES = config('PDV_NOTIFICACOES', default='postgres')
+PDV_EVENTOS_PING = config('PDV_EVENTOS_PING', default=15, cast=int)
+PDV_EVENTOS_DURACAO = config('PDV_EVENTOS_DURACAO', default=600, cast=int)
+PDV_EVENTOS_FILA = config('PDV_EVENTOS_FILA', default=1000, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -136,6 +213,21 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Snapshots de carga inicial dos caixas satélite (gzip ou zstd, se o pacote zstandard estiver instalado)
+PDV_SNAPSHOT_DIR = config('PDV_SNAPSHOT_DIR', default=os.path.join(BASE_DIR, 'snapshots'))
+PDV_SNAPSHOT_COMPRESSAO = config('PDV_SNAPSHOT_COMPRESSAO', default='gzip')
+
+# Arquivos das exportações de vendas pedidas pela API (CSV com gzip; Parquet se o pacote pyarrow estiver instalado)
+PDV_EXPORTACAO_DIR = config('PDV_EXPORTACAO_DIR', default=os.path.join(BASE_DIR, 'exportacoes'))
+
+# PDF das faturas (vendas.documentos), gerado fora da requisição em um pool de processos.
+# PDV_DOCUMENTOS_PROCESSOS=0 gera na thread da tarefa; o certificado A1 (.pfx), se informado, assina os PDFs.
+PDV_DOCUMENTOS_ATIVO = config('PDV_DOCUMENTOS_ATIVO', default=True, cast=bool)
+PDV_DOCUMENTOS_DIR = config('PDV_DOCUMENTOS_DIR', default=os.path.join(BASE_DIR, 'documentos'))
+PDV_DOCUMENTOS_PROCESSOS = config('PDV_DOCUMENTOS_PROCESSOS', default=2, cast=int)
+PDV_DOCUMENTOS_CERTIFICADO = config('PDV_DOCUMENTOS_CERTIFICADO', default='')
+PDV_DOCUMENTOS_CERTIFICADO_SENHA = config('PDV_DOCUMENTOS_CERTIFICADO_SENHA', default='')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
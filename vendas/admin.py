@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Cliente, Produto, Venda, ItemVenda, DevolucaoItemVenda, Fatura, Usuario, Empresa, Caixa, SessaoCaixa
+from django.db.models import Q
+from django.db.models.functions import Collate, Lower
+from .models import Cliente, Produto, Venda, ItemVenda, DevolucaoItemVenda, Fatura, Usuario, Empresa, Caixa, SessaoCaixa, ReservaEstoque, ResumoPagamentoSessao, Exportacao, DocumentoFatura
 
 @admin.register(Empresa)
 class EmpresaAdmin(admin.ModelAdmin):
@@ -27,11 +29,21 @@ class ClienteAdmin(admin.ModelAdmin):
 
 @admin.register(Produto)
 class ProdutoAdmin(admin.ModelAdmin):
-    list_display = ('nome', 'preco', 'estoque', 'empresa', 'criado_em', 'atualizado_em')
-    search_fields = ('nome',)
+    list_display = ('nome', 'codigo_barras', 'preco', 'estoque', 'empresa', 'criado_em', 'atualizado_em')
+    search_fields = ('nome', 'codigo_barras')
     list_filter = ('empresa', 'criado_em')
     raw_id_fields = ('empresa',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Código exato ou prefixo do nome, em vez de ILIKE '%termo%' na tabela inteira
+        termo = search_term.strip()
+        if not termo:
+            return queryset, False
+        queryset = queryset.annotate(nome_normalizado=Collate(Lower('nome'), 'C')).filter(
+            Q(codigo_barras=termo) | Q(nome_normalizado__startswith=termo.lower())
+        )
+        return queryset, False
+
 @admin.register(Caixa)
 class CaixaAdmin(admin.ModelAdmin):
     list_display = ('nome', 'empresa', 'tipo', 'ativo', 'ip_endereco', 'porta', 'criado_em', 'atualizado_em')
@@ -49,20 +61,31 @@ class CaixaAdmin(admin.ModelAdmin):
 
 @admin.register(SessaoCaixa)
 class SessaoCaixaAdmin(admin.ModelAdmin):
-    list_display = ('uuid', 'caixa', 'vendedor', 'data_abertura', 'data_fechamento', 'esta_aberta', 'saldo_inicial', 'saldo_final')
+    list_display = ('uuid', 'caixa', 'vendedor', 'data_abertura', 'data_fechamento', 'esta_aberta', 'saldo_inicial', 'saldo_final', 'quantidade_vendas', 'total_vendas')
     list_filter = ('caixa__empresa', 'caixa', 'vendedor', 'data_abertura', 'data_fechamento')
     search_fields = ('uuid__icontains', 'caixa__nome', 'vendedor__username')
     raw_id_fields = ('caixa', 'vendedor')
-    readonly_fields = ('uuid', 'data_abertura')
+    # Totais mantidos pelas vendas; para corrigir use manage.py reconciliar_sessoes
+    readonly_fields = ('uuid', 'data_abertura', 'quantidade_vendas', 'total_vendas', 'total_devolvido', 'total_faturado')
+
+    class ResumoPagamentoInline(admin.TabularInline):
+        model = ResumoPagamentoSessao
+        extra = 0
+        fields = ('forma_pagamento', 'quantidade', 'total')
+        readonly_fields = fields
+        can_delete = False
+
+        def has_add_permission(self, request, obj=None):
+            return False
 
     class VendaInline(admin.TabularInline):
         model = Venda
         extra = 0
-        fields = ('uuid', 'cliente', 'data_venda', 'total', 'criado_por')
+        fields = ('uuid', 'cliente', 'data_venda', 'forma_pagamento', 'total', 'criado_por')
         readonly_fields = fields
         show_change_link = True
 
-    inlines = [VendaInline]
+    inlines = [ResumoPagamentoInline, VendaInline]
 
 class ItemVendaInline(admin.TabularInline):
     model = ItemVenda
@@ -88,8 +111,8 @@ class DevolucaoItemVendaInline(admin.TabularInline):
 
 @admin.register(Venda)
 class VendaAdmin(admin.ModelAdmin):
-    list_display = ('uuid', 'empresa', 'cliente', 'vendedor', 'sessao_caixa', 'data_venda', 'total', 'criado_por', 'atualizado_em')
-    list_filter = ('empresa', 'sessao_caixa__caixa', 'vendedor', 'data_venda', 'criado_em')
+    list_display = ('uuid', 'empresa', 'cliente', 'vendedor', 'sessao_caixa', 'data_venda', 'forma_pagamento', 'total', 'criado_por', 'atualizado_em')
+    list_filter = ('empresa', 'sessao_caixa__caixa', 'vendedor', 'forma_pagamento', 'data_venda', 'criado_em')
     search_fields = ('uuid__icontains', 'cliente__nome', 'sessao_caixa__caixa__nome', 'vendedor__username')
     raw_id_fields = ('empresa', 'cliente', 'vendedor', 'sessao_caixa')
     inlines = [ItemVendaInline, FaturaInline, DevolucaoItemVendaInline]
@@ -112,6 +135,17 @@ class FaturaAdmin(admin.ModelAdmin):
     search_fields = ('uuid__icontains', 'venda__id')
     raw_id_fields = ('venda',)
 
+    class DocumentoInline(admin.StackedInline):
+        model = DocumentoFatura
+        fields = ('status', 'assinado', 'tamanho', 'gerado_em', 'fatura_atualizada_em', 'arquivo', 'erro')
+        readonly_fields = fields
+        can_delete = False
+
+        def has_add_permission(self, request, obj=None):
+            return False
+
+    inlines = [DocumentoInline]
+
 @admin.register(DevolucaoItemVenda)
 class DevolucaoItemVendaAdmin(admin.ModelAdmin):
     list_display = ('uuid', 'item_venda', 'quantidade', 'motivo', 'criado_em')
@@ -119,6 +153,19 @@ class DevolucaoItemVendaAdmin(admin.ModelAdmin):
     search_fields = ('uuid__icontains', 'item_venda__venda__id', 'motivo')
     raw_id_fields = ('item_venda',)
 
+@admin.register(ReservaEstoque)
+class ReservaEstoqueAdmin(admin.ModelAdmin):
+    list_display = ('uuid', 'produto', 'sessao_caixa', 'quantidade', 'expira_em', 'criado_em')
+    list_filter = ('empresa', 'expira_em')
+    raw_id_fields = ('empresa', 'produto', 'sessao_caixa')
+
+@admin.register(Exportacao)
+class ExportacaoAdmin(admin.ModelAdmin):
+    list_display = ('uuid', 'empresa', 'tipo', 'formato', 'inicio', 'fim', 'status', 'linhas', 'criado_em', 'concluido_em')
+    list_filter = ('status', 'formato', 'empresa')
+    raw_id_fields = ('empresa', 'solicitado_por')
+    readonly_fields = ('status', 'linhas', 'tamanho', 'arquivo', 'erro', 'iniciado_em', 'concluido_em')
+
 class UsuarioAdmin(BaseUserAdmin):
     fieldsets = BaseUserAdmin.fieldsets + (
         (('Informações da Empresa e Caixa', {'fields': ('empresa', 'caixa_atual')}),)
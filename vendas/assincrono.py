@@ -0,0 +1,72 @@
+# vendas/assincrono.py
+# Actions `async def` nos viewsets do DRF, para o modo ASGI (uvicorn, pdv_project/asgi.py).
+#
+# O DRF só despacha views síncronas. Com AcoesAssincronasMixin, a rota cujas actions são
+# todas corrotinas vira uma view assíncrona para o Django: sob ASGI ela roda no event loop
+# e, enquanto espera o banco, o worker atende outras conexões; sob WSGI o Django a executa
+# com async_to_sync, e o resultado é o mesmo. A autenticação, as permissões e a negociação
+# de conteúdo (`initial`) continuam síncronas e vão para a thread da requisição.
+#
+# Dentro das actions assíncronas: ORM assíncrono (aget, afirst, `async for`) ou
+# sync_to_async, e nada de relacionamento preguiçoso (request.user.empresa faria uma
+# consulta síncrona; use request.user.empresa_id). As gravações continuam nas actions
+# síncronas, em transaction.atomic, que não atravessa um await.
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from django.shortcuts import aget_object_or_404
+
+
+class AcoesAssincronasMixin:
+    # Definido por rota em as_view(); vendas/roteamento.py também consulta
+    assincrona = False
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        assincronas = [acao for acao in (actions or {}).values() if iscoroutinefunction(getattr(cls, acao, None))]
+        if not assincronas:
+            return super().as_view(actions, **initkwargs)
+        if len(assincronas) != len(actions):
+            raise ImproperlyConfigured(
+                f'{cls.__name__}: as actions de uma mesma rota devem ser todas síncronas ou todas assíncronas ({actions}).'
+            )
+        return markcoroutinefunction(super().as_view(actions, assincrona=True, **initkwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.assincrona:
+            return super().dispatch(request, *args, **kwargs)
+        return self._despachar(request, *args, **kwargs)
+
+    async def _despachar(self, request, *args, **kwargs):
+        # APIView.dispatch, esperando a action
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            # OPTIONS e 405 são os métodos síncronos do próprio DRF, sem consultas
+            response = handler(request, *args, **kwargs)
+            if iscoroutinefunction(handler):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aget_object(self):
+        """get_object() com o ORM assíncrono."""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = await aget_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, obj)
+        return obj
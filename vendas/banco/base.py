@@ -0,0 +1,45 @@
+# vendas/banco/base.py
+# Backend PostgreSQL do PDV: o do Django mais o search_path da empresa (vendas/esquemas.py).
+#
+# Antes de abrir cada cursor compara o search_path pedido com o da conexão e só manda o
+# SET quando eles diferem, então em uma requisição há no máximo um SET a mais. O valor
+# guardado é esquecido em conexões novas e nos rollbacks, que desfazem um SET feito
+# dentro da transação. Com a transação abortada o SET falharia; ele fica para depois do
+# rollback (que precisa de um cursor para o ROLLBACK TO SAVEPOINT).
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+if is_psycopg3:
+    from psycopg.pq import TransactionStatus
+    TRANSACTION_STATUS_INERROR = TransactionStatus.INERROR
+else:
+    from django.db.backends.postgresql.psycopg_any import extensions
+    TRANSACTION_STATUS_INERROR = extensions.TRANSACTION_STATUS_INERROR
+
+from .. import esquemas
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.search_path = None
+
+    def get_new_connection(self, conn_params):
+        self.search_path = None
+        return super().get_new_connection(conn_params)
+
+    def create_cursor(self, name=None):
+        search_path = esquemas.search_path()
+        if search_path != self.search_path and self.connection.info.transaction_status != TRANSACTION_STATUS_INERROR:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f'SET search_path TO {search_path}')
+            self.search_path = search_path
+        return super().create_cursor(name)
+
+    def _rollback(self):
+        self.search_path = None
+        super()._rollback()
+
+    def _savepoint_rollback(self, sid):
+        self.search_path = None
+        super()._savepoint_rollback(sid)
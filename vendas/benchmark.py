@@ -0,0 +1,186 @@
+# vendas/benchmark.py
+# Utilitários compartilhados pelos comandos de benchmark (manage.py benchmark_*)
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import Empresa, Usuario, Cliente, Produto, Caixa, SessaoCaixa, Venda, ItemVenda
+from .models.base import ProximaVersao
+
+
+@contextmanager
+def rollback_ao_final():
+    # Executa o bloco em uma transação que é sempre desfeita, para não sujar o banco
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def remover_empresa_benchmark(empresa):
+    # Para os comandos que precisam dos dados com commit (outras conexões, marca d'água do
+    # feed): apaga de vez tudo o que a empresa gerada acumulou
+    with transaction.atomic():
+        # A sessão protege o caixa e o vendedor; o resto sai em cascata com a empresa
+        Venda._base_manager.filter(empresa=empresa).delete()
+        SessaoCaixa._base_manager.filter(caixa__empresa=empresa).delete()
+        Empresa._base_manager.filter(pk=empresa.pk).delete()
+
+
+def criar_empresa_benchmark(produtos=100, clientes=10, caixas=1, estoque=1_000_000):
+    sufixo = uuid.uuid4().hex[:12]
+    empresa = Empresa.objects.create(
+        nome=f'Benchmark {sufixo}',
+        cnpj=sufixo,
+        schema_name=f'bench_{sufixo}',
+    )
+    vendedor = Usuario.objects.create_user(username=f'bench_{sufixo}', password=sufixo, empresa=empresa)
+    Produto.objects.bulk_create([
+        Produto(empresa=empresa, nome=f'Produto {i}', preco=Decimal('1.99') + i % 50, estoque=estoque)
+        for i in range(produtos)
+    ], batch_size=5000)
+    Cliente.objects.bulk_create([
+        Cliente(empresa=empresa, nome=f'Cliente {i}', cpf=f'{i:011d}')
+        for i in range(clientes)
+    ], batch_size=5000)
+    Caixa.objects.bulk_create([
+        Caixa(empresa=empresa, nome=f'Caixa {i}')
+        for i in range(caixas)
+    ])
+    caixa = Caixa.objects.filter(empresa=empresa).first()
+    sessao = SessaoCaixa.objects.create(caixa=caixa, vendedor=vendedor)
+    return {
+        'empresa': empresa,
+        'vendedor': vendedor,
+        'caixa': caixa,
+        'sessao': sessao,
+        'cliente': Cliente.objects.filter(empresa=empresa).first(),
+        'produtos': list(Produto.objects.filter(empresa=empresa).order_by('pk')),
+    }
+
+
+_TIPOS = ['Arroz', 'Feijão', 'Açúcar', 'Café', 'Leite', 'Biscoito', 'Sabão', 'Detergente', 'Refrigerante', 'Suco',
+          'Macarrão', 'Óleo', 'Farinha', 'Queijo', 'Iogurte', 'Chocolate', 'Shampoo', 'Papel Higiênico', 'Cerveja', 'Água']
+_MARCAS = ['Tio João', 'Camil', 'União', 'Pilão', 'Itambé', 'Nestlé', 'Ypê', 'Omo', 'Coca-Cola', 'Del Valle',
+           'Renata', 'Soya', 'Dona Benta', 'Tirolez', 'Danone', 'Garoto', 'Seda', 'Neve', 'Skol', 'Crystal']
+_VARIACOES = ['Tradicional', 'Integral', 'Light', 'Zero', 'Premium', 'Orgânico', 'Família', 'Econômico']
+_MEDIDAS = ['200g', '500g', '1kg', '5kg', '350ml', '1L', '2L', 'c/ 12']
+
+
+def digito_ean13(base):
+    soma = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(base))
+    return str((10 - soma % 10) % 10)
+
+
+def gerar_catalogo(empresa, quantidade, semente=42, lote=5000, inicio=0):
+    """Cria `quantidade` produtos com nomes realistas e códigos EAN-13 únicos na empresa.
+
+    Retorna a lista de códigos de barras gerados, na ordem de criação.
+    """
+    aleatorio = random.Random(semente)
+    codigos = []
+    for primeiro in range(inicio, inicio + quantidade, lote):
+        produtos = []
+        for i in range(primeiro, min(primeiro + lote, inicio + quantidade)):
+            base = f'789{i:09d}'
+            codigo = base + digito_ean13(base)
+            codigos.append(codigo)
+            produtos.append(Produto(
+                empresa=empresa,
+                nome=f'{aleatorio.choice(_TIPOS)} {aleatorio.choice(_MARCAS)} {aleatorio.choice(_VARIACOES)} '
+                     f'{aleatorio.choice(_MEDIDAS)} #{i}',
+                codigo_barras=codigo,
+                preco=Decimal(aleatorio.randint(100, 9999)) / 100,
+                estoque=aleatorio.randint(0, 500),
+                versao=ProximaVersao(),
+            ))
+        Produto.objects.bulk_create(produtos, batch_size=lote)
+    # Sem estatísticas novas o planejador ainda acha que a empresa tem poucos produtos
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {Produto._meta.db_table}')
+    return codigos
+
+
+def gerar_vendas(dados, quantidade, itens=5, dias=30, semente=42, lote=5000):
+    """Grava `quantidade` vendas com `itens` itens cada, espalhadas pelos últimos `dias` dias.
+
+    Não passa pelo estoque nem pelos totais da sessão: serve para ter histórico a ler.
+    """
+    aleatorio = random.Random(semente)
+    produtos = dados['produtos']
+    agora = timezone.now()
+    for primeira in range(0, quantidade, lote):
+        vendas, itens_venda = [], []
+        for _ in range(primeira, min(primeira + lote, quantidade)):
+            venda = Venda(
+                empresa=dados['empresa'], cliente=dados['cliente'], sessao_caixa=dados['sessao'],
+                vendedor=dados['vendedor'], total=Decimal('0.00'),
+                data_venda=agora - timedelta(seconds=aleatorio.randint(0, dias * 86400)),
+            )
+            for produto in aleatorio.sample(produtos, min(itens, len(produtos))):
+                item = ItemVenda(venda=venda, produto=produto, quantidade=aleatorio.randint(1, 5), preco_unitario=produto.preco)
+                venda.total += item.quantidade * item.preco_unitario
+                itens_venda.append(item)
+            vendas.append(venda)
+        Venda.objects.bulk_create(vendas, batch_size=lote)
+        for item in itens_venda:
+            item.venda_id = item.venda.pk
+        ItemVenda.objects.bulk_create(itens_venda, batch_size=lote)
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {Venda._meta.db_table}')
+        cursor.execute(f'ANALYZE {ItemVenda._meta.db_table}')
+
+
+def certificado_autoassinado(destino, senha='pdv'):
+    """Grava em `destino` um certificado PKCS#12 autoassinado (só para testes e benchmarks)."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives.serialization import pkcs12
+    from cryptography.x509.oid import NameOID
+
+    chave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    nome = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'PDV Benchmark')])
+    agora = timezone.now()
+    certificado = (
+        x509.CertificateBuilder().subject_name(nome).issuer_name(nome).public_key(chave.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(agora - timedelta(days=1)).not_valid_after(agora + timedelta(days=30))
+        .sign(chave, hashes.SHA256())
+    )
+    with open(destino, 'wb') as arquivo:
+        arquivo.write(pkcs12.serialize_key_and_certificates(
+            b'pdv', chave, certificado, None, serialization.BestAvailableEncryption(senha.encode()),
+        ))
+    return destino
+
+
+def medir(func, repeticoes=1, preparar=None):
+    # Retorna os tempos (em segundos) e o número de queries de cada execução;
+    # `preparar` roda antes de cada uma, fora da medição
+    tempos, queries = [], []
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            func()
+            tempos.append(time.perf_counter() - inicio)
+        queries.append(len(ctx.captured_queries))
+    return tempos, queries
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    inferior = int(k)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (k - inferior)
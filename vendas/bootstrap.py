@@ -0,0 +1,76 @@
+# vendas/bootstrap.py
+# Carga inicial de um caixa satélite, gerada em streaming.
+#
+# As linhas são lidas com values().iterator(), que usa cursor do lado do servidor no
+# PostgreSQL, montadas pelas leituras de vendas/serializers/leitura.py, sem passar
+# pelos serializers do DRF, e convertidas para JSON por vendas/renderers.dumps.
+# A memória do worker fica limitada a um lote, qualquer que seja o tamanho da empresa.
+from django.utils import timezone
+
+from .models import Cliente, Produto, Caixa, Usuario
+from .renderers import dumps
+from .serializers import EmpresaSerializer, leitura
+from .sync import codificar_cursor, marca_dagua
+
+TAMANHO_LOTE = 2000
+TAMANHO_BUFFER = 64 * 1024
+
+
+# recurso -> (queryset, leitura)
+def _recursos(empresa):
+    return [
+        ('clientes', Cliente.objects.filter(empresa=empresa), leitura.CLIENTE),
+        ('produtos', Produto.objects.filter(empresa=empresa), leitura.PRODUTO),
+        ('caixas', Caixa.objects.filter(empresa=empresa), leitura.CAIXA),
+        ('usuarios', Usuario.objects.filter(empresa=empresa, is_active=True), leitura.USUARIO),
+    ]
+
+
+def _linhas(queryset, recurso):
+    linha, fuso = recurso.linha, timezone.get_current_timezone()
+    for valores in recurso.valores(queryset.order_by('pk')).iterator(chunk_size=TAMANHO_LOTE):
+        yield linha(valores, fuso)
+
+
+def _em_blocos(partes):
+    # Agrupa pedaços pequenos em blocos de ~64 KB antes de entregar ao servidor
+    buffer, tamanho = [], 0
+    for parte in partes:
+        buffer.append(parte)
+        tamanho += len(parte)
+        if tamanho >= TAMANHO_BUFFER:
+            yield b''.join(buffer)
+            buffer, tamanho = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _cabecalho(empresa, versao=None):
+    return {
+        'empresa': EmpresaSerializer(empresa).data,
+        'current_server_time': timezone.now().timestamp(),
+        'cursor': codificar_cursor(marca_dagua() if versao is None else versao),
+    }
+
+
+def gerar_json(empresa):
+    """Mesmo formato da resposta original de dados-iniciais, escrito incrementalmente."""
+    def partes(cabecalho):
+        yield dumps(cabecalho)[:-1]
+        for nome, queryset, recurso in _recursos(empresa):
+            yield f',"{nome}":['.encode()
+            for i, linha in enumerate(_linhas(queryset, recurso)):
+                yield (b',' if i else b'') + dumps(linha)
+            yield b']'
+        yield b'}'
+    return _em_blocos(partes(_cabecalho(empresa)))
+
+
+def gerar_ndjson(empresa, versao=None):
+    """Um objeto JSON por linha: {"tipo": ..., "dados": {...}}."""
+    def partes(cabecalho):
+        yield dumps({'tipo': 'cabecalho', 'dados': cabecalho}) + b'\n'
+        for nome, queryset, recurso in _recursos(empresa):
+            for linha in _linhas(queryset, recurso):
+                yield dumps({'tipo': nome, 'dados': linha}) + b'\n'
+    return _em_blocos(partes(_cabecalho(empresa, versao)))
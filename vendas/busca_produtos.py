@@ -0,0 +1,94 @@
+# vendas/busca_produtos.py
+# Consulta de produtos na tela de venda: leitura do código de barras e busca por nome.
+#
+# O código de barras é uma igualdade no índice único (empresa, codigo_barras). A busca
+# por nome começa pelo prefixo de lower(nome) COLLATE "C", lido em ordem direto do índice
+# (empresa, lower(nome), id), e só completa com similaridade de trigramas (pg_trgm)
+# quando o prefixo não preenche a página, para tolerar erros de digitação.
+from asgiref.sync import sync_to_async
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models.functions import Collate, Lower
+
+from .models import Produto
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 50
+TAMANHO_MINIMO_TRIGRAMA = 3
+
+_trigrama_disponivel = {}
+
+
+def trigrama_disponivel(using='default'):
+    # O índice de trigramas só existe se a migração conseguiu criar a extensão
+    if using not in _trigrama_disponivel:
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigrama_disponivel[using] = cursor.fetchone() is not None
+    return _trigrama_disponivel[using]
+
+
+def _base(empresa, queryset):
+    if queryset is None:
+        queryset = Produto.objects.select_related('empresa')
+    return queryset.filter(empresa=empresa)
+
+
+def _por_codigo(empresa, codigo, queryset):
+    codigo = (codigo or '').strip()
+    return _base(empresa, queryset).filter(codigo_barras=codigo) if codigo else None
+
+
+def _por_prefixo(base, termo, limite):
+    return (
+        base.annotate(nome_normalizado=Collate(Lower('nome'), 'C'))
+        .filter(nome_normalizado__startswith=termo.lower())
+        .order_by('nome_normalizado', 'pk')[:limite]
+    )
+
+
+def _por_similaridade(base, termo, resultados, limite):
+    return (
+        base.filter(nome__trigram_similar=termo)
+        .exclude(pk__in=[produto.pk for produto in resultados])
+        .annotate(similaridade=TrigramSimilarity('nome', termo))
+        .order_by('-similaridade', 'pk')[:limite - len(resultados)]
+    )
+
+
+def _completar(termo, resultados, limite):
+    return len(resultados) < limite and len(termo) >= TAMANHO_MINIMO_TRIGRAMA
+
+
+def por_codigo(empresa, codigo, queryset=None):
+    consulta = _por_codigo(empresa, codigo, queryset)
+    return consulta.first() if consulta is not None else None
+
+
+def buscar(empresa, termo, limite=LIMITE_PADRAO, queryset=None):
+    termo = (termo or '').strip()
+    if not termo:
+        return []
+    base = _base(empresa, queryset)
+    resultados = list(_por_prefixo(base, termo, limite))
+    if _completar(termo, resultados, limite) and trigrama_disponivel(base.db):
+        resultados += list(_por_similaridade(base, termo, resultados, limite))
+    return resultados
+
+
+# Versões para as views assíncronas (vendas/assincrono.py)
+
+async def apor_codigo(empresa, codigo, queryset=None):
+    consulta = _por_codigo(empresa, codigo, queryset)
+    return await consulta.afirst() if consulta is not None else None
+
+
+async def abuscar(empresa, termo, limite=LIMITE_PADRAO, queryset=None):
+    termo = (termo or '').strip()
+    if not termo:
+        return []
+    base = _base(empresa, queryset)
+    resultados = [produto async for produto in _por_prefixo(base, termo, limite)]
+    if _completar(termo, resultados, limite) and await sync_to_async(trigrama_disponivel)(base.db):
+        resultados += [produto async for produto in _por_similaridade(base, termo, resultados, limite)]
+    return resultados
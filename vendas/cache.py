@@ -0,0 +1,263 @@
+# vendas/cache.py
+# Cache de leitura em dois níveis para o catálogo usado a cada venda
+# (produtos, clientes, caixas e sessões de caixa).
+#
+# Nível 1: LRU por processo, com TTL curto e limite de itens; não sai do processo.
+# Nível 2: backend compartilhado do Django (settings.CACHES), visto por todos os workers.
+#
+# As chaves levam o id da empresa. Gravações e exclusões, também as em lote do BaseQuerySet,
+# invalidam os dois níveis pelos sinais de vendas/signals.py; nos outros processos o nível 1
+# só esquece o valor antigo quando o TTL local vence, por isso ele é de poucos segundos.
+# O estoque dos produtos em cache não é confiável: a baixa sempre relê e trava as linhas
+# (vendas/estoque.py).
+#
+# Versões: por empresa e modelo, (versão, instante da alteração) só no nível 2, para o GET
+# condicional de vendas/condicional.py. Os sinais renovam a versão no commit; sem ela no
+# cache, vale o maior `versao` das linhas, lido pelo índice (empresa, versao). Um UPDATE com
+# sem_avisos(), ou fora do BaseQuerySet, só aparece quando a chave expira (PDV_CACHE_TTL).
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Produto, Cliente, Caixa, SessaoCaixa
+from .models.base import proxima_versao
+
+
+class CacheLocal:
+    """LRU com TTL e limite de itens, seguro entre threads."""
+
+    def __init__(self, max_itens, ttl):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.despejos = 0
+        self.expirados = 0
+
+    def get(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em <= time.monotonic():
+                del self._itens[chave]
+                self.expirados += 1
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (valor, time.monotonic() + self.ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.despejos += 1
+
+    def delete(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def __len__(self):
+        return len(self._itens)
+
+
+_local = None
+_lock = threading.Lock()
+_contadores = {'acertos_local': 0, 'acertos_compartilhado': 0, 'faltas': 0, 'invalidacoes': 0}
+
+
+def _cache_local():
+    global _local
+    with _lock:
+        if _local is None:
+            _local = CacheLocal(
+                max_itens=getattr(settings, 'PDV_CACHE_LOCAL_ITENS', 10_000),
+                ttl=getattr(settings, 'PDV_CACHE_LOCAL_TTL', 5),
+            )
+        return _local
+
+
+def _cache_compartilhado():
+    return caches[getattr(settings, 'PDV_CACHE_ALIAS', 'default')]
+
+
+def _ativo():
+    return getattr(settings, 'PDV_CACHE_ATIVO', True)
+
+
+def _contar(nome, quantidade=1):
+    if quantidade:
+        with _lock:
+            _contadores[nome] += quantidade
+
+
+def chave(modelo, empresa_id, valor):
+    return f'pdv:{empresa_id}:{modelo._meta.label_lower}:{valor}'
+
+
+def obter_muitos(modelo, empresa_id, valores, carregar):
+    """Lê do cache as instâncias de `modelo` com os uuids `valores`.
+
+    `carregar(faltando)` busca no banco o que não estiver em nenhum nível e retorna
+    {uuid em texto: instância}; o resultado volta no mesmo formato. Os valores são
+    guardados serializados, então cada chamada recebe instâncias próprias.
+    """
+    valores = {str(valor) for valor in valores}
+    if not _ativo():
+        return carregar(valores)
+
+    local = _cache_local()
+    chaves = {valor: chave(modelo, empresa_id, valor) for valor in valores}
+    encontrados, faltando = {}, set()
+    for valor, k in chaves.items():
+        dados = local.get(k)
+        if dados is None:
+            faltando.add(valor)
+        else:
+            encontrados[valor] = pickle.loads(dados)
+    _contar('acertos_local', len(encontrados))
+
+    if faltando:
+        compartilhados = _cache_compartilhado().get_many([chaves[valor] for valor in faltando])
+        for valor in list(faltando):
+            dados = compartilhados.get(chaves[valor])
+            if dados is not None:
+                local.set(chaves[valor], dados)
+                encontrados[valor] = pickle.loads(dados)
+                faltando.discard(valor)
+                _contar('acertos_compartilhado')
+
+    if faltando:
+        _contar('faltas', len(faltando))
+        novos = {}
+        for valor, instancia in carregar(faltando).items():
+            dados = pickle.dumps(instancia, pickle.HIGHEST_PROTOCOL)
+            local.set(chaves[valor], dados)
+            novos[chaves[valor]] = dados
+            encontrados[valor] = instancia
+        if novos:
+            _cache_compartilhado().set_many(novos, timeout=getattr(settings, 'PDV_CACHE_TTL', 300))
+    return encontrados
+
+
+def obter(modelo, empresa_id, valor, carregar):
+    """Versão de um item de `obter_muitos`; `carregar(valor)` retorna a instância ou None."""
+    def carregar_um(faltando):
+        instancia = carregar(next(iter(faltando)))
+        return {} if instancia is None else {str(valor): instancia}
+    return obter_muitos(modelo, empresa_id, [valor], carregar_um).get(str(valor))
+
+
+def invalidar(modelo, empresa_id, valores):
+    chaves = [chave(modelo, empresa_id, valor) for valor in valores]
+    if not chaves:
+        return
+    local = _cache_local()
+    for k in chaves:
+        local.delete(k)
+    _cache_compartilhado().delete_many(chaves)
+    _contar('invalidacoes', len(chaves))
+
+
+def _chave_versao(modelo, empresa_id):
+    return f'pdv:{empresa_id}:versao:{modelo._meta.label_lower}'
+
+
+def versoes(empresa_id, modelos):
+    """{modelo: (versao, alterado_em)} com uma leitura do cache compartilhado.
+
+    `alterado_em` é um timestamp em segundos. O nível 1 fica de fora: nos outros processos
+    ele devolveria a versão antiga até o TTL local vencer, e o terminal receberia 304.
+    """
+    chaves = {modelo: _chave_versao(modelo, empresa_id) for modelo in modelos}
+    encontrados = _cache_compartilhado().get_many(list(chaves.values())) if _ativo() else {}
+    resultado = {}
+    for modelo, k in chaves.items():
+        valor = encontrados.get(k)
+        if valor is None:
+            maior = modelo._base_manager.filter(empresa_id=empresa_id).aggregate(v=Max('versao'))['v']
+            valor = (maior or 0, time.time())
+            if _ativo():
+                # add: não sobrescreve a versão que um commit gravou enquanto esta era lida
+                _cache_compartilhado().add(k, valor, timeout=getattr(settings, 'PDV_CACHE_TTL', 300))
+        resultado[modelo] = valor
+    return resultado
+
+
+def renovar_versao(modelo, empresa_id, versao=None):
+    """Registra a alteração de linhas de `modelo` da empresa na transação atual.
+
+    A versão some já (quem ler durante a transação recalcula pelo banco) e volta com a nova
+    no commit. Sem `versao` (exclusão física, UPDATE em lote) o maior `versao` das linhas
+    pode não mudar, ou não é conhecido: um número novo da sequência marca a alteração.
+    """
+    if not _ativo():
+        return
+    k = _chave_versao(modelo, empresa_id)
+    _cache_compartilhado().delete(k)
+
+    def gravar():
+        valor = (versao or proxima_versao(), time.time())
+        _cache_compartilhado().set(k, valor, timeout=getattr(settings, 'PDV_CACHE_TTL', 300))
+    transaction.on_commit(gravar)
+
+
+def estatisticas():
+    """Contadores deste processo; o nível 2 é compartilhado, os números não."""
+    local = _cache_local()
+    with _lock:
+        contadores = dict(_contadores)
+    leituras = contadores['acertos_local'] + contadores['acertos_compartilhado'] + contadores['faltas']
+    return {
+        **contadores,
+        'taxa_acerto': round((leituras - contadores['faltas']) / leituras, 4) if leituras else None,
+        'despejos_local': local.despejos,
+        'expirados_local': local.expirados,
+        'itens_local': len(local),
+        'max_itens_local': local.max_itens,
+        'ttl_local': local.ttl,
+    }
+
+
+def limpar():
+    # Descarta o nível 1 e zera os contadores (o nível 1 é recriado com os settings atuais)
+    global _local
+    with _lock:
+        _local = None
+        for nome in _contadores:
+            _contadores[nome] = 0
+
+
+# Leituras do catálogo usadas pelo fluxo de venda
+
+def produtos_por_uuid(empresa_id, uuids):
+    def carregar(faltando):
+        return {
+            str(produto.uuid): produto
+            for produto in Produto.objects.filter(empresa_id=empresa_id, uuid__in=faltando)
+        }
+    return obter_muitos(Produto, empresa_id, uuids, carregar)
+
+
+def cliente_por_uuid(empresa_id, uuid):
+    return obter(Cliente, empresa_id, uuid, lambda valor: Cliente.objects.filter(empresa_id=empresa_id, uuid=valor).first())
+
+
+def caixa_por_uuid(empresa_id, uuid):
+    return obter(Caixa, empresa_id, uuid, lambda valor: Caixa.objects.filter(empresa_id=empresa_id, uuid=valor).first())
+
+
+def sessao_por_uuid(empresa_id, uuid):
+    # Com o caixa junto: a resposta da venda mostra o nome dele
+    return obter(
+        SessaoCaixa, empresa_id, uuid,
+        lambda valor: SessaoCaixa.objects.select_related('caixa').filter(caixa__empresa_id=empresa_id, uuid=valor).first(),
+    )
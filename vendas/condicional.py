@@ -0,0 +1,55 @@
+# vendas/condicional.py
+# GET condicional (If-None-Match / If-Modified-Since) do catálogo e da sincronização.
+#
+# Os terminais consultam produtos, clientes e o feed o tempo todo, quase sempre sem nada
+# novo. Os validadores vêm das versões por empresa de vendas/cache.py (uma leitura do cache
+# compartilhado) e são obtidos antes da consulta: se o terminal já tem a versão atual,
+# recebe 304 sem consulta ao banco nem serialização.
+#
+# Logo depois de uma alteração a resposta sai sem validadores: a réplica pode ainda não
+# ter a linha nova (PDV_REPLICA_FIXAR) e o Last-Modified, com resolução de segundos, não
+# distinguiria duas alterações no mesmo segundo. O terminal segue com o ETag anterior, que
+# não casa mais, e recebe os validadores na próxima consulta.
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from . import cache
+from .roteamento import bancos_leitura
+
+
+def _carencia():
+    return max(1, getattr(settings, 'PDV_REPLICA_FIXAR', 5)) if bancos_leitura() else 1
+
+
+def validadores(empresa_id, modelos):
+    """(etag, last_modified) das linhas de `modelos` da empresa, ou (None, None) se acabaram de mudar."""
+    versoes = cache.versoes(empresa_id, modelos)
+    alterado_em = max(instante for _, instante in versoes.values())
+    if time.time() - alterado_em < _carencia():
+        return None, None
+    etag = '"{}-{}"'.format(empresa_id, '.'.join(str(versoes[modelo][0]) for modelo in modelos))
+    return etag, int(alterado_em)
+
+
+# Views assíncronas: o cache compartilhado não tem cliente assíncrono (os métodos a* do
+# Django também usam sync_to_async), então a leitura inteira vai de uma vez para a thread
+avalidadores = sync_to_async(validadores)
+
+
+def nao_modificado(request, etag, last_modified):
+    """304 se o terminal já tem esta versão; None para seguir com a resposta normal."""
+    if etag is None or request.method not in ('GET', 'HEAD'):
+        return None
+    resposta = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return marcar(resposta, etag, last_modified) if resposta is not None else None
+
+
+def marcar(resposta, etag, last_modified):
+    if etag is not None and 200 <= resposta.status_code < 400:
+        resposta['ETag'] = etag
+        resposta['Last-Modified'] = http_date(last_modified)
+    return resposta
@@ -0,0 +1,134 @@
+# vendas/documentos.py
+# PDF das faturas, gerado fora do fluxo da venda.
+#
+# O commit de uma fatura agenda a geração (vendas/signals.py). Uma thread de
+# vendas/tarefas.py lê os dados da fatura e entrega um dicionário ao pool de processos;
+# cada processo carrega o template, as fontes e o certificado de assinatura uma única vez
+# (no initializer) e só faz CPU: HTML -> PDF (xhtml2pdf) -> assinatura (pyHanko).
+# O PDF volta para outra tarefa, que grava o arquivo e o status em DocumentoFatura.
+# Com PDV_DOCUMENTOS_PROCESSOS = 0 a geração acontece na própria thread da tarefa.
+# O lado dos processos fica em vendas/pdf.py.
+import contextvars
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Fatura, ItemVenda, DocumentoFatura
+from .pdf import configuracao_assinatura, criar_pool, renderizar_pdf
+from .tarefas import agendar
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = criar_pool(getattr(settings, 'PDV_DOCUMENTOS_PROCESSOS', 2), *configuracao_assinatura())
+        return _pool
+
+
+def contexto_fatura(fatura_id):
+    fatura = Fatura.objects.select_related(
+        'venda__empresa', 'venda__cliente', 'venda__vendedor', 'venda__sessao_caixa__caixa',
+    ).get(pk=fatura_id)
+    venda = fatura.venda
+    itens = ItemVenda.objects.filter(venda_id=venda.pk).order_by('pk').values_list('produto__nome', 'quantidade', 'preco_unitario')
+    return fatura, {
+        'empresa': {'nome': venda.empresa.nome, 'cnpj': venda.empresa.cnpj},
+        'cliente': {'nome': venda.cliente.nome, 'cpf': venda.cliente.cpf, 'endereco': venda.cliente.endereco},
+        'venda': {
+            'uuid': str(venda.uuid),
+            'data_venda': venda.data_venda,
+            'caixa': venda.sessao_caixa.caixa.nome,
+            'vendedor': venda.vendedor.username if venda.vendedor else None,
+            'forma_pagamento': venda.get_forma_pagamento_display(),
+        },
+        'fatura': {
+            'uuid': str(fatura.uuid),
+            'data_emissao': fatura.data_emissao,
+            'data_vencimento': fatura.data_vencimento,
+            'valor_total': fatura.valor_total,
+            'paga': fatura.paga,
+        },
+        'itens': [
+            {'produto': produto, 'quantidade': quantidade, 'preco_unitario': preco, 'subtotal': quantidade * preco}
+            for produto, quantidade, preco in itens
+        ],
+        'gerado_em': timezone.now(),
+    }
+
+
+def caminho_arquivo(fatura, versao):
+    diretorio = Path(getattr(settings, 'PDV_DOCUMENTOS_DIR', Path(settings.BASE_DIR) / 'documentos'))
+    return diretorio / str(fatura.venda.empresa.uuid) / 'faturas' / f'{fatura.uuid}-{int(versao.timestamp() * 1_000_000)}.pdf'
+
+
+def solicitar_pdf(fatura_id):
+    """Agenda a geração do PDF da fatura (chamar depois do commit)."""
+    agendar(_preparar, fatura_id)
+
+
+def _preparar(fatura_id):
+    try:
+        fatura, contexto = contexto_fatura(fatura_id)
+    except Fatura.DoesNotExist:
+        return
+    DocumentoFatura.objects.get_or_create(fatura_id=fatura_id)
+    if getattr(settings, 'PDV_DOCUMENTOS_PROCESSOS', 2) <= 0:
+        try:
+            _salvar(fatura, renderizar_pdf(contexto))
+        except Exception as erro:
+            _registrar_erro(fatura, erro)
+            raise
+        return
+    futuro = _get_pool().submit(renderizar_pdf, contexto)
+    # O callback roda em uma thread interna do pool; a gravação segue no contexto desta
+    # tarefa (esquema da empresa, usuário)
+    contexto_tarefa = contextvars.copy_context()
+    futuro.add_done_callback(lambda futuro: contexto_tarefa.run(agendar, _concluir, fatura, futuro))
+
+
+def _concluir(fatura, futuro):
+    try:
+        resultado = futuro.result()
+    except Exception as erro:
+        _registrar_erro(fatura, erro)
+        raise
+    _salvar(fatura, resultado)
+
+
+def _registrar_erro(fatura, erro):
+    DocumentoFatura.objects.filter(fatura_id=fatura.pk).update(status=DocumentoFatura.Status.ERRO, erro=str(erro) or repr(erro))
+
+
+def _salvar(fatura, resultado):
+    pdf, assinado = resultado
+    destino = caminho_arquivo(fatura, fatura.atualizado_em)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporario = tempfile.mkstemp(dir=destino.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as arquivo:
+            arquivo.write(pdf)
+        os.replace(temporario, destino)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+
+    anterior = DocumentoFatura.objects.filter(fatura_id=fatura.pk).values_list('arquivo', flat=True).first()
+    atualizados = DocumentoFatura.objects.filter(fatura_id=fatura.pk).exclude(
+        fatura_atualizada_em__gt=fatura.atualizado_em,
+    ).update(
+        status=DocumentoFatura.Status.GERADO, arquivo=str(destino), tamanho=len(pdf), assinado=assinado,
+        fatura_atualizada_em=fatura.atualizado_em, erro='', gerado_em=timezone.now(),
+    )
+    if not atualizados:
+        # Uma versão mais nova da fatura já foi gravada
+        destino.unlink(missing_ok=True)
+    elif anterior and anterior != str(destino):
+        Path(anterior).unlink(missing_ok=True)
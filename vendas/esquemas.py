@@ -0,0 +1,106 @@
+# vendas/esquemas.py
+# Um esquema do PostgreSQL por empresa (Empresa.schema_name).
+#
+# Cada conexão usa `search_path = "<schema_name>", public`. As tabelas compartilhadas
+# (empresas, usuários, autenticação, admin) só existem em public; as da empresa existem em
+# public e, para as empresas movidas (vendas/manutencao_esquemas.py), também no esquema
+# próprio, que tem precedência. Um esquema que não existe é ignorado pelo PostgreSQL, então
+# as empresas que ainda não foram movidas continuam nas tabelas de public sem nenhuma marca
+# extra, e mover uma empresa é só renomear o esquema já preenchido.
+#
+# O esquema vem, em ordem:
+#   1. de `usar_esquema`/`da_empresa` (comandos, tarefas, acesso a outra empresa);
+#   2. da empresa do usuário autenticado na requisição (vendas/middleware.py);
+#   3. senão, só public.
+# O SET search_path é feito pelo backend vendas.banco, quando o esquema da conexão muda.
+import contextvars
+import threading
+from contextlib import contextmanager
+
+from .middleware import usuario_resolvido
+
+ESQUEMA_COMPARTILHADO = 'public'
+
+# Modelos de vendas que ficam só em public; todos os outros são da empresa
+MODELOS_COMPARTILHADOS = {'empresa', 'usuario'}
+
+# None: segue o usuário da requisição; '': só public; outro valor: esquema da empresa
+_esquema = contextvars.ContextVar('pdv_esquema', default=None)
+
+_por_empresa = {}
+_lock = threading.Lock()
+
+
+def identificador(nome):
+    return '"%s"' % nome.replace('"', '""')
+
+
+@contextmanager
+def usar_esquema(nome):
+    """Roteia as consultas do bloco para o esquema `nome` (vazio ou None: só public)."""
+    token = _esquema.set(nome or '')
+    try:
+        yield nome
+    finally:
+        _esquema.reset(token)
+
+
+def da_empresa(empresa):
+    return usar_esquema(empresa.schema_name)
+
+
+def esquema_da_empresa(empresa_id):
+    # schema_name não muda depois de criada a empresa; vendas/signals.py mantém o mapa em dia
+    nome = _por_empresa.get(empresa_id)
+    if nome is None:
+        from .models import Empresa
+        with usar_esquema(''):
+            nome = Empresa._base_manager.filter(pk=empresa_id).values_list('schema_name', flat=True).first() or ''
+        with _lock:
+            _por_empresa[empresa_id] = nome
+    return nome
+
+
+def lembrar_empresa(empresa_id, nome):
+    with _lock:
+        _por_empresa[empresa_id] = nome
+
+
+def esquecer_empresa(empresa_id):
+    with _lock:
+        _por_empresa.pop(empresa_id, None)
+
+
+def esquema_atual():
+    esquema = _esquema.get()
+    if esquema is None:
+        usuario = usuario_resolvido()
+        empresa_id = getattr(usuario, 'empresa_id', None)
+        esquema = esquema_da_empresa(empresa_id) if empresa_id else ''
+    return esquema or None
+
+
+def search_path():
+    esquema = esquema_atual()
+    if esquema is None:
+        return ESQUEMA_COMPARTILHADO
+    return f'{identificador(esquema)}, {ESQUEMA_COMPARTILHADO}'
+
+
+class RoteadorEsquemas:
+    """Restringe as migrações aplicadas em um esquema de empresa às tabelas da empresa.
+
+    Em public (fora de `usar_esquema`) tudo é migrado. Em um esquema de empresa só passam
+    as operações dos modelos de vendas fora de MODELOS_COMPARTILHADOS; RunSQL/RunPython só
+    com `hints={'esquema_da_empresa': True}`, porque sem o nome do modelo não há como saber
+    que tabelas eles tocam (ex.: o preenchimento de uuid dos usuários na 0003).
+    """
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not _esquema.get():
+            return None
+        if app_label != 'vendas':
+            return False
+        if model_name is None:
+            return bool(hints.get('esquema_da_empresa'))
+        return model_name not in MODELOS_COMPARTILHADOS
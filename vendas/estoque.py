@@ -0,0 +1,156 @@
+# vendas/estoque.py
+# Movimentação de estoque segura sob concorrência.
+#
+# Toda baixa trava as linhas dos produtos com SELECT ... FOR UPDATE em ordem de id
+# (evita deadlock entre vendas que compartilham produtos), confere o saldo e aplica
+# um único UPDATE com F(), de modo que nenhuma baixa concorrente é perdida.
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When, F, Sum, Subquery, OuterRef, Value, PositiveIntegerField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import serializers
+
+from . import cache, notificacoes
+from .models import Produto, ReservaEstoque
+from .models.base import ProximaVersao
+
+
+class EstoqueInsuficiente(serializers.ValidationError):
+    def __init__(self, produtos):
+        self.produtos = produtos
+        nomes = ', '.join(f"'{nome}'" for nome in produtos)
+        super().__init__({'estoque': f"Estoque insuficiente para o(s) produto(s) {nomes}."})
+
+
+def _tempo_reserva():
+    return timedelta(seconds=getattr(settings, 'PDV_RESERVA_ESTOQUE_TTL', 300))
+
+
+def _reservado_por_outros(sessao_caixa=None):
+    reservas = ReservaEstoque.objects.filter(produto=OuterRef('pk'), expira_em__gt=timezone.now())
+    if sessao_caixa is not None:
+        reservas = reservas.exclude(sessao_caixa=sessao_caixa)
+    soma = reservas.order_by().values('produto').annotate(total=Sum('quantidade')).values('total')
+    return Coalesce(Subquery(soma), Value(0))
+
+
+def _travar(produto_ids, sessao_caixa=None):
+    return list(
+        # todos: o saldo de um produto excluído depois da venda ainda é reposto nas devoluções
+        Produto.todos.select_for_update(of=('self',))
+        .filter(pk__in=produto_ids)
+        .order_by('pk')
+        .annotate(reservado=_reservado_por_outros(sessao_caixa))
+        .values_list('pk', 'nome', 'estoque', 'reservado', 'empresa_id', 'uuid', 'preco')
+    )
+
+
+def _aplicar(quantidades, sinal, travados):
+    # sem_avisos: o estoque em cache não é usado, a versão e o aviso saem daqui com o que já foi lido
+    Produto.todos.filter(pk__in=quantidades).sem_avisos().update(
+        estoque=Case(
+            *[When(pk=pk, then=F('estoque') + sinal * qtd) for pk, qtd in quantidades.items()],
+            default=F('estoque'),
+            output_field=PositiveIntegerField(),
+        ),
+        atualizado_em=timezone.now(),
+        versao=ProximaVersao(),
+    )
+    por_empresa = {}
+    for pk, _, _, _, empresa_id, uuid, _ in travados:
+        if pk in quantidades:
+            por_empresa.setdefault(empresa_id, []).append(uuid)
+    for empresa_id, uuids in por_empresa.items():
+        cache.renovar_versao(Produto, empresa_id)
+        notificacoes.publicar(empresa_id, 'produtos', uuids)
+
+
+def baixar_estoque(quantidades, sessao_caixa=None):
+    """Baixa `quantidades` ({produto_id: quantidade}) de uma só vez.
+
+    As reservas ativas da própria `sessao_caixa` contam como saldo disponível
+    para ela e são consumidas pela baixa. Retorna {produto_id: preço} lido das
+    linhas travadas: é o preço a cobrar, mesmo que o cache do catálogo esteja atrasado.
+    """
+    if not quantidades:
+        return {}
+    with transaction.atomic():
+        travados = _travar(quantidades, sessao_caixa)
+        faltando = [
+            nome for pk, nome, estoque, reservado, _, _, _ in travados
+            if estoque - reservado < quantidades[pk]
+        ]
+        if faltando:
+            raise EstoqueInsuficiente(faltando)
+        _aplicar(quantidades, -1, travados)
+        if sessao_caixa is not None:
+            ReservaEstoque.objects.filter(sessao_caixa=sessao_caixa, produto_id__in=quantidades).hard_delete()
+    return {pk: preco for pk, _, _, _, _, _, preco in travados}
+
+
+def baixar_estoque_em_lote(pedidos):
+    """Baixa vários pedidos ({chave: {produto_id: quantidade}}) com uma trava e um UPDATE.
+
+    Os pedidos são aceitos na ordem recebida enquanto houver saldo; retorna
+    {chave: [nomes sem saldo]} dos recusados. Reservas não entram na conta: é usado
+    para vendas que já aconteceram offline, não para carrinhos em andamento.
+    """
+    produto_ids = {pk for quantidades in pedidos.values() for pk in quantidades}
+    if not produto_ids:
+        return {}
+    with transaction.atomic():
+        saldo, nomes = {}, {}
+        travados = _travar(produto_ids)
+        for pk, nome, estoque, _, _, _, _ in travados:
+            saldo[pk], nomes[pk] = estoque, nome
+        total, recusados = {}, {}
+        for chave, quantidades in pedidos.items():
+            faltando = [nomes[pk] for pk, qtd in quantidades.items() if saldo[pk] < qtd]
+            if faltando:
+                recusados[chave] = faltando
+                continue
+            for pk, qtd in quantidades.items():
+                saldo[pk] -= qtd
+                total[pk] = total.get(pk, 0) + qtd
+        if total:
+            _aplicar(total, -1, travados)
+    return recusados
+
+
+def repor_estoque(quantidades):
+    if not quantidades:
+        return
+    with transaction.atomic():
+        _aplicar(quantidades, 1, _travar(quantidades))
+
+
+def reservar(sessao_caixa, produto, quantidade):
+    # Segura `quantidade` do produto para a sessão enquanto a venda é montada no terminal
+    with transaction.atomic():
+        agora = timezone.now()
+        ReservaEstoque.objects.filter(produto=produto, expira_em__lte=agora).hard_delete()
+        _, nome, estoque, reservado, _, _, _ = _travar([produto.pk])[0]
+        if estoque - reservado < quantidade:
+            raise EstoqueInsuficiente([nome])
+        return ReservaEstoque.objects.create(
+            empresa_id=produto.empresa_id,
+            produto=produto,
+            sessao_caixa=sessao_caixa,
+            quantidade=quantidade,
+            expira_em=agora + _tempo_reserva(),
+        )
+
+
+def liberar_reservas(sessao_caixa, produto_ids=None):
+    reservas = ReservaEstoque.objects.filter(sessao_caixa=sessao_caixa)
+    if produto_ids is not None:
+        reservas = reservas.filter(produto_id__in=produto_ids)
+    return reservas.hard_delete()
+
+
+def estoque_disponivel(produto):
+    ativas = ReservaEstoque.objects.filter(produto=produto, expira_em__gt=timezone.now())
+    return produto.estoque - (ativas.aggregate(total=Sum('quantidade'))['total'] or 0)
@@ -0,0 +1,189 @@
+# vendas/exportacao.py
+# Exportação do histórico de vendas de uma empresa para arquivo (financeiro, BI).
+#
+# As linhas saem de um cursor do lado do servidor (QuerySet.iterator) em blocos de
+# tamanho fixo e vão direto para o arquivo, então a memória usada não depende do
+# período: CSV com gzip ou, se o pacote pyarrow estiver instalado, Parquet com um
+# row group por bloco. O arquivo é gravado em um temporário e renomeado no final.
+import csv
+import datetime
+import gzip
+import io
+import os
+import tempfile
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F, DecimalField, ExpressionWrapper
+from django.utils import timezone
+
+from .models import Venda, ItemVenda, Exportacao
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXTENSOES = {'csv': '.csv.gz', 'parquet': '.parquet'}
+CONTENT_TYPES = {'csv': 'application/gzip', 'parquet': 'application/vnd.apache.parquet'}
+TAMANHO_LOTE = 10_000
+
+# (coluna, expressão na consulta, tipo) por nível de detalhe
+_TEXTO, _DATA_HORA, _INTEIRO, _VALOR = 'texto', 'data_hora', 'inteiro', 'valor'
+COLUNAS = {
+    Exportacao.Tipo.VENDAS: [
+        ('venda', 'uuid', _TEXTO),
+        ('data_venda', 'data_venda', _DATA_HORA),
+        ('caixa', 'sessao_caixa__caixa__nome', _TEXTO),
+        ('sessao_caixa', 'sessao_caixa__uuid', _TEXTO),
+        ('vendedor', 'vendedor__username', _TEXTO),
+        ('cliente', 'cliente__nome', _TEXTO),
+        ('cliente_cpf', 'cliente__cpf', _TEXTO),
+        ('forma_pagamento', 'forma_pagamento', _TEXTO),
+        ('total', 'total', _VALOR),
+    ],
+    Exportacao.Tipo.ITENS: [
+        ('venda', 'venda__uuid', _TEXTO),
+        ('data_venda', 'venda__data_venda', _DATA_HORA),
+        ('caixa', 'venda__sessao_caixa__caixa__nome', _TEXTO),
+        ('vendedor', 'venda__vendedor__username', _TEXTO),
+        ('forma_pagamento', 'venda__forma_pagamento', _TEXTO),
+        ('produto', 'produto__uuid', _TEXTO),
+        ('produto_nome', 'produto__nome', _TEXTO),
+        ('codigo_barras', 'produto__codigo_barras', _TEXTO),
+        ('quantidade', 'quantidade', _INTEIRO),
+        ('preco_unitario', 'preco_unitario', _VALOR),
+        ('subtotal', 'subtotal', _VALOR),
+    ],
+}
+
+
+def formatos_disponiveis():
+    return ['csv', 'parquet'] if pyarrow is not None else ['csv']
+
+
+def _inicio_do_dia(dia):
+    return timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+
+
+def consulta(empresa_id, tipo, inicio=None, fim=None):
+    """Linhas da exportação (values_list na ordem de COLUNAS), por data da venda."""
+    if tipo == Exportacao.Tipo.VENDAS:
+        linhas, prefixo = Venda.objects.filter(empresa_id=empresa_id), ''
+        ordem = ('data_venda', 'id')
+    else:
+        linhas = ItemVenda.objects.filter(venda__empresa_id=empresa_id, venda__deletado_em__isnull=True).annotate(
+            subtotal=ExpressionWrapper(F('quantidade') * F('preco_unitario'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        )
+        prefixo, ordem = 'venda__', ('venda__data_venda', 'venda_id', 'id')
+    if inicio is not None:
+        linhas = linhas.filter(**{f'{prefixo}data_venda__gte': _inicio_do_dia(inicio)})
+    if fim is not None:
+        linhas = linhas.filter(**{f'{prefixo}data_venda__lt': _inicio_do_dia(fim + datetime.timedelta(days=1))})
+    return linhas.order_by(*ordem).values_list(*[expressao for _, expressao, _ in COLUNAS[tipo]])
+
+
+class _EscritorCsv:
+    def __init__(self, arquivo, colunas):
+        self._gzip = gzip.GzipFile(fileobj=arquivo, mode='wb', compresslevel=6)
+        self._texto = io.TextIOWrapper(self._gzip, encoding='utf-8', newline='')
+        self._csv = csv.writer(self._texto)
+        self._csv.writerow([nome for nome, _, _ in colunas])
+        self._datas = [i for i, (_, _, tipo) in enumerate(colunas) if tipo == _DATA_HORA]
+
+    def escrever(self, linhas):
+        if self._datas:
+            linhas = [list(linha) for linha in linhas]
+            for linha in linhas:
+                for i in self._datas:
+                    linha[i] = linha[i].isoformat()
+        self._csv.writerows(linhas)
+
+    def fechar(self):
+        self._texto.close()
+
+
+class _EscritorParquet:
+    def __init__(self, arquivo, colunas):
+        tipos = {
+            _TEXTO: pyarrow.string(),
+            _DATA_HORA: pyarrow.timestamp('us', tz='UTC'),
+            _INTEIRO: pyarrow.int64(),
+            _VALOR: pyarrow.decimal128(14, 2),
+        }
+        self._schema = pyarrow.schema([(nome, tipos[tipo]) for nome, _, tipo in colunas])
+        self._textos = [i for i, (_, _, tipo) in enumerate(colunas) if tipo == _TEXTO]
+        self._parquet = pyarrow.parquet.ParquetWriter(arquivo, self._schema, compression='zstd')
+
+    def escrever(self, linhas):
+        colunas = [list(coluna) for coluna in zip(*linhas)]
+        for i in self._textos:
+            # uuids chegam como UUID
+            colunas[i] = [None if valor is None else str(valor) for valor in colunas[i]]
+        self._parquet.write_batch(pyarrow.record_batch(colunas, schema=self._schema))
+
+    def fechar(self):
+        self._parquet.close()
+
+
+def exportar(empresa_id, destino, formato='csv', tipo=Exportacao.Tipo.ITENS, inicio=None, fim=None,
+             lote=TAMANHO_LOTE, progresso=None):
+    """Grava as vendas da empresa em `destino` e retorna o número de linhas.
+
+    `progresso(linhas)` é chamado depois de cada bloco gravado.
+    """
+    if formato not in formatos_disponiveis():
+        raise ValueError(f"Formato de exportação indisponível: {formato}")
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    colunas = COLUNAS[tipo]
+    linhas = iter(consulta(empresa_id, tipo, inicio, fim).iterator(chunk_size=lote))
+
+    total = 0
+    fd, temporario = tempfile.mkstemp(dir=destino.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as arquivo:
+            escritor = (_EscritorParquet if formato == 'parquet' else _EscritorCsv)(arquivo, colunas)
+            while bloco := list(islice(linhas, lote)):
+                escritor.escrever(bloco)
+                total += len(bloco)
+                if progresso is not None:
+                    progresso(total)
+            escritor.fechar()
+        os.replace(temporario, destino)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+    return total
+
+
+# Exportações pedidas pela API e executadas em segundo plano (vendas/tarefas.py)
+
+def caminho_arquivo(exportacao):
+    diretorio = Path(getattr(settings, 'PDV_EXPORTACAO_DIR', Path(settings.BASE_DIR) / 'exportacoes'))
+    return diretorio / str(exportacao.empresa.uuid) / f'{exportacao.uuid}{EXTENSOES[exportacao.formato]}'
+
+
+def executar_exportacao(exportacao_id):
+    # Só uma execução pega a exportação pendente
+    if not Exportacao.objects.filter(pk=exportacao_id, status=Exportacao.Status.PENDENTE).update(
+        status=Exportacao.Status.PROCESSANDO, iniciado_em=timezone.now(),
+    ):
+        return
+    exportacao = Exportacao.objects.select_related('empresa').get(pk=exportacao_id)
+    atualizar = Exportacao.objects.filter(pk=exportacao_id).update
+    caminho = caminho_arquivo(exportacao)
+    try:
+        linhas = exportar(
+            exportacao.empresa_id, caminho, exportacao.formato, exportacao.tipo, exportacao.inicio, exportacao.fim,
+            progresso=lambda linhas: atualizar(linhas=linhas),
+        )
+    except Exception as erro:
+        atualizar(status=Exportacao.Status.ERRO, erro=str(erro), concluido_em=timezone.now())
+        raise
+    atualizar(
+        status=Exportacao.Status.CONCLUIDA, linhas=linhas, arquivo=str(caminho),
+        tamanho=caminho.stat().st_size, concluido_em=timezone.now(),
+    )
@@ -0,0 +1,153 @@
+# vendas/fechamento.py
+# Totais das sessões de caixa para o fechamento e o relatório Z.
+#
+# Cada venda soma sua contribuição nos totais da sessão (SessaoCaixa.quantidade_vendas,
+# total_vendas, total_devolvido, total_faturado) e no resumo por forma de pagamento,
+# dentro da mesma transação que grava a venda. Fechar a sessão e emitir o relatório Z
+# leem só essas linhas, qualquer que seja o volume da sessão. `recalcular` refaz os
+# totais a partir das vendas, para a conferência (manage.py reconciliar_sessoes).
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Case, When, F, Value, Count, Sum, DecimalField, IntegerField
+from rest_framework import serializers, status
+
+from .models import SessaoCaixa, Venda, DevolucaoItemVenda, Fatura, FormaPagamento, ResumoPagamentoSessao
+
+ZERO = Decimal('0.00')
+
+# Contribuição de uma venda (ou de um estorno, com os valores negativos) para a sessão
+Movimento = namedtuple('Movimento', 'sessao_id forma_pagamento vendas total devolvido faturado')
+
+
+class SessaoFechada(serializers.ValidationError):
+    # 409: a venda é válida, mas os totais da sessão já foram fechados (relatório Z emitido)
+    status_code = status.HTTP_409_CONFLICT
+
+    def __init__(self):
+        super().__init__({'sessao_caixa': 'Sessão de caixa não está aberta.'})
+
+
+def negativo(movimento):
+    return movimento._replace(
+        vendas=-movimento.vendas, total=-movimento.total,
+        devolvido=-movimento.devolvido, faturado=-movimento.faturado,
+    )
+
+
+def movimento_da_venda(venda):
+    # Lê do banco (e não dos prefetches) o que a venda soma hoje na sessão
+    devolvido = DevolucaoItemVenda.objects.filter(venda_id=venda.pk).aggregate(
+        total=Sum(F('quantidade') * F('item_venda__preco_unitario'))
+    )['total'] or ZERO
+    faturado = Fatura.objects.filter(venda_id=venda.pk).values_list('valor_total', flat=True).first() or ZERO
+    return Movimento(venda.sessao_caixa_id, venda.forma_pagamento, 1, venda.total, devolvido, faturado)
+
+
+def registrar(movimentos, exigir_aberta=False):
+    """Soma os movimentos nos totais das sessões: um UPDATE e um INSERT ... ON CONFLICT.
+
+    Com `exigir_aberta`, só atualiza sessões abertas e levanta SessaoFechada se alguma
+    já tiver sido fechada (a trava da linha da sessão ordena a venda com o fechamento).
+    """
+    sessoes, formas = {}, {}
+    for m in movimentos:
+        vendas, total, devolvido, faturado = sessoes.get(m.sessao_id, (0, ZERO, ZERO, ZERO))
+        sessoes[m.sessao_id] = (vendas + m.vendas, total + m.total, devolvido + m.devolvido, faturado + m.faturado)
+        quantidade, total = formas.get((m.sessao_id, m.forma_pagamento), (0, ZERO))
+        formas[(m.sessao_id, m.forma_pagamento)] = (quantidade + m.vendas, total + m.total)
+    if not sessoes:
+        return
+
+    def por_sessao(campo, posicao, tipo):
+        return Case(
+            *[When(pk=pk, then=F(campo) + Value(valores[posicao])) for pk, valores in sessoes.items()],
+            default=F(campo),
+            output_field=tipo,
+        )
+
+    # sem_avisos: os totais não fazem parte da sessão guardada no cache
+    atualizar = SessaoCaixa.objects.filter(pk__in=sorted(sessoes)).sem_avisos()
+    if exigir_aberta:
+        atualizar = atualizar.filter(data_fechamento__isnull=True)
+    atualizadas = atualizar.update(
+        quantidade_vendas=por_sessao('quantidade_vendas', 0, IntegerField()),
+        total_vendas=por_sessao('total_vendas', 1, DecimalField(max_digits=12, decimal_places=2)),
+        total_devolvido=por_sessao('total_devolvido', 2, DecimalField(max_digits=12, decimal_places=2)),
+        total_faturado=por_sessao('total_faturado', 3, DecimalField(max_digits=12, decimal_places=2)),
+    )
+    if exigir_aberta and atualizadas != len(sessoes):
+        raise SessaoFechada()
+
+    tabela = ResumoPagamentoSessao._meta.db_table
+    linhas = [(sessao_id, forma, quantidade, total) for (sessao_id, forma), (quantidade, total) in sorted(formas.items())]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {tabela} (sessao_caixa_id, forma_pagamento, quantidade, total) "
+            f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(linhas))} "
+            f"ON CONFLICT (sessao_caixa_id, forma_pagamento) DO UPDATE SET "
+            f"quantidade = {tabela}.quantidade + EXCLUDED.quantidade, total = {tabela}.total + EXCLUDED.total",
+            [valor for linha in linhas for valor in linha],
+        )
+
+
+def relatorio_z(sessao):
+    """Relatório Z da sessão a partir dos totais mantidos (não varre as vendas)."""
+    formas = {
+        forma: (quantidade, total)
+        for forma, quantidade, total in sessao.resumo_pagamentos.values_list('forma_pagamento', 'quantidade', 'total')
+    }
+    rotulos = dict(FormaPagamento.choices)
+    dinheiro = formas.get(FormaPagamento.DINHEIRO, (0, ZERO))[1]
+    esperado = sessao.saldo_inicial + dinheiro
+    return {
+        'sessao': str(sessao.uuid),
+        'caixa': sessao.caixa.nome,
+        'vendedor': sessao.vendedor.username,
+        'data_abertura': sessao.data_abertura,
+        'data_fechamento': sessao.data_fechamento,
+        'quantidade_vendas': sessao.quantidade_vendas,
+        'total_vendas': sessao.total_vendas,
+        'total_devolvido': sessao.total_devolvido,
+        'total_liquido': sessao.total_vendas - sessao.total_devolvido,
+        'total_faturado': sessao.total_faturado,
+        'por_forma_pagamento': [
+            {'forma_pagamento': forma, 'descricao': rotulos.get(forma, forma), 'quantidade': quantidade, 'total': total}
+            for forma, (quantidade, total) in sorted(formas.items())
+            if quantidade
+        ],
+        'saldo_inicial': sessao.saldo_inicial,
+        # Dinheiro esperado na gaveta: saldo inicial + vendas em dinheiro
+        'saldo_esperado': esperado,
+        'saldo_final': sessao.saldo_final,
+        'diferenca': None if sessao.saldo_final is None else sessao.saldo_final - esperado,
+    }
+
+
+def recalcular(sessao_ids):
+    """Totais das sessões refeitos a partir das vendas: {sessao_id: (totais, {forma: (qtd, total)})}."""
+    resultado = {pk: ([0, ZERO, ZERO, ZERO], {}) for pk in sessao_ids}
+    vendas = Venda.objects.filter(sessao_caixa_id__in=sessao_ids)
+    for sessao_id, forma, quantidade, total in (
+        vendas.order_by().values('sessao_caixa_id', 'forma_pagamento')
+        .annotate(quantidade=Count('pk'), soma=Sum('total'))
+        .values_list('sessao_caixa_id', 'forma_pagamento', 'quantidade', 'soma')
+    ):
+        totais, formas = resultado[sessao_id]
+        totais[0] += quantidade
+        totais[1] += total
+        formas[forma] = (quantidade, total)
+    for sessao_id, total in (
+        DevolucaoItemVenda.objects.filter(venda__in=vendas).order_by()
+        .values('venda__sessao_caixa_id').annotate(soma=Sum(F('quantidade') * F('item_venda__preco_unitario')))
+        .values_list('venda__sessao_caixa_id', 'soma')
+    ):
+        resultado[sessao_id][0][2] = total
+    for sessao_id, total in (
+        Fatura.objects.filter(venda__in=vendas).order_by()
+        .values('venda__sessao_caixa_id').annotate(soma=Sum('valor_total'))
+        .values_list('venda__sessao_caixa_id', 'soma')
+    ):
+        resultado[sessao_id][0][3] = total
+    return {pk: (tuple(totais), formas) for pk, (totais, formas) in resultado.items()}
@@ -0,0 +1,181 @@
+# vendas/ingestao.py
+# Ingestão em lote das vendas registradas offline pelos caixas.
+#
+# O terminal envia centenas de vendas de uma vez, cada uma com o uuid gerado por ele.
+# Validação, estoque e gravação são feitos por conjunto (uma consulta por tabela, um
+# UPDATE de estoque, um INSERT por tabela), e o uuid torna o reenvio seguro: vendas que
+# já existem voltam como `ja_registrada` em vez de serem duplicadas. Os totais das sessões
+# (vendas/fechamento.py) recebem o lote inteiro de uma vez.
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import fechamento
+from .estoque import baixar_estoque_em_lote
+from .models import Cliente, Produto, SessaoCaixa, Venda, ItemVenda
+from .serializers import VendaLoteSerializer
+
+CRIADA = 'criada'
+JA_REGISTRADA = 'ja_registrada'
+REJEITADA = 'rejeitada'
+
+TAMANHO_INSERT = 500
+
+
+def _resultado(uuid, situacao, erros=None, precos=None):
+    resultado = {'uuid': None if uuid is None else str(uuid), 'status': situacao}
+    if erros:
+        resultado['erros'] = erros
+    if precos:
+        resultado['precos_divergentes'] = precos
+    return resultado
+
+
+def _preco_cobrado(informado, produto):
+    # O preço do terminal só vale dentro da tolerância (fração do preço do produto)
+    if informado is None or informado == produto.preco:
+        return produto.preco
+    tolerancia = Decimal(str(getattr(settings, 'PDV_INGESTAO_TOLERANCIA_PRECO', 0)))
+    if abs(informado - produto.preco) <= produto.preco * tolerancia:
+        return informado
+    return produto.preco
+
+
+def ingerir_vendas(empresa, usuario, vendas):
+    """Grava as vendas do lote e retorna um resultado por venda, na ordem recebida."""
+    resultados = [None] * len(vendas)
+    validas, vistos = [], set()
+    for i, dados in enumerate(vendas):
+        serializer = VendaLoteSerializer(data=dados)
+        if not serializer.is_valid():
+            uuid = dados.get('uuid') if isinstance(dados, dict) else None
+            resultados[i] = _resultado(uuid, REJEITADA, serializer.errors)
+            continue
+        uuid = serializer.validated_data['uuid']
+        if uuid in vistos:
+            resultados[i] = _resultado(uuid, JA_REGISTRADA)
+            continue
+        vistos.add(uuid)
+        validas.append((i, serializer.validated_data))
+
+    for tentativa in range(2):
+        try:
+            with transaction.atomic():
+                _gravar(empresa, usuario, validas, resultados)
+            break
+        except IntegrityError:
+            # Outro envio do mesmo lote gravou parte das vendas ao mesmo tempo; na segunda
+            # passada elas já aparecem como registradas
+            if tentativa:
+                raise
+    return resultados
+
+
+def _gravar(empresa, usuario, validas, resultados):
+    if not validas:
+        return
+    existentes = dict(
+        Venda.todos.filter(uuid__in=[dados['uuid'] for _, dados in validas]).values_list('uuid', 'empresa_id')
+    )
+    # Como em VendaViewSet.create, só as sessões do próprio usuário
+    sessoes = SessaoCaixa.objects.filter(
+        caixa__empresa=empresa, vendedor=usuario, uuid__in={dados['sessao_caixa_uuid'] for _, dados in validas}
+    ).in_bulk(field_name='uuid')
+    clientes = Cliente.objects.filter(
+        empresa=empresa, uuid__in={dados['cliente_uuid'] for _, dados in validas}
+    ).only('pk', 'uuid').in_bulk(field_name='uuid')
+    produtos = Produto.objects.filter(
+        empresa=empresa, uuid__in={item['produto_uuid'] for _, dados in validas for item in dados['itens']}
+    ).only('pk', 'uuid', 'nome', 'preco').in_bulk(field_name='uuid')
+
+    pendentes = {}
+    for i, dados in validas:
+        uuid = dados['uuid']
+        if uuid in existentes:
+            if existentes[uuid] == empresa.pk:
+                resultados[i] = _resultado(uuid, JA_REGISTRADA)
+            else:
+                resultados[i] = _resultado(uuid, REJEITADA, {'uuid': ['UUID já utilizado.']})
+            continue
+
+        erros = {}
+        sessao = sessoes.get(dados['sessao_caixa_uuid'])
+        if sessao is None:
+            erros['sessao_caixa_uuid'] = ['Sessão de caixa não encontrada entre as suas.']
+        elif not sessao.esta_aberta and 'data_venda' not in dados:
+            erros['sessao_caixa_uuid'] = ['Sessão de caixa já fechada; informe a data_venda da venda.']
+        elif not sessao.esta_aberta and dados['data_venda'] > sessao.data_fechamento:
+            erros['sessao_caixa_uuid'] = ['Venda registrada depois do fechamento da sessão.']
+        if dados['cliente_uuid'] not in clientes:
+            erros['cliente_uuid'] = ['Cliente não encontrado na sua empresa.']
+        faltando = [str(item['produto_uuid']) for item in dados['itens'] if item['produto_uuid'] not in produtos]
+        if faltando:
+            erros['itens'] = [f"Produto com o UUID '{u}' não existe." for u in faltando]
+        if erros:
+            resultados[i] = _resultado(uuid, REJEITADA, erros)
+            continue
+        pendentes[i] = dados
+
+    pedidos = {}
+    for i, dados in pendentes.items():
+        quantidades = {}
+        for item in dados['itens']:
+            pk = produtos[item['produto_uuid']].pk
+            quantidades[pk] = quantidades.get(pk, 0) + item['quantidade']
+        pedidos[i] = quantidades
+    for i, nomes in baixar_estoque_em_lote(pedidos).items():
+        dados = pendentes.pop(i)
+        resultados[i] = _resultado(dados['uuid'], REJEITADA, {
+            'estoque': [f"Estoque insuficiente para o(s) produto(s) {', '.join(repr(nome) for nome in nomes)}."],
+        })
+
+    vendas, itens = [], []
+    for i, dados in pendentes.items():
+        sessao = sessoes[dados['sessao_caixa_uuid']]
+        venda = Venda(
+            uuid=dados['uuid'],
+            empresa=empresa,
+            cliente=clientes[dados['cliente_uuid']],
+            sessao_caixa=sessao,
+            vendedor_id=sessao.vendedor_id,
+            forma_pagamento=dados['forma_pagamento'],
+            total=0,
+            criado_por=usuario,
+            atualizado_por=usuario,
+        )
+        if 'data_venda' in dados:
+            venda.data_venda = dados['data_venda']
+        divergentes = []
+        for item in dados['itens']:
+            produto = produtos[item['produto_uuid']]
+            informado = item.get('preco_unitario')
+            preco = _preco_cobrado(informado, produto)
+            if informado is not None and informado != produto.preco:
+                divergentes.append({
+                    'produto_uuid': str(produto.uuid),
+                    'preco_informado': str(informado),
+                    'preco_produto': str(produto.preco),
+                    'preco_cobrado': str(preco),
+                })
+            venda.total += preco * item['quantidade']
+            itens.append(ItemVenda(
+                venda=venda,
+                produto=produto,
+                quantidade=item['quantidade'],
+                preco_unitario=preco,
+                criado_por=usuario,
+                atualizado_por=usuario,
+            ))
+        vendas.append(venda)
+        resultados[i] = _resultado(dados['uuid'], CRIADA, precos=divergentes)
+
+    Venda.objects.bulk_create(vendas, batch_size=TAMANHO_INSERT)
+    # bulk_create preenche o pk das vendas; os itens já apontam para as instâncias
+    for item in itens:
+        item.venda_id = item.venda.pk
+    ItemVenda.objects.bulk_create(itens, batch_size=TAMANHO_INSERT)
+    fechamento.registrar([
+        fechamento.Movimento(venda.sessao_caixa_id, venda.forma_pagamento, 1, venda.total, fechamento.ZERO, fechamento.ZERO)
+        for venda in vendas
+    ])
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from vendas import esquemas
+from vendas.models import Empresa
+from vendas.relatorios import atualizar_pendentes
+
+
+class Command(BaseCommand):
+    help = "Atualiza os resumos de relatórios com as vendas alteradas desde a última execução (para rodar via cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', action='append', help="UUID da empresa (pode repetir). Padrão: todas as ativas.")
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.filter(ativa=True)
+        if options['empresa']:
+            empresas = empresas.filter(uuid__in=options['empresa'])
+
+        for empresa in empresas.iterator():
+            with esquemas.da_empresa(empresa):
+                dias = atualizar_pendentes(empresa.pk)
+            if dias:
+                self.stdout.write(f"{empresa.nome}: {dias} dia(s) atualizado(s)")
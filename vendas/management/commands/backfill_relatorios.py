@@ -0,0 +1,47 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from vendas import esquemas
+from vendas.models import Empresa, AtualizacaoRelatorio
+from vendas.relatorios import atualizar_dias, periodo_com_vendas
+
+
+class Command(BaseCommand):
+    help = "Refaz os resumos de relatórios do histórico de vendas, em blocos de dias (uma transação por bloco)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', action='append', help="UUID da empresa (pode repetir). Padrão: todas as ativas.")
+        parser.add_argument('--desde', type=datetime.date.fromisoformat, help="Primeiro dia (AAAA-MM-DD). Padrão: primeira venda.")
+        parser.add_argument('--ate', type=datetime.date.fromisoformat, help="Último dia (AAAA-MM-DD). Padrão: última venda.")
+        parser.add_argument('--dias-por-lote', type=int, default=7)
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.filter(ativa=True)
+        if options['empresa']:
+            empresas = empresas.filter(uuid__in=options['empresa'])
+
+        for empresa in empresas.iterator():
+            with esquemas.da_empresa(empresa):
+                self.refazer(empresa, options)
+
+    def refazer(self, empresa, options):
+        inicio_execucao = timezone.now()
+        primeira, ultima = periodo_com_vendas(empresa.pk)
+        desde, ate = options['desde'] or primeira, options['ate'] or ultima
+        if desde is None or ate is None:
+            self.stdout.write(f"{empresa.nome}: sem vendas")
+            return
+
+        dia, lote = desde, datetime.timedelta(days=options['dias_por_lote'])
+        while dia <= ate:
+            fim = min(dia + lote, ate + datetime.timedelta(days=1))
+            atualizar_dias(empresa.pk, [dia + datetime.timedelta(days=n) for n in range((fim - dia).days)])
+            self.stdout.write(f"{empresa.nome}: {dia} a {fim - datetime.timedelta(days=1)}")
+            dia = fim
+
+        # O histórico está em dia: a atualização incremental parte do início deste backfill
+        if not options['desde'] and not options['ate']:
+            AtualizacaoRelatorio.objects.update_or_create(empresa=empresa, defaults={'processado_ate': inicio_execucao})
+        self.stdout.write(self.style.SUCCESS(f"{empresa.nome}: resumos refeitos de {desde} a {ate}"))
@@ -0,0 +1,54 @@
+import random
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from vendas import busca_produtos
+from vendas.benchmark import criar_empresa_benchmark, gerar_catalogo, medir, percentil, rollback_ao_final
+from vendas.views import ProdutoViewSet
+
+
+class Command(BaseCommand):
+    help = "Mede a latência da consulta de produtos (código de barras e busca por nome) em um catálogo grande (os dados são descartados ao final)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produtos', type=int, default=500_000)
+        parser.add_argument('--repeticoes', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        repeticoes = options['repeticoes']
+        aleatorio = random.Random(7)
+        with rollback_ao_final():
+            dados = criar_empresa_benchmark(produtos=0, clientes=1)
+            self.stdout.write(f"Gerando {options['produtos']} produtos...")
+            codigos = gerar_catalogo(dados['empresa'], options['produtos'])
+            self.stdout.write(f"pg_trgm disponível: {busca_produtos.trigrama_disponivel()}")
+
+            view = ProdutoViewSet.as_view({'get': 'lookup'})
+            fabrica = APIRequestFactory()
+
+            def consultar(params):
+                request = fabrica.get('/api/pdv/produtos/lookup/', params)
+                force_authenticate(request, user=dados['vendedor'])
+                # `lookup` é async: a view devolve uma corrotina
+                response = async_to_sync(view)(request)
+                if response.status_code not in (200, 404):
+                    raise CommandError(f'{params}: HTTP {response.status_code}')
+                response.render()
+
+            casos = [
+                ('codigo (leitor)', lambda: consultar({'codigo': aleatorio.choice(codigos)})),
+                ('codigo inexistente', lambda: consultar({'codigo': '0000000000000'})),
+                ('prefixo "caf"', lambda: consultar({'q': 'caf'})),
+                ('prefixo "refrigerante c"', lambda: consultar({'q': 'refrigerante c'})),
+                ('erro de digitação "chocolate garotto"', lambda: consultar({'q': 'chocolate garotto'})),
+            ]
+            self.stdout.write(f"{'consulta':<40} {'queries':>8} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+            for nome, func in casos:
+                func()  # aquece conexão e cache de planos
+                tempos, queries = medir(func, repeticoes)
+                self.stdout.write(
+                    f"{nome:<40} {max(queries):>8} "
+                    f"{percentil(tempos, 50) * 1000:>10.2f} {percentil(tempos, 99) * 1000:>10.2f}"
+                )
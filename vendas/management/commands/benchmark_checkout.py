@@ -0,0 +1,195 @@
+import json
+import platform
+import random
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from vendas.benchmark import criar_empresa_benchmark, gerar_vendas, medir, percentil, remover_empresa_benchmark
+from vendas.models import Caixa, Cliente, SessaoCaixa
+from vendas.sync import codificar_cursor, marca_dagua
+
+# Métricas comparadas com --comparar: só pioras acima da tolerância contam como regressão
+METRICAS_TEMPO = ('p50_ms', 'p95_ms')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o fluxo do caixa pelos endpoints da API (abrir sessão, vender, listar, sincronizar) em uma "
+        "empresa gerada com histórico; grava o resultado em JSON e compara com uma execução anterior "
+        "(os dados são descartados ao final)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produtos', type=int, default=2000)
+        parser.add_argument('--clientes', type=int, default=500)
+        parser.add_argument('--caixas', type=int, default=4)
+        parser.add_argument('--historico', type=int, default=20_000, help='Vendas já registradas na empresa')
+        parser.add_argument('--cestas', type=int, nargs='+', default=[1, 5, 20, 50], help='Itens por venda')
+        parser.add_argument('--repeticoes', type=int, default=50)
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--saida', help='Arquivo JSON onde gravar o resultado')
+        parser.add_argument('--comparar', help='Resultado JSON anterior; piora acima da tolerância encerra com erro')
+        parser.add_argument('--tolerancia', type=float, default=0.2, help='Piora aceita nos tempos (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        if max(options['cestas']) > options['produtos']:
+            raise CommandError('Cada venda usa produtos distintos: --produtos deve ser >= a maior cesta.')
+        anterior = json.loads(Path(options['comparar']).read_text()) if options['comparar'] else None
+        self.aleatorio = random.Random(options['semente'])
+
+        # Os dados vão com commit: numa transação aberta, a marca d'água do feed fica abaixo do
+        # que ela gravou sempre que houver outra mais antiga em andamento, e a sincronização
+        # mediria um feed vazio
+        self.stdout.write('Gerando a empresa...')
+        dados = criar_empresa_benchmark(
+            produtos=options['produtos'], clientes=options['clientes'], caixas=max(options['caixas'], 1),
+        )
+        try:
+            self._completar_empresa(dados, options)
+            self.client = APIClient()
+            self.client.force_authenticate(dados['vendedor'])
+            cenarios = {}
+            self.stdout.write(
+                f"{'cenário':<28} {'queries':>8} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'linhas/s':>10}"
+            )
+            for nome, enviar, preparar, linhas in self._cenarios(dados, options):
+                cenarios[nome] = self._medir(nome, enviar, preparar, linhas, options['repeticoes'])
+        finally:
+            remover_empresa_benchmark(dados['empresa'])
+
+        resultado = {
+            'executado_em': timezone.now().isoformat(),
+            'ambiente': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'postgresql': connection.pg_version,
+            },
+            'parametros': {
+                chave: options[chave]
+                for chave in ('produtos', 'clientes', 'caixas', 'historico', 'cestas', 'repeticoes', 'semente')
+            },
+            'cenarios': cenarios,
+        }
+        if options['saida']:
+            Path(options['saida']).write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+            self.stdout.write(f"Resultado gravado em {options['saida']}")
+        if anterior is not None:
+            self._comparar(anterior, resultado, options['tolerancia'])
+
+    def _completar_empresa(self, dados, options):
+        dados['caixas'] = list(Caixa.objects.filter(empresa=dados['empresa']).order_by('pk'))
+        dados['clientes'] = [str(valor) for valor in Cliente.objects.filter(empresa=dados['empresa']).values_list('uuid', flat=True)]
+        # O histórico fica em uma sessão já fechada; a sessão aberta só tem as vendas do benchmark
+        fechada = SessaoCaixa.objects.create(caixa=dados['caixa'], vendedor=dados['vendedor'], data_fechamento=timezone.now())
+        gerar_vendas({**dados, 'sessao': fechada}, options['historico'], semente=options['semente'])
+
+    def _cenarios(self, dados, options):
+        caixas = dados['caixas']
+        proximo_caixa = iter(range(10 ** 9))
+
+        def preparar_abertura():
+            # Fecha a sessão do caixa que vai ser aberto (sem passar pela API: não é o que se mede)
+            dados['caixa_abertura'] = caixas[next(proximo_caixa) % len(caixas)]
+            SessaoCaixa.objects.filter(caixa=dados['caixa_abertura'], data_fechamento__isnull=True).update(
+                data_fechamento=timezone.now(),
+            )
+
+        yield (
+            'abrir_sessao',
+            lambda: self.client.post('/api/pdv/sessoes-caixa/abrir/', {'caixa_uuid': str(dados['caixa_abertura'].uuid)}, format='json'),
+            preparar_abertura,
+            lambda data: 1,
+        )
+
+        # As vendas vão para a sessão aberta pelo vendedor no último caixa usado acima
+        sessao = SessaoCaixa.objects.get(caixa=dados['caixa_abertura'], data_fechamento__isnull=True)
+        cursor_antes_das_vendas = codificar_cursor(marca_dagua())
+        for cesta in options['cestas']:
+            yield (
+                f'venda_{cesta}_itens',
+                lambda cesta=cesta: self.client.post('/api/pdv/vendas/', self._venda(dados, sessao, cesta), format='json'),
+                None,
+                lambda data: 1 + len(data['itens']),
+            )
+
+        yield ('listar_vendas', lambda: self.client.get('/api/pdv/vendas/'), None, lambda data: len(data['results']))
+        yield (
+            'vendas_abertas_sessao',
+            lambda: self.client.get('/api/pdv/vendas/vendas-abertas-sessao/'),
+            None,
+            len,
+        )
+
+        url_sync = f"/api/pdv/empresas/{dados['empresa'].pk}/dados-atualizados/"
+        yield ('sync_completo', lambda: self.client.get(url_sync, {'cursor': codificar_cursor(0), 'limite': 500}), None, _linhas_feed)
+        yield ('sync_incremental', lambda: self.client.get(url_sync, {'cursor': cursor_antes_das_vendas, 'limite': 500}), None, _linhas_feed)
+
+    def _venda(self, dados, sessao, cesta):
+        return {
+            'cliente_uuid': self.aleatorio.choice(dados['clientes']),
+            'sessao_caixa_uuid': str(sessao.uuid),
+            'forma_pagamento': self.aleatorio.choice(['DIN', 'CRED', 'DEB', 'PIX']),
+            'itens': [
+                {'produto_uuid': str(produto.uuid), 'quantidade': self.aleatorio.randint(1, 3)}
+                for produto in self.aleatorio.sample(dados['produtos'], cesta)
+            ],
+        }
+
+    def _medir(self, nome, enviar, preparar, linhas, repeticoes):
+        respostas = []
+
+        def requisicao():
+            respostas.append(enviar())
+
+        # Aquece conexão, caches e planos
+        if preparar is not None:
+            preparar()
+        requisicao()
+        tempos, queries = medir(requisicao, repeticoes, preparar)
+        for response in respostas:
+            if response.status_code >= 300:
+                raise CommandError(f'{nome}: HTTP {response.status_code} {response.content[:500]!r}')
+        total_linhas = sum(linhas(response.json()) for response in respostas[1:])
+        if not total_linhas:
+            raise CommandError(f'{nome}: nenhuma linha nas respostas, a medição não vale.')
+        metricas = {
+            'requisicoes': repeticoes,
+            'p50_ms': round(percentil(tempos, 50) * 1000, 3),
+            'p95_ms': round(percentil(tempos, 95) * 1000, 3),
+            'p99_ms': round(percentil(tempos, 99) * 1000, 3),
+            'queries_por_requisicao': max(queries),
+            'linhas_por_segundo': round(total_linhas / sum(tempos), 1),
+        }
+        self.stdout.write(
+            f"{nome:<28} {metricas['queries_por_requisicao']:>8} {metricas['p50_ms']:>10.2f} "
+            f"{metricas['p95_ms']:>10.2f} {metricas['p99_ms']:>10.2f} {metricas['linhas_por_segundo']:>10.0f}"
+        )
+        return metricas
+
+    def _comparar(self, anterior, atual, tolerancia):
+        regressoes = []
+        for nome, metricas in atual['cenarios'].items():
+            antes = anterior.get('cenarios', {}).get(nome)
+            if antes is None:
+                continue
+            if metricas['queries_por_requisicao'] > antes['queries_por_requisicao']:
+                regressoes.append(
+                    f"{nome}: queries por requisição {antes['queries_por_requisicao']} -> {metricas['queries_por_requisicao']}"
+                )
+            for metrica in METRICAS_TEMPO:
+                if metricas[metrica] > antes[metrica] * (1 + tolerancia):
+                    regressoes.append(f"{nome}: {metrica} {antes[metrica]:.2f} -> {metricas[metrica]:.2f}")
+        if regressoes:
+            for regressao in regressoes:
+                self.stderr.write(f'Regressão em {regressao}')
+            raise CommandError(f'{len(regressoes)} regressão(ões) em relação a {anterior.get("executado_em", "execução anterior")}.')
+        self.stdout.write(self.style.SUCCESS('Sem regressões em relação à execução anterior.'))
+
+
+def _linhas_feed(data):
+    return sum(len(valor) for valor in data.values() if isinstance(valor, list))
@@ -0,0 +1,61 @@
+import datetime
+import os
+import tempfile
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from vendas import documentos, pdf
+from vendas.benchmark import certificado_autoassinado, criar_empresa_benchmark, rollback_ao_final
+from vendas.models import Venda, ItemVenda, Fatura
+
+
+class Command(BaseCommand):
+    help = "Mede a geração de PDFs de fatura (documentos/s e por processo), com e sem assinatura."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documentos', type=int, default=100)
+        parser.add_argument('--itens', type=int, default=20, help='Itens por fatura')
+        parser.add_argument('--processos', type=int, nargs='+', default=sorted({1, os.cpu_count() or 1}))
+
+    def handle(self, *args, **options):
+        with rollback_ao_final():
+            contexto = self._contexto(options['itens'])
+
+        nucleos = os.cpu_count() or 1
+        with tempfile.TemporaryDirectory() as diretorio:
+            certificado = certificado_autoassinado(os.path.join(diretorio, 'benchmark.pfx'), 'pdv')
+            self.stdout.write(f"{nucleos} núcleo(s), {options['documentos']} documentos de {options['itens']} itens")
+            self.stdout.write(f"{'assinado':>9} {'processos':>10} {'tempo (s)':>10} {'docs/s':>8} {'docs/s/núcleo':>14} {'KB/doc':>7}")
+            for assinar in (False, True):
+                argumentos = (certificado, 'pdv') if assinar else (None, None)
+                for processos in options['processos']:
+                    with pdf.criar_pool(processos, *argumentos) as pool:
+                        # Sobe todos os processos (e o initializer de cada um) antes de medir
+                        list(pool.map(pdf.renderizar_pdf, [contexto] * processos))
+                        inicio = time.perf_counter()
+                        resultados = list(pool.map(pdf.renderizar_pdf, [contexto] * options['documentos']))
+                        duracao = time.perf_counter() - inicio
+                    vazao = options['documentos'] / duracao
+                    tamanho = sum(len(documento) for documento, _ in resultados) / len(resultados) / 1024
+                    self.stdout.write(
+                        f"{'sim' if assinar else 'não':>9} {processos:>10} {duracao:>10.2f} {vazao:>8.1f} "
+                        f"{vazao / min(processos, nucleos):>14.1f} {tamanho:>7.1f}"
+                    )
+
+    def _contexto(self, itens):
+        dados = criar_empresa_benchmark(produtos=itens)
+        venda = Venda.objects.create(
+            empresa=dados['empresa'], cliente=dados['cliente'], sessao_caixa=dados['sessao'],
+            vendedor=dados['vendedor'], total=Decimal('0.00'),
+        )
+        ItemVenda.objects.bulk_create([
+            ItemVenda(venda=venda, produto=produto, quantidade=1 + i % 3, preco_unitario=produto.preco)
+            for i, produto in enumerate(dados['produtos'])
+        ])
+        hoje = datetime.date.today()
+        fatura = Fatura.objects.create(
+            venda=venda, data_emissao=hoje, data_vencimento=hoje + datetime.timedelta(days=30), valor_total=Decimal('100.00'),
+        )
+        return documentos.contexto_fatura(fatura.pk)[1]
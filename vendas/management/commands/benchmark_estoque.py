@@ -0,0 +1,164 @@
+import json
+import platform
+import random
+import threading
+import time
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from vendas.benchmark import criar_empresa_benchmark, percentil, remover_empresa_benchmark
+from vendas.estoque import baixar_estoque
+from vendas.models import Produto
+
+# Métricas comparadas com --comparar: só pioras acima da tolerância contam como regressão
+METRICAS_TEMPO = ('p95_baixa_ms', 'p95_espera_trava_ms')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a baixa de estoque sob disputa: N threads, cada uma com a sua conexão, vendendo o mesmo "
+        "punhado de produtos; grava o resultado em JSON e compara com uma execução anterior (os dados "
+        "são gravados e apagados ao final)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+        parser.add_argument('--produtos', type=int, default=4, help='Produtos disputados por todas as threads')
+        parser.add_argument('--itens', type=int, default=2, help='Produtos por baixa')
+        parser.add_argument('--baixas', type=int, default=200, help='Baixas por thread')
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--saida', help='Arquivo JSON onde gravar o resultado')
+        parser.add_argument('--comparar', help='Resultado JSON anterior; piora acima da tolerância encerra com erro')
+        parser.add_argument('--tolerancia', type=float, default=0.2, help='Piora aceita nos tempos (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        if options['itens'] > options['produtos']:
+            raise CommandError('Cada baixa usa produtos distintos: --produtos deve ser >= --itens.')
+        anterior = json.loads(Path(options['comparar']).read_text()) if options['comparar'] else None
+
+        # As threads têm conexões próprias: os produtos precisam estar gravados com commit
+        dados = criar_empresa_benchmark(produtos=options['produtos'], clientes=1)
+        try:
+            self.stdout.write(
+                f"{'threads':>7} {'baixas/s':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p95 trava (ms)':>15}"
+            )
+            cenarios = {}
+            for threads in options['threads']:
+                cenarios[f'threads_{threads}'] = self._medir(dados['produtos'], threads, options)
+        finally:
+            remover_empresa_benchmark(dados['empresa'])
+
+        resultado = {
+            'executado_em': timezone.now().isoformat(),
+            'ambiente': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'postgresql': connection.pg_version,
+            },
+            'parametros': {
+                chave: options[chave] for chave in ('threads', 'produtos', 'itens', 'baixas', 'semente')
+            },
+            'cenarios': cenarios,
+        }
+        if options['saida']:
+            Path(options['saida']).write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+            self.stdout.write(f"Resultado gravado em {options['saida']}")
+        if anterior is not None:
+            self._comparar(anterior, resultado, options['tolerancia'])
+
+    def _medir(self, produtos, threads, options):
+        ids = [produto.pk for produto in produtos]
+        antes = dict(Produto.objects.filter(pk__in=ids).values_list('pk', 'estoque'))
+        inicio_juntos = threading.Barrier(threads + 1)
+        baixas, esperas, baixado, erros = [], [], [], []
+
+        def vender(numero):
+            aleatorio = random.Random(options['semente'] + numero)
+            meus_tempos, minhas_esperas, meu_total = [], [], {}
+
+            def cronometrar_trava(execute, sql, params, many, context):
+                # A espera pela trava é o tempo do SELECT ... FOR UPDATE de `_travar`
+                if 'FOR UPDATE' not in sql:
+                    return execute(sql, params, many, context)
+                inicio = time.perf_counter()
+                try:
+                    return execute(sql, params, many, context)
+                finally:
+                    minhas_esperas.append(time.perf_counter() - inicio)
+
+            try:
+                with connection.execute_wrapper(cronometrar_trava):
+                    connection.ensure_connection()
+                    inicio_juntos.wait()
+                    for _ in range(options['baixas']):
+                        quantidades = {pk: 1 for pk in aleatorio.sample(ids, options['itens'])}
+                        inicio = time.perf_counter()
+                        baixar_estoque(quantidades)
+                        meus_tempos.append(time.perf_counter() - inicio)
+                        for pk, qtd in quantidades.items():
+                            meu_total[pk] = meu_total.get(pk, 0) + qtd
+            except Exception as exc:
+                erros.append(exc)
+                inicio_juntos.abort()
+            finally:
+                connection.close()
+                baixas.extend(meus_tempos)
+                esperas.extend(minhas_esperas)
+                baixado.append(meu_total)
+
+        trabalhadores = [threading.Thread(target=vender, args=(numero,)) for numero in range(threads)]
+        for trabalhador in trabalhadores:
+            trabalhador.start()
+        try:
+            inicio_juntos.wait()
+        except threading.BrokenBarrierError:
+            pass
+        inicio = time.perf_counter()
+        for trabalhador in trabalhadores:
+            trabalhador.join()
+        duracao = time.perf_counter() - inicio
+        if erros:
+            raise CommandError(f'{threads} thread(s): {erros[0]!r}')
+
+        # Nenhuma baixa pode se perder: o saldo final é o inicial menos tudo o que as threads baixaram
+        depois = dict(Produto.objects.filter(pk__in=ids).values_list('pk', 'estoque'))
+        for pk in ids:
+            esperado = antes[pk] - sum(total.get(pk, 0) for total in baixado)
+            if depois[pk] != esperado:
+                raise CommandError(f'{threads} thread(s): produto {pk} com estoque {depois[pk]}, esperado {esperado}.')
+
+        metricas = {
+            'baixas': len(baixas),
+            'baixas_por_segundo': round(len(baixas) / duracao, 1),
+            'p50_baixa_ms': round(percentil(baixas, 50) * 1000, 3),
+            'p95_baixa_ms': round(percentil(baixas, 95) * 1000, 3),
+            'p95_espera_trava_ms': round(percentil(esperas, 95) * 1000, 3),
+        }
+        self.stdout.write(
+            f"{threads:>7} {metricas['baixas_por_segundo']:>10.0f} {metricas['p50_baixa_ms']:>10.2f} "
+            f"{metricas['p95_baixa_ms']:>10.2f} {metricas['p95_espera_trava_ms']:>15.2f}"
+        )
+        return metricas
+
+    def _comparar(self, anterior, atual, tolerancia):
+        regressoes = []
+        for nome, metricas in atual['cenarios'].items():
+            antes = anterior.get('cenarios', {}).get(nome)
+            if antes is None:
+                continue
+            if metricas['baixas_por_segundo'] < antes['baixas_por_segundo'] * (1 - tolerancia):
+                regressoes.append(
+                    f"{nome}: baixas/s {antes['baixas_por_segundo']:.1f} -> {metricas['baixas_por_segundo']:.1f}"
+                )
+            for metrica in METRICAS_TEMPO:
+                if metricas[metrica] > antes[metrica] * (1 + tolerancia):
+                    regressoes.append(f"{nome}: {metrica} {antes[metrica]:.2f} -> {metricas[metrica]:.2f}")
+        if regressoes:
+            for regressao in regressoes:
+                self.stderr.write(f'Regressão em {regressao}')
+            raise CommandError(f'{len(regressoes)} regressão(ões) em relação a {anterior.get("executado_em", "execução anterior")}.')
+        self.stdout.write(self.style.SUCCESS('Sem regressões em relação à execução anterior.'))
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from vendas.benchmark import criar_empresa_benchmark, gerar_vendas, rollback_ao_final
+from vendas.exportacao import exportar, formatos_disponiveis, EXTENSOES
+from vendas.models import Exportacao
+
+
+class Command(BaseCommand):
+    help = "Mede a vazão (linhas/s) e o pico de memória da exportação de vendas (os dados são descartados ao final)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendas', type=int, default=50_000)
+        parser.add_argument('--itens', type=int, default=5, help='Itens por venda')
+        parser.add_argument('--lotes', type=int, nargs='+', default=[1000, 10_000])
+
+    def handle(self, *args, **options):
+        with rollback_ao_final(), tempfile.TemporaryDirectory() as diretorio:
+            dados = criar_empresa_benchmark(produtos=500)
+            gerar_vendas(dados, options['vendas'], itens=options['itens'])
+            empresa_id = dados['empresa'].pk
+
+            self.stdout.write(
+                f"{'formato':>8} {'tipo':>7} {'lote':>7} {'linhas':>9} {'tempo (s)':>10} {'linhas/s':>10} "
+                f"{'arquivo (MB)':>13} {'pico (MB)':>10}"
+            )
+            for formato in formatos_disponiveis():
+                for tipo in Exportacao.Tipo.values:
+                    for lote in options['lotes']:
+                        destino = Path(diretorio) / f'{tipo}-{lote}{EXTENSOES[formato]}'
+                        inicio = time.perf_counter()
+                        linhas = exportar(empresa_id, destino, formato, tipo, lote=lote)
+                        duracao = time.perf_counter() - inicio
+
+                        # Segunda passada só para o pico de memória (tracemalloc deixa tudo mais lento)
+                        tracemalloc.start()
+                        exportar(empresa_id, destino, formato, tipo, lote=lote)
+                        pico = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+
+                        self.stdout.write(
+                            f"{formato:>8} {tipo:>7} {lote:>7} {linhas:>9} {duracao:>10.2f} {linhas / duracao:>10.0f} "
+                            f"{os.path.getsize(destino) / 2**20:>13.2f} {pico / 2**20:>10.1f}"
+                        )
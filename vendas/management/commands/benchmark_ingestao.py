@@ -0,0 +1,51 @@
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from vendas.benchmark import criar_empresa_benchmark, medir, percentil, rollback_ao_final
+from vendas.ingestao import ingerir_vendas
+
+
+class Command(BaseCommand):
+    help = "Mede a ingestão em lote de vendas offline, incluindo o reenvio do mesmo lote (os dados são descartados ao final)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanhos', type=int, nargs='+', default=[10, 100, 500])
+        parser.add_argument('--itens', type=int, default=5, help='Itens por venda')
+        parser.add_argument('--repeticoes', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rollback_ao_final():
+            dados = criar_empresa_benchmark(produtos=200)
+            self.stdout.write(f"{'vendas':>7} {'envio':>8} {'queries':>8} {'p50 (ms)':>10} {'vendas/s':>10}")
+            for tamanho in options['tamanhos']:
+                lotes = [self._lote(dados, tamanho, options['itens']) for _ in range(options['repeticoes'])]
+                novos, reenvios = iter(lotes), iter(lotes)
+
+                def enviar():
+                    ingerir_vendas(dados['empresa'], dados['vendedor'], next(novos))
+
+                def reenviar():
+                    ingerir_vendas(dados['empresa'], dados['vendedor'], next(reenvios))
+
+                for nome, func in [('novo', enviar), ('reenvio', reenviar)]:
+                    tempos, queries = medir(func, options['repeticoes'])
+                    p50 = percentil(tempos, 50)
+                    self.stdout.write(
+                        f"{tamanho:>7} {nome:>8} {max(queries):>8} {p50 * 1000:>10.2f} {tamanho / p50:>10.0f}"
+                    )
+
+    def _lote(self, dados, tamanho, itens):
+        produtos = dados['produtos']
+        return [
+            {
+                'uuid': str(uuid.uuid4()),
+                'sessao_caixa_uuid': str(dados['sessao'].uuid),
+                'cliente_uuid': str(dados['cliente'].uuid),
+                'itens': [
+                    {'produto_uuid': str(produtos[(n * itens + i) % len(produtos)].uuid), 'quantidade': 1}
+                    for i in range(itens)
+                ],
+            }
+            for n in range(tamanho)
+        ]
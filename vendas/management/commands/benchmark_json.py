@@ -0,0 +1,95 @@
+import io
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from vendas.benchmark import criar_empresa_benchmark, gerar_vendas, medir, percentil, rollback_ao_final
+from vendas.bootstrap import _cabecalho, _linhas, _recursos
+from vendas.models import Venda, ItemVenda, DevolucaoItemVenda
+from vendas.parsers import JSONRapidoParser
+from vendas.renderers import JSONRapidoRenderer, orjson
+from vendas.serializers import VendaSerializer, leitura
+
+
+class Command(BaseCommand):
+    help = "Compara o JSON do DRF com vendas/renderers.py e vendas/parsers.py nos payloads de dados-iniciais e da listagem de vendas (os dados são descartados ao final)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produtos', type=int, default=5000)
+        parser.add_argument('--clientes', type=int, default=2000)
+        parser.add_argument('--vendas', type=int, default=500, help='Vendas na página da listagem')
+        parser.add_argument('--itens', type=int, default=5, help='Itens por venda')
+        parser.add_argument('--repeticoes', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson não instalado: as classes rápidas caem no JSON do DRF.'))
+        else:
+            self.stdout.write(f'orjson {orjson.__version__}')
+
+        with rollback_ao_final():
+            dados = criar_empresa_benchmark(produtos=options['produtos'], clientes=options['clientes'], caixas=10)
+            empresa = dados['empresa']
+            gerar_vendas(dados, options['vendas'], itens=options['itens'])
+
+            iniciais = dict(_cabecalho(empresa))
+            for nome, queryset, recurso in _recursos(empresa):
+                iniciais[nome] = list(_linhas(queryset, recurso))
+
+            vendas = Venda.objects.filter(empresa=empresa).order_by('-criado_em', '-id')[:options['vendas']]
+            pagina = {'next': None, 'previous': None, 'results': VendaSerializer(
+                vendas.select_related('cliente', 'vendedor', 'sessao_caixa__caixa', 'fatura').prefetch_related(
+                    Prefetch('itens', queryset=ItemVenda.objects.select_related('produto').order_by('pk')),
+                    Prefetch('devolucoes_itens', queryset=DevolucaoItemVenda.objects.select_related('item_venda__produto')),
+                ), many=True,
+            ).data}
+            rapida = {'next': None, 'previous': None, 'results': leitura.VENDA.linhas(leitura.VENDA.valores(vendas))}
+
+            # Lote offline como o terminal envia: o corpo que o parser mais recebe
+            lote = {'vendas': [
+                {
+                    'uuid': str(uuid.uuid4()),
+                    'sessao_caixa': str(dados['sessao'].uuid),
+                    'forma_pagamento': 'dinheiro',
+                    'data_venda': venda['data_venda'],
+                    'itens': [
+                        {'produto': str(dados['produtos'][0].uuid), 'quantidade': item['quantidade'], 'preco_unitario': item['preco_unitario']}
+                        for item in venda['itens']
+                    ],
+                }
+                for venda in rapida['results']
+            ]}
+
+        payloads = [
+            ('dados_iniciais', iniciais),
+            ('vendas (serializer)', pagina),
+            ('vendas (leitura)', rapida),
+            ('lote offline', lote),
+        ]
+        drf, rapido = JSONRenderer(), JSONRapidoRenderer()
+        parser_drf, parser_rapido = JSONParser(), JSONRapidoParser()
+        repeticoes = options['repeticoes']
+
+        self.stdout.write(
+            f"{'payload':<20} {'KB':>8} {'render DRF':>11} {'render rápido':>14} {'ganho':>6} "
+            f"{'parse DRF':>10} {'parse rápido':>13} {'ganho':>6}"
+        )
+        for nome, payload in payloads:
+            corpo = drf.render(payload)
+            if rapido.render(payload) != corpo:
+                raise CommandError(f'{nome}: o renderer rápido não reproduz os bytes do DRF.')
+            if parser_rapido.parse(io.BytesIO(corpo)) != parser_drf.parse(io.BytesIO(corpo)):
+                raise CommandError(f'{nome}: o parser rápido não reproduz o do DRF.')
+
+            render_drf = percentil(medir(lambda: drf.render(payload), repeticoes)[0], 50)
+            render_rapido = percentil(medir(lambda: rapido.render(payload), repeticoes)[0], 50)
+            parse_drf = percentil(medir(lambda: parser_drf.parse(io.BytesIO(corpo)), repeticoes)[0], 50)
+            parse_rapido = percentil(medir(lambda: parser_rapido.parse(io.BytesIO(corpo)), repeticoes)[0], 50)
+            self.stdout.write(
+                f"{nome:<20} {len(corpo) / 1024:>8.0f} {render_drf * 1000:>9.2f}ms {render_rapido * 1000:>12.2f}ms "
+                f"{render_drf / render_rapido:>5.1f}x {parse_drf * 1000:>8.2f}ms {parse_rapido * 1000:>11.2f}ms "
+                f"{parse_drf / parse_rapido:>5.1f}x"
+            )
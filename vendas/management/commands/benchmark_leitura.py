@@ -0,0 +1,70 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from vendas.benchmark import criar_empresa_benchmark, gerar_vendas, medir, percentil, rollback_ao_final
+from vendas.models import Cliente, Produto, Caixa, SessaoCaixa, Venda, ItemVenda, DevolucaoItemVenda
+from vendas.serializers import (
+    ClienteSerializer, ProdutoSerializer, CaixaSerializer, SessaoCaixaSerializer, VendaSerializer, leitura,
+)
+
+
+class Command(BaseCommand):
+    help = "Compara linhas/s das listagens pelos serializers do DRF e pelas leituras de vendas/serializers/leitura.py (os dados são descartados ao final)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=500, help='Linhas por listagem (uma página cheia)')
+        parser.add_argument('--itens', type=int, default=5, help='Itens por venda')
+        parser.add_argument('--repeticoes', type=int, default=20)
+
+    def handle(self, *args, **options):
+        linhas = options['linhas']
+        with rollback_ao_final():
+            dados = criar_empresa_benchmark(produtos=max(linhas, options['itens']), clientes=linhas, caixas=linhas)
+            empresa = dados['empresa']
+            SessaoCaixa.objects.bulk_create([
+                SessaoCaixa(caixa=caixa, vendedor=dados['vendedor'], data_fechamento=timezone.now())
+                for caixa in Caixa.objects.filter(empresa=empresa)
+            ])
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {SessaoCaixa._meta.db_table}')
+            gerar_vendas(dados, linhas, itens=options['itens'])
+
+            vendas = Venda.objects.filter(empresa=empresa).select_related('cliente', 'vendedor', 'sessao_caixa__caixa', 'fatura')
+            recursos = [
+                ('clientes', ClienteSerializer, leitura.CLIENTE, Cliente.objects.filter(empresa=empresa).select_related('empresa')),
+                ('produtos', ProdutoSerializer, leitura.PRODUTO, Produto.objects.filter(empresa=empresa).select_related('empresa')),
+                ('caixas', CaixaSerializer, leitura.CAIXA, Caixa.objects.filter(empresa=empresa).select_related('empresa')),
+                ('sessoes', SessaoCaixaSerializer, leitura.SESSAO_CAIXA,
+                 SessaoCaixa.objects.filter(caixa__empresa=empresa).select_related('caixa', 'vendedor')),
+                ('vendas', VendaSerializer, leitura.VENDA, vendas.prefetch_related(
+                    Prefetch('itens', queryset=ItemVenda.objects.select_related('produto').order_by('pk')),
+                    Prefetch('devolucoes_itens', queryset=DevolucaoItemVenda.objects.select_related('item_venda__produto')),
+                )),
+            ]
+            self.stdout.write(
+                f"{'recurso':<10} {'linhas':>7} {'serializer (ms)':>16} {'leitura (ms)':>13} "
+                f"{'serializer l/s':>15} {'leitura l/s':>12} {'ganho':>6}"
+            )
+            for nome, serializer_class, recurso, queryset in recursos:
+                queryset = queryset.order_by('-criado_em', '-id')[:linhas]
+
+                def pelo_serializer():
+                    return serializer_class(list(queryset), many=True).data
+
+                def pela_leitura():
+                    return recurso.linhas(recurso.valores(queryset))
+
+                # As duas saídas precisam ser iguais para a comparação valer
+                if json.loads(json.dumps(pelo_serializer())) != json.loads(json.dumps(pela_leitura())):
+                    raise CommandError(f'{nome}: a leitura não reproduz a saída do serializer.')
+                quantidade = len(pela_leitura())
+                serializer = percentil(medir(pelo_serializer, options['repeticoes'])[0], 50)
+                rapida = percentil(medir(pela_leitura, options['repeticoes'])[0], 50)
+                self.stdout.write(
+                    f"{nome:<10} {quantidade:>7} {serializer * 1000:>16.2f} {rapida * 1000:>13.2f} "
+                    f"{quantidade / serializer:>15.0f} {quantidade / rapida:>12.0f} {serializer / rapida:>5.1f}x"
+                )
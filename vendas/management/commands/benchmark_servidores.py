@@ -0,0 +1,304 @@
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from vendas.benchmark import criar_empresa_benchmark, percentil, remover_empresa_benchmark
+from vendas.sync import codificar_cursor
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a capacidade de conexões simultâneas do modo WSGI (gunicorn) e do ASGI (uvicorn): "
+        "N clientes consultando dados-atualizados ao mesmo tempo e, com K conexões de eventos abertas, "
+        "consultas de produto. Sobe os servidores de verdade contra o banco configurado; os dados são "
+        "gravados e apagados ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servidores', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+        parser.add_argument('--workers', type=int, default=1, help='Processos de cada servidor')
+        parser.add_argument('--threads', type=int, default=1, help='Threads por worker do gunicorn (> 1: gthread)')
+        parser.add_argument('--clientes', type=int, nargs='+', default=[1, 10, 50], help='Clientes simultâneos em dados-atualizados')
+        parser.add_argument('--duracao', type=float, default=5, help='Segundos de carga para cada número de clientes')
+        parser.add_argument('--abertas', type=int, default=100, help='Conexões de eventos mantidas abertas')
+        parser.add_argument('--sondas', type=int, default=20, help='Consultas de produto feitas com as conexões abertas')
+        parser.add_argument('--produtos', type=int, default=2000)
+        parser.add_argument('--limite', type=int, default=100, help='Itens por página do feed')
+        parser.add_argument('--timeout', type=float, default=5, help='Segundos até uma requisição contar como falha')
+        parser.add_argument('--porta', type=int, default=8765)
+        parser.add_argument('--saida', help='Arquivo JSON onde gravar o resultado')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Gerando a empresa...')
+        dados = criar_empresa_benchmark(produtos=options['produtos'], clientes=50, caixas=2)
+        empresa = dados['empresa']
+        cenario = {
+            'token': str(AccessToken.for_user(dados['vendedor'])),
+            'host': next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '')), 'localhost').lstrip('.'),
+            'feed': f'/api/pdv/empresas/{empresa.pk}/dados-atualizados/?' + urlencode({'cursor': codificar_cursor(0), 'limite': options['limite']}),
+            'eventos': f'/api/pdv/empresas/{empresa.pk}/eventos/',
+            'sonda': '/api/pdv/produtos/lookup/?' + urlencode({'q': 'Produto 1'}),
+        }
+        resultados = {}
+        try:
+            for servidor in options['servidores']:
+                with self._servidor(servidor, options) as porta:
+                    self.stdout.write(f"\n{servidor.upper()}: {' '.join(self._comando(servidor, options))}")
+                    resultados[servidor] = asyncio.run(self._medir(porta, cenario, options))
+        finally:
+            remover_empresa_benchmark(empresa)
+
+        if len(resultados) == 2:
+            self._comparar(resultados)
+        if options['saida']:
+            resultado = {
+                'executado_em': timezone.now().isoformat(),
+                'ambiente': {'python': platform.python_version(), 'django': django.get_version(), 'cpus': os.cpu_count()},
+                'parametros': {
+                    chave: options[chave]
+                    for chave in ('workers', 'threads', 'clientes', 'duracao', 'abertas', 'sondas', 'produtos', 'limite', 'timeout')
+                },
+                'servidores': resultados,
+            }
+            Path(options['saida']).write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+            self.stdout.write(f"Resultado gravado em {options['saida']}")
+
+    # Servidores
+
+    def _comando(self, servidor, options):
+        endereco = f"127.0.0.1:{options['porta']}"
+        if servidor == 'wsgi':
+            comando = ['gunicorn', 'pdv_project.wsgi:application', '--bind', endereco, '--workers', str(options['workers'])]
+            if options['threads'] > 1:
+                comando += ['--threads', str(options['threads'])]
+            return comando
+        return [
+            'uvicorn', 'pdv_project.asgi:application', '--host', '127.0.0.1', '--port', str(options['porta']),
+            '--workers', str(options['workers']), '--lifespan', 'off', '--no-access-log',
+        ]
+
+    @contextmanager
+    def _servidor(self, servidor, options):
+        comando = self._comando(servidor, options)
+        ambiente = {
+            **os.environ,
+            'PDV_SERVIDOR': servidor,
+            'DEBUG': 'False',
+            # Os avisos em si não importam aqui, só as conexões abertas
+            'PDV_NOTIFICACOES': 'local',
+            'PDV_EVENTOS_PING': '5',
+            'PDV_EVENTOS_DURACAO': '600',
+        }
+        # Em arquivo: um pipe que ninguém lê travaria o servidor quando enchesse
+        with tempfile.TemporaryFile() as erros:
+            processo = subprocess.Popen(
+                [sys.executable, '-m', *comando], cwd=settings.BASE_DIR, env=ambiente, stdout=subprocess.DEVNULL, stderr=erros,
+            )
+            try:
+                self._aguardar(processo, comando[0], options['porta'], erros)
+                yield options['porta']
+            finally:
+                self._encerrar(processo)
+
+    def _encerrar(self, processo):
+        processo.terminate()
+        try:
+            processo.wait(10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+            processo.wait()
+
+    def _aguardar(self, processo, nome, porta, erros):
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if processo.poll() is not None:
+                erros.seek(0)
+                raise CommandError(f'O {nome} terminou ao iniciar:\n{erros.read().decode(errors="replace")[-2000:]}')
+            try:
+                socket.create_connection(('127.0.0.1', porta), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'O {nome} não aceitou conexões em 30s.')
+
+    # Medição
+
+    async def _medir(self, porta, cenario, options):
+        resultado = {'carga': {}}
+        # Aquece os workers (imports, conexões, caches)
+        for _ in range(options['workers'] * 2):
+            await _Conexao(porta, cenario).get(cenario['feed'], 30)
+
+        self.stdout.write(f"{'clientes':>9} {'req/s':>8} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'falhas':>7}")
+        for clientes in options['clientes']:
+            medida = await self._carga(porta, cenario, clientes, options['duracao'], options['timeout'])
+            resultado['carga'][str(clientes)] = medida
+            self.stdout.write(
+                f"{clientes:>9} {medida['req_por_segundo']:>8.1f} {medida['p50_ms']:>10.1f} {medida['p95_ms']:>10.1f} "
+                f"{medida['p99_ms']:>10.1f} {medida['falhas']:>7}"
+            )
+
+        resultado['eventos'] = medida = await self._abertas(porta, cenario, options)
+        self.stdout.write(
+            f"{options['abertas']} conexões de eventos: {medida['abertas']} abertas; "
+            f"consultas de produto: {medida['sondas_ok']}/{options['sondas']} ok, "
+            f"p50 {medida['p50_ms']:.1f} ms, p95 {medida['p95_ms']:.1f} ms"
+        )
+        return resultado
+
+    async def _carga(self, porta, cenario, clientes, duracao, timeout):
+        tempos, falhas = [], 0
+        fim = time.monotonic() + duracao
+
+        async def cliente():
+            nonlocal falhas
+            conexao = _Conexao(porta, cenario)
+            while time.monotonic() < fim:
+                inicio = time.perf_counter()
+                try:
+                    status = await conexao.get(cenario['feed'], timeout)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    status = None
+                    conexao.fechar()
+                if status == 200:
+                    tempos.append(time.perf_counter() - inicio)
+                else:
+                    falhas += 1
+            conexao.fechar()
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente() for _ in range(clientes)))
+        decorrido = time.perf_counter() - inicio
+        return {
+            'requisicoes': len(tempos),
+            'falhas': falhas,
+            'req_por_segundo': round(len(tempos) / decorrido, 1),
+            **{f'p{p}_ms': round(percentil(tempos, p) * 1000, 1) for p in (50, 95, 99)},
+        }
+
+    async def _abertas(self, porta, cenario, options):
+        conexoes = [_Conexao(porta, cenario) for _ in range(options['abertas'])]
+        abertas = await asyncio.gather(*(
+            conexao.abrir_fluxo(cenario['eventos'], options['timeout']) for conexao in conexoes
+        ))
+        tempos = []
+
+        async def sonda():
+            inicio = time.perf_counter()
+            try:
+                status = await _Conexao(porta, cenario).get(cenario['sonda'], options['timeout'])
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                status = None
+            if status == 200:
+                tempos.append(time.perf_counter() - inicio)
+
+        try:
+            await asyncio.gather(*(sonda() for _ in range(options['sondas'])))
+        finally:
+            for conexao in conexoes:
+                conexao.fechar()
+        return {
+            'abertas': sum(abertas),
+            'sondas_ok': len(tempos),
+            **{f'p{p}_ms': round(percentil(tempos, p) * 1000, 1) for p in (50, 95)},
+        }
+
+    def _comparar(self, resultados):
+        self.stdout.write('\nASGI / WSGI')
+        for clientes, asgi in resultados['asgi']['carga'].items():
+            wsgi = resultados['wsgi']['carga'].get(clientes)
+            if wsgi and wsgi['req_por_segundo'] and wsgi['p95_ms']:
+                self.stdout.write(
+                    f"{clientes:>5} clientes: {asgi['req_por_segundo'] / wsgi['req_por_segundo']:.2f}x req/s, "
+                    f"p95 {asgi['p95_ms'] / wsgi['p95_ms'] if asgi['p95_ms'] else 0:.2f}x"
+                )
+        asgi, wsgi = resultados['asgi']['eventos'], resultados['wsgi']['eventos']
+        self.stdout.write(
+            f"conexões de eventos abertas: {asgi['abertas']} x {wsgi['abertas']}; "
+            f"consultas ok com elas abertas: {asgi['sondas_ok']} x {wsgi['sondas_ok']}"
+        )
+
+
+class _Conexao:
+    """Cliente HTTP/1.1 mínimo: mantém a conexão entre requisições quando o servidor deixa."""
+
+    def __init__(self, porta, cenario):
+        self.porta = porta
+        self.cabecalhos = (
+            f"Host: {cenario['host']}\r\nAuthorization: Bearer {cenario['token']}\r\n".encode()
+        )
+        self.leitor = self.escritor = None
+
+    async def _conectar(self):
+        if self.escritor is None:
+            self.leitor, self.escritor = await asyncio.open_connection('127.0.0.1', self.porta)
+
+    def _pedido(self, caminho, aceita='application/json'):
+        return f'GET {caminho} HTTP/1.1\r\n'.encode() + self.cabecalhos + f'Accept: {aceita}\r\n\r\n'.encode()
+
+    async def _cabecalho(self):
+        bruto = await self.leitor.readuntil(b'\r\n\r\n')
+        linha, *campos = bruto.decode('latin-1').split('\r\n')
+        cabecalhos = {}
+        for campo in filter(None, campos):
+            nome, _, valor = campo.partition(':')
+            cabecalhos[nome.strip().lower()] = valor.strip()
+        return int(linha.split()[1]), cabecalhos
+
+    async def _resposta(self):
+        status, cabecalhos = await self._cabecalho()
+        if 'content-length' in cabecalhos:
+            await self.leitor.readexactly(int(cabecalhos['content-length']))
+        elif cabecalhos.get('transfer-encoding') == 'chunked':
+            while tamanho := int((await self.leitor.readline()).split(b';')[0], 16):
+                await self.leitor.readexactly(tamanho + 2)
+            await self.leitor.readline()
+        else:
+            await self.leitor.read()
+            self.fechar()
+        if cabecalhos.get('connection', '').lower() == 'close':
+            self.fechar()
+        return status
+
+    async def get(self, caminho, timeout):
+        reaproveitada = self.escritor is not None
+        try:
+            await asyncio.wait_for(self._conectar(), timeout)
+            self.escritor.write(self._pedido(caminho))
+            return await asyncio.wait_for(self._resposta(), timeout)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.fechar()
+            if not reaproveitada:
+                raise
+            # O servidor fechou a conexão ociosa: uma nova tentativa
+            return await self.get(caminho, timeout)
+
+    async def abrir_fluxo(self, caminho, timeout):
+        # True se o servidor respondeu 200 ao pedido de eventos; a conexão fica aberta
+        try:
+            await asyncio.wait_for(self._conectar(), timeout)
+            self.escritor.write(self._pedido(caminho, 'text/event-stream'))
+            status, _ = await asyncio.wait_for(self._cabecalho(), timeout)
+            return status == 200
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            return False
+
+    def fechar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+        self.leitor = self.escritor = None
@@ -0,0 +1,128 @@
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from vendas.benchmark import criar_empresa_benchmark, medir, percentil, rollback_ao_final
+from vendas.models import ItemVenda, Produto, Venda
+from vendas.serializers import VendaSerializer
+
+# Métricas comparadas com --comparar: só pioras acima da tolerância contam como regressão
+METRICAS_TEMPO = ('p50_ms', 'p95_ms')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede queries e tempo de gravação de vendas com 1, 20 e 200 itens; com --por-item mede também o "
+        "caminho antigo, um item por vez, como referência. Grava o resultado em JSON e compara com uma "
+        "execução anterior (os dados são descartados ao final)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanhos', type=int, nargs='+', default=[1, 20, 200])
+        parser.add_argument('--repeticoes', type=int, default=20)
+        parser.add_argument('--por-item', action='store_true',
+                            help='Mede também o caminho antigo: uma consulta, um INSERT e um save() por item')
+        parser.add_argument('--saida', help='Arquivo JSON onde gravar o resultado')
+        parser.add_argument('--comparar', help='Resultado JSON anterior; piora acima da tolerância encerra com erro')
+        parser.add_argument('--tolerancia', type=float, default=0.2, help='Piora aceita nos tempos (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        tamanhos = options['tamanhos']
+        anterior = json.loads(Path(options['comparar']).read_text()) if options['comparar'] else None
+        caminhos = [('lote', self._registrar_venda)]
+        if options['por_item']:
+            caminhos.append(('por_item', self._registrar_venda_por_item))
+
+        cenarios = {}
+        with rollback_ao_final():
+            dados = criar_empresa_benchmark(produtos=max(tamanhos))
+            self.stdout.write(f"{'caminho':<10} {'itens':>6} {'queries':>8} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+            for tamanho in tamanhos:
+                for caminho, registrar in caminhos:
+                    tempos, queries = medir(lambda: registrar(dados, tamanho), options['repeticoes'])
+                    metricas = {
+                        'queries_por_venda': max(queries),
+                        'p50_ms': round(percentil(tempos, 50) * 1000, 3),
+                        'p95_ms': round(percentil(tempos, 95) * 1000, 3),
+                    }
+                    cenarios[f'{caminho}_{tamanho}_itens'] = metricas
+                    self.stdout.write(
+                        f"{caminho:<10} {tamanho:>6} {metricas['queries_por_venda']:>8} "
+                        f"{metricas['p50_ms']:>10.2f} {metricas['p95_ms']:>10.2f}"
+                    )
+
+        resultado = {
+            'executado_em': timezone.now().isoformat(),
+            'ambiente': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'postgresql': connection.pg_version,
+            },
+            'parametros': {chave: options[chave] for chave in ('tamanhos', 'repeticoes', 'por_item')},
+            'cenarios': cenarios,
+        }
+        if options['saida']:
+            Path(options['saida']).write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+            self.stdout.write(f"Resultado gravado em {options['saida']}")
+        if anterior is not None:
+            self._comparar(anterior, resultado, options['tolerancia'])
+
+    def _payload(self, dados, tamanho):
+        return {
+            'cliente_uuid': str(dados['cliente'].uuid),
+            'sessao_caixa_uuid': str(dados['sessao'].uuid),
+            'itens': [
+                {'produto_uuid': str(produto.uuid), 'quantidade': 1}
+                for produto in dados['produtos'][:tamanho]
+            ],
+        }
+
+    def _registrar_venda(self, dados, tamanho):
+        serializer = VendaSerializer(data=self._payload(dados, tamanho))
+        serializer.is_valid(raise_exception=True)
+        serializer.save(
+            sessao_caixa=dados['sessao'],
+            cliente=dados['cliente'],
+            vendedor=dados['vendedor'],
+            empresa=dados['empresa'],
+        )
+
+    def _registrar_venda_por_item(self, dados, tamanho):
+        # O caminho de antes da gravação em lote, só para comparação: cada item busca o
+        # produto, grava o item e baixa o estoque com read-modify-write
+        itens = self._payload(dados, tamanho)['itens']
+        produtos = [Produto.objects.get(uuid=item['produto_uuid']) for item in itens]
+        with transaction.atomic():
+            venda = Venda.objects.create(
+                empresa=dados['empresa'], cliente=dados['cliente'], sessao_caixa=dados['sessao'],
+                vendedor=dados['vendedor'],
+                total=sum(produto.preco * item['quantidade'] for produto, item in zip(produtos, itens)),
+            )
+            for produto, item in zip(produtos, itens):
+                ItemVenda.objects.create(
+                    venda=venda, produto=produto, quantidade=item['quantidade'], preco_unitario=produto.preco,
+                )
+                produto.estoque -= item['quantidade']
+                produto.save()
+
+    def _comparar(self, anterior, atual, tolerancia):
+        regressoes = []
+        for nome, metricas in atual['cenarios'].items():
+            antes = anterior.get('cenarios', {}).get(nome)
+            if antes is None:
+                continue
+            if metricas['queries_por_venda'] > antes['queries_por_venda']:
+                regressoes.append(f"{nome}: queries por venda {antes['queries_por_venda']} -> {metricas['queries_por_venda']}")
+            for metrica in METRICAS_TEMPO:
+                if metricas[metrica] > antes[metrica] * (1 + tolerancia):
+                    regressoes.append(f"{nome}: {metrica} {antes[metrica]:.2f} -> {metricas[metrica]:.2f}")
+        if regressoes:
+            for regressao in regressoes:
+                self.stderr.write(f'Regressão em {regressao}')
+            raise CommandError(f'{len(regressoes)} regressão(ões) em relação a {anterior.get("executado_em", "execução anterior")}.')
+        self.stdout.write(self.style.SUCCESS('Sem regressões em relação à execução anterior.'))
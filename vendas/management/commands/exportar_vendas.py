@@ -0,0 +1,40 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vendas import esquemas
+from vendas.exportacao import exportar, formatos_disponiveis, TAMANHO_LOTE
+from vendas.models import Empresa, Exportacao
+
+
+class Command(BaseCommand):
+    help = "Exporta o histórico de vendas de uma empresa para CSV com gzip (ou Parquet, com pyarrow instalado)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('saida', help="Arquivo de destino.")
+        parser.add_argument('--empresa', required=True, help="UUID da empresa.")
+        parser.add_argument('--desde', type=datetime.date.fromisoformat, help="Primeiro dia (AAAA-MM-DD).")
+        parser.add_argument('--ate', type=datetime.date.fromisoformat, help="Último dia (AAAA-MM-DD).")
+        parser.add_argument('--formato', choices=Exportacao.Formato.values, default=Exportacao.Formato.CSV)
+        parser.add_argument('--tipo', choices=Exportacao.Tipo.values, default=Exportacao.Tipo.ITENS,
+                            help="Uma linha por venda ou por item vendido.")
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Linhas lidas do cursor por vez.")
+
+    def handle(self, *args, **options):
+        if options['formato'] not in formatos_disponiveis():
+            raise CommandError(f"Formato {options['formato']} indisponível: instale o pacote pyarrow.")
+        empresa = Empresa.objects.filter(uuid=options['empresa']).first()
+        if empresa is None:
+            raise CommandError(f"Empresa {options['empresa']} não encontrada.")
+
+        inicio = time.perf_counter()
+        with esquemas.da_empresa(empresa):
+            linhas = exportar(
+                empresa.pk, options['saida'], options['formato'], options['tipo'],
+                options['desde'], options['ate'], lote=options['lote'],
+            )
+        duracao = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{empresa.nome}: {linhas} linha(s) em {options['saida']} ({duracao:.1f}s, {linhas / duracao if duracao else 0:.0f} linhas/s)"
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from vendas import esquemas
+from vendas.benchmark import gerar_catalogo
+from vendas.models import Empresa, Produto
+
+
+class Command(BaseCommand):
+    help = "Gera um catálogo de produtos com códigos EAN-13 para testes de carga da busca de produtos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('empresa', help='UUID da empresa que recebe os produtos')
+        parser.add_argument('--quantidade', type=int, default=500_000)
+        parser.add_argument('--semente', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            empresa = Empresa.objects.get(uuid=options['empresa'])
+        except (Empresa.DoesNotExist, ValueError):
+            raise CommandError(f"Empresa {options['empresa']} não encontrada.")
+
+        # Continua a numeração dos códigos a partir do que já existe na empresa
+        with esquemas.da_empresa(empresa):
+            inicio = Produto.objects.filter(empresa=empresa, codigo_barras__isnull=False).count()
+            with transaction.atomic():
+                codigos = gerar_catalogo(empresa, options['quantidade'], semente=options['semente'], inicio=inicio)
+        self.stdout.write(self.style.SUCCESS(f"{len(codigos)} produtos criados em {empresa.nome}."))
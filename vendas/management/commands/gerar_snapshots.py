@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from vendas import esquemas
+from vendas.models import Empresa
+from vendas.snapshots import gerar_snapshot, snapshot_mais_recente, versao_empresa
+
+
+class Command(BaseCommand):
+    help = "Gera os snapshots de carga inicial das empresas (para rodar periodicamente, ex.: via cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', action='append', help="UUID da empresa (pode repetir). Padrão: todas as ativas.")
+        parser.add_argument('--forcar', action='store_true', help="Gera mesmo que o snapshot atual esteja em dia.")
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.filter(ativa=True)
+        if options['empresa']:
+            empresas = empresas.filter(uuid__in=options['empresa'])
+
+        for empresa in empresas.iterator():
+            with esquemas.da_empresa(empresa):
+                versao, _ = snapshot_mais_recente(empresa)
+                if not options['forcar'] and versao is not None and versao_empresa(empresa) <= versao:
+                    self.stdout.write(f"{empresa.nome}: snapshot {versao} em dia")
+                    continue
+                versao, caminho = gerar_snapshot(empresa)
+            self.stdout.write(self.style.SUCCESS(f"{empresa.nome}: snapshot {versao} gerado em {caminho}"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vendas.manutencao_esquemas import esquemas_existentes, migrar_esquemas
+
+
+class Command(BaseCommand):
+    help = "Aplica as migrações pendentes nos esquemas das empresas, em paralelo (rodar depois do migrate)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--esquema', action='append', help="Nome do esquema (pode repetir). Padrão: todos os existentes.")
+        parser.add_argument('--paralelo', type=int, default=4, help="Esquemas migrados ao mesmo tempo (uma conexão cada).")
+
+    def handle(self, *args, **options):
+        nomes = options['esquema'] or esquemas_existentes()
+        if not nomes:
+            self.stdout.write("Nenhum esquema de empresa.")
+            return
+
+        falhas = 0
+        for nome, (aplicadas, erro) in migrar_esquemas(nomes, options['paralelo']).items():
+            if erro is not None:
+                falhas += 1
+                self.stderr.write(self.style.ERROR(f"{nome}: {erro}"))
+            elif aplicadas:
+                self.stdout.write(self.style.SUCCESS(f"{nome}: {', '.join(aplicadas)}"))
+            else:
+                self.stdout.write(f"{nome}: em dia")
+        if falhas:
+            raise CommandError(f"{falhas} de {len(nomes)} esquema(s) com erro.")
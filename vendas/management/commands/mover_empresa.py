@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vendas.manutencao_esquemas import mover_empresa
+from vendas.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        "Move uma empresa das tabelas compartilhadas para o próprio esquema (Empresa.schema_name). "
+        "As tabelas compartilhadas ficam só para leitura durante a cópia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('empresa', help='UUID da empresa')
+
+    def handle(self, *args, **options):
+        try:
+            empresa = Empresa.objects.get(uuid=options['empresa'])
+        except (Empresa.DoesNotExist, ValueError):
+            raise CommandError(f"Empresa {options['empresa']} não encontrada.")
+
+        try:
+            copiadas = mover_empresa(empresa)
+        except ValueError as erro:
+            raise CommandError(str(erro))
+        for tabela, linhas in copiadas.items():
+            if linhas:
+                self.stdout.write(f"{tabela}: {linhas} linha(s)")
+        self.stdout.write(self.style.SUCCESS(f"{empresa.nome} agora está no esquema {empresa.schema_name}."))
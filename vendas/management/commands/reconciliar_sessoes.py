@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from vendas import esquemas
+from vendas.fechamento import recalcular
+from vendas.models import Empresa, SessaoCaixa, ResumoPagamentoSessao
+
+CAMPOS = ('quantidade_vendas', 'total_vendas', 'total_devolvido', 'total_faturado')
+
+
+class Command(BaseCommand):
+    help = "Refaz os totais das sessões de caixa a partir das vendas e aponta as divergências."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', action='append', help="UUID da empresa (pode repetir). Padrão: todas.")
+        parser.add_argument('--desde', help="Só sessões abertas a partir desta data (AAAA-MM-DD).")
+        parser.add_argument('--corrigir', action='store_true', help="Grava os totais recalculados nas sessões divergentes.")
+        parser.add_argument('--lote', type=int, default=500, help="Sessões conferidas por consulta.")
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.order_by('pk')
+        if options['empresa']:
+            empresas = empresas.filter(uuid__in=options['empresa'])
+
+        conferidas = divergentes = 0
+        for empresa in empresas:
+            # As sessões ficam no esquema de cada empresa (vendas/esquemas.py)
+            with esquemas.da_empresa(empresa):
+                conferidas_empresa, divergentes_empresa = self.conferir(empresa, options)
+            conferidas += conferidas_empresa
+            divergentes += divergentes_empresa
+
+        acao = 'corrigida(s)' if options['corrigir'] else 'divergente(s)'
+        estilo = self.style.SUCCESS if not divergentes or options['corrigir'] else self.style.ERROR
+        self.stdout.write(estilo(f"{conferidas} sessão(ões) conferida(s), {divergentes} {acao}."))
+
+    def conferir(self, empresa, options):
+        sessoes = SessaoCaixa.objects.filter(caixa__empresa=empresa).order_by('pk')
+        if options['desde']:
+            sessoes = sessoes.filter(data_abertura__date__gte=options['desde'])
+
+        conferidas = divergentes = 0
+        ids = list(sessoes.values_list('pk', flat=True))
+        for inicio in range(0, len(ids), options['lote']):
+            lote = ids[inicio:inicio + options['lote']]
+            with transaction.atomic():
+                # Trava as sessões do lote para que nenhuma venda mude os totais durante a conferência
+                atuais = {s.pk: s for s in SessaoCaixa.objects.select_for_update().filter(pk__in=lote).only('pk', 'uuid', *CAMPOS)}
+                resumos = {}
+                for sessao_id, forma, quantidade, total in ResumoPagamentoSessao.objects.filter(
+                    sessao_caixa_id__in=lote
+                ).values_list('sessao_caixa_id', 'forma_pagamento', 'quantidade', 'total'):
+                    if quantidade or total:
+                        resumos.setdefault(sessao_id, {})[forma] = (quantidade, total)
+
+                corrigir = []
+                for sessao_id, (totais, formas) in recalcular(lote).items():
+                    sessao = atuais[sessao_id]
+                    gravados = tuple(getattr(sessao, campo) for campo in CAMPOS)
+                    conferidas += 1
+                    if gravados == totais and resumos.get(sessao_id, {}) == formas:
+                        continue
+                    divergentes += 1
+                    diferencas = ', '.join(
+                        f"{campo}: {gravado} -> {correto}"
+                        for campo, gravado, correto in zip(CAMPOS, gravados, totais) if gravado != correto
+                    ) or 'resumo por forma de pagamento'
+                    self.stdout.write(self.style.WARNING(f"Sessão {sessao.uuid}: {diferencas}"))
+                    for campo, valor in zip(CAMPOS, totais):
+                        setattr(sessao, campo, valor)
+                    corrigir.append((sessao, formas))
+
+                if options['corrigir'] and corrigir:
+                    SessaoCaixa.objects.bulk_update([sessao for sessao, _ in corrigir], CAMPOS)
+                    ResumoPagamentoSessao.objects.filter(sessao_caixa_id__in=[sessao.pk for sessao, _ in corrigir]).delete()
+                    ResumoPagamentoSessao.objects.bulk_create([
+                        ResumoPagamentoSessao(sessao_caixa_id=sessao.pk, forma_pagamento=forma, quantidade=quantidade, total=total)
+                        for sessao, formas in corrigir
+                        for forma, (quantidade, total) in formas.items()
+                    ])
+
+        return conferidas, divergentes
@@ -0,0 +1,137 @@
+# vendas/manutencao_esquemas.py
+# Criação, migração e preenchimento dos esquemas das empresas (vendas/esquemas.py).
+#
+# Cada esquema de empresa tem a própria django_migrations e recebe só as tabelas da
+# empresa (RoteadorEsquemas); as chaves estrangeiras para empresas e usuários apontam
+# para as tabelas de public. O deploy fica: `migrate` (public) e depois `migrar_esquemas`.
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+from .esquemas import ESQUEMA_COMPARTILHADO, MODELOS_COMPARTILHADOS, identificador, usar_esquema
+from .models import Empresa
+
+# Caminho de cada tabela da empresa até Empresa (o padrão é o campo `empresa`)
+CAMINHO_EMPRESA = {
+    'sessaocaixa': 'caixa__empresa',
+    'itemvenda': 'venda__empresa',
+    'devolucaoitemvenda': 'venda__empresa',
+    'fatura': 'venda__empresa',
+    'resumopagamentosessao': 'sessao_caixa__caixa__empresa',
+    'documentofatura': 'fatura__venda__empresa',
+}
+
+
+def _caminho(modelo):
+    return CAMINHO_EMPRESA.get(modelo._meta.model_name, 'empresa')
+
+
+def linhas_da_empresa(modelo, empresa):
+    return modelo._base_manager.filter(**{_caminho(modelo): empresa.pk})
+
+
+def modelos_da_empresa():
+    return [
+        modelo for modelo in apps.get_app_config('vendas').get_models()
+        if modelo._meta.managed and not modelo._meta.proxy and modelo._meta.model_name not in MODELOS_COMPARTILHADOS
+    ]
+
+
+def esquemas_existentes():
+    """Esquemas de empresa já criados no banco."""
+    nomes = list(Empresa.todos.values_list('schema_name', flat=True))
+    with usar_esquema(''), connection.cursor() as cursor:
+        cursor.execute('SELECT nspname FROM pg_namespace WHERE nspname = ANY(%s) ORDER BY nspname', [nomes])
+        return [nome for nome, in cursor.fetchall()]
+
+
+def migrar_esquema(nome):
+    """Aplica em `nome` as migrações pendentes e retorna as que foram aplicadas."""
+    with usar_esquema(nome):
+        with connection.cursor() as cursor:
+            # Sem a própria tabela o migrate leria a de public e não faria nada
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {identificador(nome)}.django_migrations '
+                f'(LIKE {ESQUEMA_COMPARTILHADO}.django_migrations INCLUDING ALL)'
+            )
+        antes = MigrationRecorder(connection).applied_migrations().keys()
+        call_command('migrate', interactive=False, skip_checks=True, verbosity=0)
+        depois = MigrationRecorder(connection).applied_migrations().keys()
+    return sorted(f'{app}.{migracao}' for app, migracao in depois - antes)
+
+
+def migrar_esquemas(nomes, paralelo=4):
+    """Migra os esquemas em até `paralelo` threads, uma conexão cada.
+
+    Retorna {esquema: (migrações aplicadas, erro)}; a falha de um esquema não interrompe os outros.
+    Com paralelo <= 1 roda na thread (e na transação) de quem chamou.
+    """
+    def migrar(nome):
+        try:
+            return migrar_esquema(nome), None
+        except Exception as erro:
+            return [], erro
+
+    if paralelo <= 1:
+        return {nome: migrar(nome) for nome in nomes}
+
+    def migrar_e_fechar(nome):
+        try:
+            return migrar(nome)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=paralelo, thread_name_prefix='pdv-migracao') as executor:
+        return dict(zip(nomes, executor.map(migrar_e_fechar, nomes)))
+
+
+def mover_empresa(empresa):
+    """Passa as linhas da empresa das tabelas de public para o esquema próprio.
+
+    As tabelas são criadas e migradas em um esquema temporário, que só recebe o nome
+    definitivo no commit da cópia: até lá as requisições da empresa continuam em public e,
+    depois dele, já encontram o esquema preenchido. Durante a cópia as tabelas de public
+    ficam travadas para escrita (LOCK ... IN SHARE MODE), também para as outras empresas.
+    Retorna {tabela: linhas copiadas}.
+    """
+    if empresa.schema_name in esquemas_existentes():
+        raise ValueError(f"A empresa {empresa} já está no esquema {empresa.schema_name}.")
+    temporario = f'pdv_mover_{empresa.pk}'
+    with usar_esquema(''), connection.cursor() as cursor:
+        cursor.execute(f'DROP SCHEMA IF EXISTS {identificador(temporario)} CASCADE')
+        cursor.execute(f'CREATE SCHEMA {identificador(temporario)}')
+    migrar_esquema(temporario)
+
+    modelos = modelos_da_empresa()
+    copiadas = {}
+    with transaction.atomic():
+        with usar_esquema(''), connection.cursor() as cursor:
+            cursor.execute('LOCK TABLE %s IN SHARE MODE' % ', '.join(
+                f'{ESQUEMA_COMPARTILHADO}.{identificador(modelo._meta.db_table)}' for modelo in modelos
+            ))
+            for modelo in modelos:
+                campos = modelo._meta.concrete_fields
+                linhas = linhas_da_empresa(modelo, empresa).order_by().values_list(*[campo.attname for campo in campos])
+                sql, params = linhas.query.sql_with_params()
+                cursor.execute(
+                    f'INSERT INTO {identificador(temporario)}.{identificador(modelo._meta.db_table)} '
+                    f'({", ".join(identificador(campo.column) for campo in campos)}) {sql}',
+                    params,
+                )
+                copiadas[modelo._meta.db_table] = cursor.rowcount
+            # Os filtros passam pelas tabelas-pai: apaga primeiro as mais distantes de Empresa
+            for modelo in sorted(modelos, key=lambda modelo: _caminho(modelo).count('__'), reverse=True):
+                linhas_da_empresa(modelo, empresa)._raw_delete(connection.alias)
+
+        # Os ids novos continuam depois dos copiados
+        with usar_esquema(temporario), connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), modelos):
+                cursor.execute(sql)
+
+        with usar_esquema(''), connection.cursor() as cursor:
+            cursor.execute(f'ALTER SCHEMA {identificador(temporario)} RENAME TO {identificador(empresa.schema_name)}')
+    return copiadas
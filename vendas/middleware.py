@@ -1,16 +1,139 @@
-# core/middleware.py
-import threading
+# vendas/middleware.py
+# Usuário da auditoria (criado_por / atualizado_por).
+#
+# Guardado em contextvars, e não em threading.local: cada requisição (sync ou async) e
+# cada tarefa tem o seu contexto, mesmo quando várias dividem a mesma thread sob ASGI,
+# e o valor some quando a requisição termina. O middleware guarda a requisição e não o
+# usuário: a autenticação do DRF (JWT) só acontece na view, e é ela que preenche
+# request.user. Fora de requisições (comandos, tarefas, lotes) use `usuario_atual`.
+import contextvars
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.utils.functional import LazyObject, empty
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+_requisicao = contextvars.ContextVar('pdv_requisicao', default=None)
+_usuario = contextvars.ContextVar('pdv_usuario', default=None)
 
-_user = threading.local()
 
 def get_current_user():
-    return getattr(_user, 'value', None)
+    usuario = _usuario.get()
+    if usuario is not None:
+        return usuario
+    request = _requisicao.get()
+    usuario = getattr(request, 'user', None)
+    return usuario if usuario is not None and usuario.is_authenticated else None
+
+
+def usuario_resolvido():
+    """Como get_current_user, mas sem avaliar um request.user ainda preguiçoso.
+
+    Não faz consultas: é chamada a cada cursor aberto (vendas/esquemas.py), inclusive
+    durante a própria carga do usuário.
+    """
+    usuario = _usuario.get()
+    if usuario is not None:
+        return usuario
+    usuario = getattr(_requisicao.get(), 'user', None)
+    if usuario is None or (isinstance(usuario, LazyObject) and usuario._wrapped is empty):
+        return None
+    return usuario if usuario.is_authenticated else None
+
+
+def iterar_no_contexto(iteravel):
+    """Consome `iteravel` no contexto atual (usuário, esquema da empresa, réplica).
+
+    Para o conteúdo de StreamingHttpResponse, que é gerado depois que a view e os
+    middlewares já retornaram.
+    """
+    contexto = contextvars.copy_context()
+    iterador = iter(iteravel)
+    while True:
+        try:
+            item = contexto.run(next, iterador)
+        except StopIteration:
+            return
+        yield item
+
+
+_FIM = object()
+
+
+async def aiterar_no_contexto(iteravel):
+    """iterar_no_contexto para ASGI, em que o conteúdo tem que ser um iterador assíncrono.
+
+    Cada item é gerado na thread da requisição (sync_to_async): as consultas e a montagem
+    do JSON ficam fora do event loop, que só repassa os blocos.
+    """
+    contexto = contextvars.copy_context()
+    iterador = iter(iteravel)
+    proximo = sync_to_async(lambda: contexto.run(next, iterador, _FIM))
+    while (item := await proximo()) is not _FIM:
+        yield item
+
+
+@contextmanager
+def usuario_atual(usuario):
+    """Define o usuário da auditoria dentro do bloco (comandos, tarefas em segundo plano)."""
+    token = _usuario.set(usuario)
+    try:
+        yield usuario
+    finally:
+        _usuario.reset(token)
+
 
 class CurrentUserMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _requisicao.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _requisicao.reset(token)
+
+    async def __acall__(self, request):
+        token = _requisicao.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _requisicao.reset(token)
+
+
+class ArquivosEstaticosMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware que também roda como middleware assíncrono.
+
+    O do WhiteNoise é só síncrono: sob ASGI o Django levaria toda requisição para uma
+    thread para atravessá-lo e voltaria ao event loop para as views assíncronas. Aqui só a
+    entrega de um arquivo estático sai do event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        _user.value = request.user if request.user.is_authenticated else None
-        response = self.get_response(request)
-        return response
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 12:18
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('deletado_em', models.DateTimeField(blank=True, null=True)),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('quantidade', models.PositiveIntegerField()),
+                ('expira_em', models.DateTimeField(help_text='Após este horário a reserva deixa de segurar o estoque.')),
+                ('atualizado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_atualizado_por', to=settings.AUTH_USER_MODEL)),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_criado_por', to=settings.AUTH_USER_MODEL)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vendas.empresa')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='vendas.produto')),
+                ('sessao_caixa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_estoque', to='vendas.sessaocaixa')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Estoque',
+                'verbose_name_plural': 'Reservas de Estoque',
+                'indexes': [models.Index(fields=['produto', 'expira_em'], name='reserva_produto_expira_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2 on 2026-10-18 12:18
+
+import uuid
+from django.db import migrations, models
+
+
+def gerar_uuid_usuarios(apps, schema_editor):
+    Usuario = apps.get_model('vendas', 'Usuario')
+    for usuario in Usuario.objects.only('pk'):
+        usuario.uuid = uuid.uuid4()
+        usuario.save(update_fields=['uuid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('vendas', '0002_reserva_estoque'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='caixa',
+            name='versao',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='versao',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='versao',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, null=True),
+        ),
+        migrations.RunPython(gerar_uuid_usuarios, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='usuario',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='versao',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            sql=[
+                "CREATE SEQUENCE IF NOT EXISTS vendas_versao_seq",
+                "UPDATE vendas_cliente SET versao = nextval('vendas_versao_seq')",
+                "UPDATE vendas_produto SET versao = nextval('vendas_versao_seq')",
+                "UPDATE vendas_caixa SET versao = nextval('vendas_versao_seq')",
+                "UPDATE vendas_usuario SET versao = nextval('vendas_versao_seq')",
+            ],
+            reverse_sql="DROP SEQUENCE IF EXISTS vendas_versao_seq",
+        ),
+        migrations.AddIndex(
+            model_name='caixa',
+            index=models.Index(fields=['empresa', 'versao'], name='caixa_empresa_versao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caixa',
+            index=models.Index(fields=['empresa', 'atualizado_em'], name='caixa_empresa_atualiz_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['empresa', 'versao'], name='cliente_empresa_versao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['empresa', 'atualizado_em'], name='cliente_empresa_atualiz_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['empresa', 'versao'], name='produto_empresa_versao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['empresa', 'atualizado_em'], name='produto_empresa_atualiz_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['empresa', 'versao'], name='usuario_empresa_versao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['empresa', 'atualizado_em'], name='usuario_empresa_atualiz_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0003_sincronizacao_incremental'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='caixa',
+            index=models.Index(fields=['empresa', 'criado_em', 'id'], name='caixa_empresa_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['empresa', 'criado_em', 'id'], name='cliente_empresa_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['empresa', 'criado_em', 'id'], name='produto_empresa_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['empresa', 'data_venda', 'id'], name='venda_empresa_data_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-18 12:27
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import DatabaseError, migrations, models, transaction
+
+
+def criar_indice_trigrama(apps, schema_editor):
+    # pg_trgm é opcional: sem a extensão (ou sem permissão para criá-la) a busca
+    # por nome fica só no índice de prefixo.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                cursor.execute(
+                    'CREATE INDEX IF NOT EXISTS produto_nome_trgm_idx '
+                    'ON vendas_produto USING gin (nome gin_trgm_ops)'
+                )
+        except DatabaseError:
+            pass
+
+
+def remover_indice_trigrama(apps, schema_editor):
+    schema_editor.execute('DROP INDEX IF EXISTS produto_nome_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0004_indices_paginacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='codigo_barras',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(models.F('empresa'), django.db.models.functions.comparison.Collate(django.db.models.functions.text.Lower('nome'), 'C'), models.F('id'), name='produto_nome_prefixo_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='produto',
+            constraint=models.UniqueConstraint(condition=models.Q(('codigo_barras__isnull', False)), fields=('empresa', 'codigo_barras'), name='produto_codigo_barras_unico'),
+        ),
+        migrations.RunPython(criar_indice_trigrama, remover_indice_trigrama, hints={'esquema_da_empresa': True}),
+    ]
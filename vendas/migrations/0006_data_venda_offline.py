@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 12:32
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0005_busca_produtos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='venda',
+            name='data_venda',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2 on 2026-10-18 12:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Preenche os totais das sessões que já existem (depois disso são mantidos a cada venda)
+PREENCHER_TOTAIS = """
+UPDATE vendas_sessaocaixa s SET
+    quantidade_vendas = COALESCE(v.quantidade, 0),
+    total_vendas = COALESCE(v.total, 0),
+    total_devolvido = COALESCE(d.total, 0),
+    total_faturado = COALESCE(f.total, 0)
+FROM vendas_sessaocaixa s2
+LEFT JOIN (
+    SELECT sessao_caixa_id, COUNT(*) AS quantidade, SUM(total) AS total
+    FROM vendas_venda WHERE deletado_em IS NULL GROUP BY sessao_caixa_id
+) v ON v.sessao_caixa_id = s2.id
+LEFT JOIN (
+    SELECT venda.sessao_caixa_id, SUM(dev.quantidade * item.preco_unitario) AS total
+    FROM vendas_devolucaoitemvenda dev
+    JOIN vendas_venda venda ON venda.id = dev.venda_id AND venda.deletado_em IS NULL
+    JOIN vendas_itemvenda item ON item.id = dev.item_venda_id
+    GROUP BY venda.sessao_caixa_id
+) d ON d.sessao_caixa_id = s2.id
+LEFT JOIN (
+    SELECT venda.sessao_caixa_id, SUM(fat.valor_total) AS total
+    FROM vendas_fatura fat
+    JOIN vendas_venda venda ON venda.id = fat.venda_id AND venda.deletado_em IS NULL
+    GROUP BY venda.sessao_caixa_id
+) f ON f.sessao_caixa_id = s2.id
+WHERE s.id = s2.id;
+
+INSERT INTO vendas_resumopagamentosessao (sessao_caixa_id, forma_pagamento, quantidade, total)
+SELECT sessao_caixa_id, forma_pagamento, COUNT(*), SUM(total)
+FROM vendas_venda WHERE deletado_em IS NULL
+GROUP BY sessao_caixa_id, forma_pagamento;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0006_data_venda_offline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessaocaixa',
+            name='quantidade_vendas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sessaocaixa',
+            name='total_devolvido',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='sessaocaixa',
+            name='total_faturado',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='sessaocaixa',
+            name='total_vendas',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='venda',
+            name='forma_pagamento',
+            field=models.CharField(choices=[('DIN', 'Dinheiro'), ('CRED', 'Cartão de Crédito'), ('DEB', 'Cartão de Débito'), ('PIX', 'Pix'), ('OUT', 'Outro')], default='DIN', max_length=4),
+        ),
+        migrations.CreateModel(
+            name='ResumoPagamentoSessao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('forma_pagamento', models.CharField(choices=[('DIN', 'Dinheiro'), ('CRED', 'Cartão de Crédito'), ('DEB', 'Cartão de Débito'), ('PIX', 'Pix'), ('OUT', 'Outro')], max_length=4)),
+                ('quantidade', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('sessao_caixa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumo_pagamentos', to='vendas.sessaocaixa')),
+            ],
+            options={
+                'verbose_name': 'Resumo de Pagamento da Sessão',
+                'verbose_name_plural': 'Resumos de Pagamento das Sessões',
+                'constraints': [models.UniqueConstraint(fields=('sessao_caixa', 'forma_pagamento'), name='resumo_pagamento_sessao_unico')],
+            },
+        ),
+        migrations.RunSQL(PREENCHER_TOTAIS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2 on 2026-10-18 12:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0007_totais_sessao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AtualizacaoRelatorio',
+            fields=[
+                ('empresa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='vendas.empresa')),
+                ('processado_ate', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumoProdutoDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('quantidade', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Resumo de Produto por Dia',
+                'verbose_name_plural': 'Resumos de Produto por Dia',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoVendasHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('hora', models.PositiveSmallIntegerField()),
+                ('quantidade_vendas', models.IntegerField(default=0)),
+                ('itens_vendidos', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Resumo de Vendas por Hora',
+                'verbose_name_plural': 'Resumos de Vendas por Hora',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['empresa', 'atualizado_em'], name='venda_empresa_atualiz_idx'),
+        ),
+        migrations.AddField(
+            model_name='resumoprodutodia',
+            name='empresa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vendas.empresa'),
+        ),
+        migrations.AddField(
+            model_name='resumoprodutodia',
+            name='produto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vendas.produto'),
+        ),
+        migrations.AddField(
+            model_name='resumovendashora',
+            name='caixa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vendas.caixa'),
+        ),
+        migrations.AddField(
+            model_name='resumovendashora',
+            name='empresa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vendas.empresa'),
+        ),
+        migrations.AddField(
+            model_name='resumovendashora',
+            name='vendedor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='resumoprodutodia',
+            index=models.Index(fields=['empresa', 'dia'], name='resumo_produto_empresa_dia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resumovendashora',
+            index=models.Index(fields=['empresa', 'dia'], name='resumo_hora_empresa_dia_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 12:41
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0008_relatorios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Exportacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('formato', models.CharField(choices=[('csv', 'CSV (gzip)'), ('parquet', 'Parquet')], default='csv', max_length=10)),
+                ('tipo', models.CharField(choices=[('vendas', 'Uma linha por venda'), ('itens', 'Uma linha por item vendido')], default='itens', max_length=10)),
+                ('inicio', models.DateField(blank=True, null=True)),
+                ('fim', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=12)),
+                ('linhas', models.BigIntegerField(default=0)),
+                ('tamanho', models.BigIntegerField(blank=True, help_text='Tamanho do arquivo em bytes.', null=True)),
+                ('arquivo', models.CharField(blank=True, max_length=500)),
+                ('erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exportacoes', to='vendas.empresa')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exportação de Vendas',
+                'verbose_name_plural': 'Exportações de Vendas',
+                'indexes': [models.Index(fields=['empresa', 'criado_em'], name='exportacao_empresa_criado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 12:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0009_exportacoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoFatura',
+            fields=[
+                ('fatura', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='documento', serialize=False, to='vendas.fatura')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('gerado', 'Gerado'), ('erro', 'Erro')], default='pendente', max_length=10)),
+                ('arquivo', models.CharField(blank=True, max_length=500)),
+                ('tamanho', models.BigIntegerField(blank=True, help_text='Tamanho do arquivo em bytes.', null=True)),
+                ('assinado', models.BooleanField(default=False)),
+                ('fatura_atualizada_em', models.DateTimeField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True)),
+                ('gerado_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Documento de Fatura',
+                'verbose_name_plural': 'Documentos de Fatura',
+            },
+        ),
+    ]
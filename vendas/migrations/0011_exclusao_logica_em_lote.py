@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-18 12:49
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0010_documentos_fatura'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='caixa',
+            name='caixa_empresa_criado_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cliente',
+            name='cliente_empresa_criado_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='produto',
+            name='produto_empresa_criado_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='produto',
+            name='produto_nome_prefixo_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='reservaestoque',
+            name='reserva_produto_expira_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='venda',
+            name='venda_empresa_data_idx',
+        ),
+        migrations.AddIndex(
+            model_name='caixa',
+            index=models.Index(condition=models.Q(('deletado_em__isnull', True)), fields=['empresa', 'criado_em', 'id'], name='caixa_empresa_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(condition=models.Q(('deletado_em__isnull', True)), fields=['empresa', 'criado_em', 'id'], name='cliente_empresa_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(condition=models.Q(('deletado_em__isnull', True)), fields=['empresa', 'criado_em', 'id'], name='produto_empresa_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(models.F('empresa'), django.db.models.functions.comparison.Collate(django.db.models.functions.text.Lower('nome'), 'C'), models.F('id'), condition=models.Q(('deletado_em__isnull', True)), name='produto_nome_prefixo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservaestoque',
+            index=models.Index(condition=models.Q(('deletado_em__isnull', True)), fields=['produto', 'expira_em'], name='reserva_produto_expira_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(condition=models.Q(('deletado_em__isnull', True)), fields=['empresa', 'data_venda', 'id'], name='venda_empresa_data_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0011_exclusao_logica_em_lote'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usuario',
+            name='caixa_atual',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usuarios_com_caixa_aberto', to='vendas.caixa'),
+        ),
+    ]
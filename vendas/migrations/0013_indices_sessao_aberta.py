@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 13:04
+
+from django.db import migrations, models
+
+# Sessões abertas em duplicidade (a checagem antiga em abrir_sessao tinha corrida): fica
+# aberta só a mais recente de cada caixa, para o índice único poder ser criado
+FECHAR_DUPLICADAS = """
+UPDATE vendas_sessaocaixa s SET data_fechamento = now()
+WHERE s.data_fechamento IS NULL AND s.deletado_em IS NULL AND EXISTS (
+    SELECT 1 FROM vendas_sessaocaixa o
+    WHERE o.caixa_id = s.caixa_id AND o.data_fechamento IS NULL AND o.deletado_em IS NULL
+      AND (o.data_abertura, o.id) > (s.data_abertura, s.id)
+)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0012_esquemas_empresa'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FECHAR_DUPLICADAS, migrations.RunSQL.noop, hints={'esquema_da_empresa': True}),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(condition=models.Q(('deletado_em__isnull', True)), fields=['sessao_caixa', 'data_venda'], name='venda_sessao_data_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='sessaocaixa',
+            constraint=models.UniqueConstraint(condition=models.Q(('deletado_em__isnull', True), ('data_fechamento__isnull', True)), fields=('caixa',), name='sessao_caixa_aberta_unica'),
+        ),
+    ]
@@ -4,4 +4,8 @@ from .cliente import Cliente
 from .produto import Produto
 from .caixa import Caixa
 from .sessao_caixa import SessaoCaixa
-from .venda import Venda, ItemVenda, DevolucaoItemVenda, Fatura
\ No newline at end of file
+from .venda import Venda, ItemVenda, DevolucaoItemVenda, Fatura, FormaPagamento, ResumoPagamentoSessao
+from .reserva_estoque import ReservaEstoque
+from .relatorio import ResumoVendasHora, ResumoProdutoDia, AtualizacaoRelatorio
+from .exportacao import Exportacao
+from .documento import DocumentoFatura
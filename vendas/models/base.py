@@ -1,5 +1,6 @@
 # models/base.py
-from django.db import models
+from django.db import models, connection, connections, transaction, DEFAULT_DB_ALIAS
+from django.dispatch import Signal
 from django.utils import timezone
 from django.conf import settings
 from ..middleware import get_current_user
@@ -26,6 +27,9 @@ class SoftDeleteModel(models.Model):
     class Meta:
         abstract = True
 
+# Condição dos índices parciais: as consultas de `objects` só enxergam as linhas não excluídas
+ATIVOS = models.Q(deletado_em__isnull=True)
+
 class AuditModel(models.Model):
     criado_por = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -50,8 +54,202 @@ class AuditModel(models.Model):
         self.atualizado_por = user
         super().save(*args, **kwargs)
 
+SEQUENCIA_VERSAO = 'vendas_versao_seq'
+BITS_SEQUENCIA = 20
+
+# Versão = (id da transação que grava << 20) | (número da sequência nos 20 bits baixos).
+# Ordenar por versão é ordenar pela transação que gravou: uma transação que ainda vai
+# fazer commit tem id >= ao da mais antiga em andamento, e portanto versão maior que
+# qualquer cursor limitado por `versao_atual()`. Exige PostgreSQL 13 (pg_current_xact_id).
+_SQL_VERSAO = (
+    f"((pg_current_xact_id()::text::bigint << {BITS_SEQUENCIA})"
+    f" | (nextval('{SEQUENCIA_VERSAO}') & {(1 << BITS_SEQUENCIA) - 1}))"
+)
+
+class ProximaVersao(models.Func):
+    # Para UPDATEs em lote: `qs.update(versao=ProximaVersao())`
+    template = _SQL_VERSAO
+    output_field = models.BigIntegerField()
+
+def proxima_versao():
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {_SQL_VERSAO}")
+        return cursor.fetchone()[0]
+
+def versao_atual(using=DEFAULT_DB_ALIAS):
+    """Marca d'água das versões: toda versão que ainda vai aparecer é maior que ela.
+
+    Limitada pela transação mais antiga ainda em andamento. Se a transação atual já
+    gravou e nenhuma anterior a ela pode estar em andamento, o que ela gravou conta
+    como visto e só o que gravar depois fica acima; havendo uma anterior em andamento,
+    as gravações da própria transação ficam acima da marca e só aparecem numa leitura
+    depois do commit. Serve de cursor inicial e de teto para as páginas do feed de
+    sincronização; `using` é o banco de onde as linhas serão lidas (numa réplica, vale
+    o que ela já aplicou).
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_snapshot_xmax(s)::text::bigint,"
+            " ARRAY(SELECT x::text::bigint FROM pg_snapshot_xip(s) x),"
+            " pg_current_xact_id_if_assigned()::text::bigint,"
+            " q.last_value - (NOT q.is_called)::int"
+            f" FROM pg_current_snapshot() s, {SEQUENCIA_VERSAO} q"
+        )
+        xmax, em_andamento, propria, ultimo = cursor.fetchone()
+        if propria is None:
+            return (min(em_andamento, default=xmax) << BITS_SEQUENCIA) - 1
+        if xmax < propria:
+            # xmax é a última transação concluída + 1: as de xmax até a própria não estão
+            # no snapshot e podem estar em andamento
+            cursor.execute(
+                "SELECT x FROM generate_series(%s::bigint, %s::bigint) x"
+                " WHERE pg_xact_status(x::text::xid8) = 'in progress'",
+                [xmax, propria - 1],
+            )
+            em_andamento += [x for x, in cursor.fetchall()]
+        anteriores = [x for x in em_andamento if x < propria]
+        if anteriores:
+            return (min(anteriores) << BITS_SEQUENCIA) - 1
+        return (propria << BITS_SEQUENCIA) | (ultimo & ((1 << BITS_SEQUENCIA) - 1))
+
+class VersionadoModel(models.Model):
+    # Versão global (acima), renovada a cada gravação; base do feed de sincronização incremental
+    versao = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.versao = proxima_versao()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'versao'}
+        super().save(*args, **kwargs)
+
+# Enviado pelas gravações em lote de BaseQuerySet no lugar do post_save de cada linha:
+# sender é o modelo e `linhas`, [(empresa_id, uuid, removido)] das linhas gravadas.
+# Só é montado para os modelos com receptores (vendas/signals.py).
+alteracao_em_lote = Signal()
+
+class BaseQuerySet(models.QuerySet):
+    """Operações em lote com o mesmo efeito do save()/delete() de cada instância.
+
+    Como QuerySet.update, nenhuma delas dispara post_save/post_delete; em vez disso
+    enviam `alteracao_em_lote` com as linhas gravadas.
+    """
+    _avisar = True
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._avisar = self._avisar
+        return clone
+
+    def sem_avisos(self):
+        # Para quem avisa por conta própria ou não muda o que os receptores usam
+        # (baixa de estoque, totais da sessão): update sem alteracao_em_lote
+        clone = self._chain()
+        clone._avisar = False
+        return clone
+
+    def _versionado(self):
+        return issubclass(self.model, VersionadoModel)
+
+    def _com_avisos(self):
+        return self._avisar and alteracao_em_lote.has_listeners(self.model)
+
+    def _avisar_alteracao(self, pks):
+        if not pks:
+            return
+        campo_empresa = getattr(self.model, 'CAMPO_EMPRESA', 'empresa_id')
+        linhas = [
+            (empresa_id, uuid, deletado_em is not None)
+            for empresa_id, uuid, deletado_em in self.model._base_manager.using(self.db)
+            .filter(pk__in=pks).values_list(campo_empresa, 'uuid', 'deletado_em')
+        ]
+        alteracao_em_lote.send(sender=self.model, linhas=linhas)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        user = get_current_user()
+        for obj in objs:
+            if obj.criado_por_id is None:
+                obj.criado_por = user
+            if obj.atualizado_por_id is None:
+                obj.atualizado_por = user
+            if self._versionado() and not obj.versao:
+                obj.versao = ProximaVersao()
+        criados = super().bulk_create(objs, *args, **kwargs)
+        if self._com_avisos():
+            self._avisar_alteracao([obj.pk for obj in criados if obj.pk is not None])
+        return criados
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        user = get_current_user()
+        agora = timezone.now()
+        fields = {*fields, 'atualizado_em', 'atualizado_por'}
+        if self._versionado():
+            fields.add('versao')
+        for obj in objs:
+            obj.atualizado_em = agora
+            obj.atualizado_por = user
+            if self._versionado():
+                obj.versao = ProximaVersao()
+        linhas = super().bulk_update(objs, fields, batch_size=batch_size)
+        if self._com_avisos():
+            self._avisar_alteracao([obj.pk for obj in objs])
+        return linhas
+
+    def update(self, **kwargs):
+        if not self._com_avisos() or self.query.is_sliced:
+            return super().update(**kwargs)
+        self._for_write = True
+        with transaction.atomic(using=self.db, savepoint=False):
+            # O UPDATE não diz quais linhas alterou: elas são travadas e lidas antes
+            pks = list(self.select_for_update(of=('self',)).values_list('pk', flat=True))
+            linhas = models.QuerySet.update(self.model._base_manager.using(self.db).filter(pk__in=pks), **kwargs)
+            self._avisar_alteracao(pks)
+        return linhas
+
+    update.alters_data = True
+
+    def delete(self):
+        # Exclusão lógica em um único UPDATE (os receptores de alteracao_em_lote recebem as linhas como removidas)
+        agora = timezone.now()
+        campos = {'deletado_em': agora, 'atualizado_em': agora, 'atualizado_por': get_current_user()}
+        if self._versionado():
+            campos['versao'] = ProximaVersao()
+        linhas = self.filter(deletado_em__isnull=True).update(**campos)
+        return linhas, {self.model._meta.label: linhas}
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def hard_delete(self):
+        return super().delete()
+
+    hard_delete.alters_data = True
+    hard_delete.queryset_only = True
+
+
+class BaseManager(models.Manager.from_queryset(BaseQuerySet)):
+    # `objects` não enxerga as linhas excluídas logicamente; `todos` enxerga
+    def __init__(self, incluir_deletados=False):
+        super().__init__()
+        self.incluir_deletados = incluir_deletados
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.incluir_deletados:
+            return queryset
+        return queryset.filter(deletado_em__isnull=True)
+
+
 class BaseModel(TimestampedModel, SoftDeleteModel, AuditModel):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+
+    objects = BaseManager()
+    todos = BaseManager(incluir_deletados=True)
     
     class Meta:
         abstract = True
@@ -1,12 +1,12 @@
 from django.db import models
-from .base import BaseModel
+from .base import BaseModel, VersionadoModel, ATIVOS
 from .empresa import Empresa
 
 class TipoCaixa(models.TextChoices):
     PRINCIPAL = 'PRIN', 'Caixa Principal'
     SATELITE = 'SAT', 'Caixa Satélite'
 
-class Caixa(BaseModel):
+class Caixa(VersionadoModel, BaseModel):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
     nome = models.CharField(max_length=100, help_text="Ex: Caixa 1, Terminal Principal")
     ativo = models.BooleanField(default=True)
@@ -31,6 +31,11 @@ class Caixa(BaseModel):
         verbose_name = "Caixa / Terminal de Venda"
         verbose_name_plural = "Caixas / Terminais de Venda"
         unique_together = ('empresa', 'nome') 
+        indexes = [
+            models.Index(fields=['empresa', 'versao'], name='caixa_empresa_versao_idx'),
+            models.Index(fields=['empresa', 'atualizado_em'], name='caixa_empresa_atualiz_idx'),
+            models.Index(fields=['empresa', 'criado_em', 'id'], name='caixa_empresa_criado_idx', condition=ATIVOS),
+        ]
 
     def __str__(self):
         return f"{self.nome} ({self.get_tipo_display()})"
\ No newline at end of file
@@ -1,9 +1,9 @@
 import uuid
 from django.db import models
-from .base import BaseModel
+from .base import BaseModel, VersionadoModel, ATIVOS
 from .empresa import Empresa
 
-class Cliente(BaseModel):
+class Cliente(VersionadoModel, BaseModel):
     uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
     nome = models.CharField(max_length=100)
@@ -14,6 +14,11 @@ class Cliente(BaseModel):
 
     class Meta:
         unique_together = ('empresa', 'cpf')
+        indexes = [
+            models.Index(fields=['empresa', 'versao'], name='cliente_empresa_versao_idx'),
+            models.Index(fields=['empresa', 'atualizado_em'], name='cliente_empresa_atualiz_idx'),
+            models.Index(fields=['empresa', 'criado_em', 'id'], name='cliente_empresa_criado_idx', condition=ATIVOS),
+        ]
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
 
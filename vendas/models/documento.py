@@ -0,0 +1,28 @@
+from django.db import models
+from .venda import Fatura
+
+# PDF de cada fatura (vendas/documentos.py). Gerado fora da requisição; o status é
+# atualizado com UPDATE pela tarefa em segundo plano, sem passar por save().
+
+class DocumentoFatura(models.Model):
+    class Status(models.TextChoices):
+        PENDENTE = 'pendente', 'Pendente'
+        GERADO = 'gerado', 'Gerado'
+        ERRO = 'erro', 'Erro'
+
+    fatura = models.OneToOneField(Fatura, on_delete=models.CASCADE, primary_key=True, related_name='documento')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDENTE)
+    arquivo = models.CharField(max_length=500, blank=True)
+    tamanho = models.BigIntegerField(null=True, blank=True, help_text="Tamanho do arquivo em bytes.")
+    assinado = models.BooleanField(default=False)
+    # Versão da fatura (atualizado_em) que está no arquivo; um PDF mais antigo nunca substitui um mais novo
+    fatura_atualizada_em = models.DateTimeField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+    gerado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Documento de Fatura"
+        verbose_name_plural = "Documentos de Fatura"
+
+    def __str__(self):
+        return f"PDF da fatura #{self.fatura_id} ({self.get_status_display()})"
@@ -0,0 +1,48 @@
+import uuid
+from django.db import models
+from .empresa import Empresa
+from .usuario import Usuario
+
+# Pedidos de exportação do histórico de vendas (vendas/exportacao.py). O status é
+# atualizado com UPDATE pela tarefa em segundo plano, sem passar por save().
+
+class Exportacao(models.Model):
+    class Formato(models.TextChoices):
+        CSV = 'csv', 'CSV (gzip)'
+        PARQUET = 'parquet', 'Parquet'
+
+    class Tipo(models.TextChoices):
+        VENDAS = 'vendas', 'Uma linha por venda'
+        ITENS = 'itens', 'Uma linha por item vendido'
+
+    class Status(models.TextChoices):
+        PENDENTE = 'pendente', 'Pendente'
+        PROCESSANDO = 'processando', 'Processando'
+        CONCLUIDA = 'concluida', 'Concluída'
+        ERRO = 'erro', 'Erro'
+
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='exportacoes')
+    solicitado_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    formato = models.CharField(max_length=10, choices=Formato.choices, default=Formato.CSV)
+    tipo = models.CharField(max_length=10, choices=Tipo.choices, default=Tipo.ITENS)
+    inicio = models.DateField(null=True, blank=True)
+    fim = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=12, choices=Status.choices, default=Status.PENDENTE)
+    linhas = models.BigIntegerField(default=0)
+    tamanho = models.BigIntegerField(null=True, blank=True, help_text="Tamanho do arquivo em bytes.")
+    arquivo = models.CharField(max_length=500, blank=True)
+    erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Exportação de Vendas"
+        verbose_name_plural = "Exportações de Vendas"
+        indexes = [
+            models.Index(fields=['empresa', 'criado_em'], name='exportacao_empresa_criado_idx'),
+        ]
+
+    def __str__(self):
+        return f"Exportação {self.uuid} ({self.get_status_display()})"
@@ -1,10 +1,13 @@
 from django.db import models
-from .base import BaseModel
+from django.db.models import F, Q
+from django.db.models.functions import Collate, Lower
+from .base import BaseModel, VersionadoModel, ATIVOS
 from .empresa import Empresa
 
-class Produto(BaseModel):
+class Produto(VersionadoModel, BaseModel):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
     nome = models.CharField(max_length=100)
+    codigo_barras = models.CharField(max_length=50, blank=True, null=True)  # EAN/GTIN ou SKU interno
     descricao = models.TextField(blank=True, null=True)
     preco = models.DecimalField(max_digits=10, decimal_places=2)
     estoque = models.PositiveIntegerField(default=0)
@@ -12,6 +15,21 @@ class Produto(BaseModel):
     class Meta:
         verbose_name = "Produto"
         verbose_name_plural = "Produtos"
+        indexes = [
+            models.Index(fields=['empresa', 'versao'], name='produto_empresa_versao_idx'),
+            models.Index(fields=['empresa', 'atualizado_em'], name='produto_empresa_atualiz_idx'),
+            models.Index(fields=['empresa', 'criado_em', 'id'], name='produto_empresa_criado_idx', condition=ATIVOS),
+            # Busca por prefixo do nome no PDV: com collation "C" o mesmo índice atende
+            # LIKE 'abc%' e a ordenação, então a página sai sem ordenar todos os candidatos
+            models.Index(F('empresa'), Collate(Lower('nome'), 'C'), F('id'), name='produto_nome_prefixo_idx', condition=ATIVOS),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['empresa', 'codigo_barras'],
+                condition=Q(codigo_barras__isnull=False),
+                name='produto_codigo_barras_unico',
+            ),
+        ]
 
     def __str__(self):
         return self.nome
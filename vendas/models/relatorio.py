@@ -0,0 +1,47 @@
+from django.db import models
+from .empresa import Empresa
+from .caixa import Caixa
+from .produto import Produto
+from .usuario import Usuario
+
+# Tabelas de resumo dos relatórios (vendas/relatorios.py). São refeitas por dia a partir
+# das vendas; a API de relatórios só lê daqui, nunca de Venda/ItemVenda.
+
+class ResumoVendasHora(models.Model):
+    # Por hora, caixa e vendedor; os totais por dia, caixa ou vendedor somam estas linhas
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='+')
+    dia = models.DateField()
+    hora = models.PositiveSmallIntegerField()
+    caixa = models.ForeignKey(Caixa, on_delete=models.CASCADE, related_name='+')
+    vendedor = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    quantidade_vendas = models.IntegerField(default=0)
+    itens_vendidos = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Resumo de Vendas por Hora"
+        verbose_name_plural = "Resumos de Vendas por Hora"
+        indexes = [
+            models.Index(fields=['empresa', 'dia'], name='resumo_hora_empresa_dia_idx'),
+        ]
+
+
+class ResumoProdutoDia(models.Model):
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='+')
+    dia = models.DateField()
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='+')
+    quantidade = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Resumo de Produto por Dia"
+        verbose_name_plural = "Resumos de Produto por Dia"
+        indexes = [
+            models.Index(fields=['empresa', 'dia'], name='resumo_produto_empresa_dia_idx'),
+        ]
+
+
+class AtualizacaoRelatorio(models.Model):
+    # Até onde as alterações de vendas da empresa já entraram nos resumos
+    empresa = models.OneToOneField(Empresa, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    processado_ate = models.DateTimeField()
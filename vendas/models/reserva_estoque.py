@@ -0,0 +1,22 @@
+from django.db import models
+from .base import BaseModel, ATIVOS
+from .empresa import Empresa
+from .produto import Produto
+from .sessao_caixa import SessaoCaixa
+
+class ReservaEstoque(BaseModel):
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='reservas')
+    sessao_caixa = models.ForeignKey(SessaoCaixa, on_delete=models.CASCADE, related_name='reservas_estoque')
+    quantidade = models.PositiveIntegerField()
+    expira_em = models.DateTimeField(help_text="Após este horário a reserva deixa de segurar o estoque.")
+
+    class Meta:
+        verbose_name = "Reserva de Estoque"
+        verbose_name_plural = "Reservas de Estoque"
+        indexes = [
+            models.Index(fields=['produto', 'expira_em'], name='reserva_produto_expira_idx', condition=ATIVOS),
+        ]
+
+    def __str__(self):
+        return f"{self.quantidade} x {self.produto.nome} ({self.sessao_caixa})"
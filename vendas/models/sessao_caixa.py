@@ -1,6 +1,6 @@
 from django.db import models
 from django.utils import timezone
-from .base import BaseModel
+from .base import BaseModel, ATIVOS
 from .caixa import Caixa
 from .usuario import Usuario
 
@@ -13,10 +13,38 @@ class SessaoCaixa(BaseModel):
     saldo_final = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Valor em caixa ao fechar a sessão.")
     observacoes = models.TextField(blank=True, null=True, help_text="Observações sobre a sessão do caixa.")
 
+    # Totais mantidos a cada venda (vendas/fechamento.py): o fechamento não precisa varrer as vendas
+    quantidade_vendas = models.PositiveIntegerField(default=0)
+    total_vendas = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_devolvido = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_faturado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    # Caminho até a empresa nas gravações em lote (models/base.py: alteracao_em_lote)
+    CAMPO_EMPRESA = 'caixa__empresa_id'
+
     class Meta:
         verbose_name = "Sessão de Caixa"
         verbose_name_plural = "Sessões de Caixa"
         ordering = ['-data_abertura'] # Ordena pelas sessões mais recentes
+        constraints = [
+            # No máximo uma sessão aberta por caixa; também é o índice da busca pela sessão aberta
+            models.UniqueConstraint(
+                fields=['caixa'], condition=ATIVOS & models.Q(data_fechamento__isnull=True),
+                name='sessao_caixa_aberta_unica',
+            ),
+        ]
+
+    CAMPOS_TOTAIS = ('quantidade_vendas', 'total_vendas', 'total_devolvido', 'total_faturado')
+
+    def save(self, *args, **kwargs):
+        # Os totais só mudam por UPDATE relativo; um save() com a instância desatualizada
+        # (fechamento, admin, API) não pode sobrescrever as vendas gravadas nesse meio tempo
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CAMPOS_TOTAIS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         status = "Aberta" if not self.data_fechamento else "Fechada"
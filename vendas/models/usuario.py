@@ -1,17 +1,29 @@
+import uuid
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from .base import VersionadoModel
 from .empresa import Empresa
 from .caixa import Caixa
 
-class Usuario(AbstractUser):
+class Usuario(VersionadoModel, AbstractUser):
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True)
+    # Sem constraint no banco: os usuários ficam em public e o caixa pode estar no esquema da empresa
     caixa_atual = models.ForeignKey(
         Caixa,
         on_delete=models.SET_NULL, 
         null=True,                 
         blank=True,                
-        related_name='usuarios_com_caixa_aberto'
+        related_name='usuarios_com_caixa_aberto',
+        db_constraint=False,
     )
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['empresa', 'versao'], name='usuario_empresa_versao_idx'),
+            models.Index(fields=['empresa', 'atualizado_em'], name='usuario_empresa_atualiz_idx'),
+        ]
+
     def __str__(self):
         return self.username
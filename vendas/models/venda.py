@@ -1,16 +1,25 @@
 from django.db import models
-from .base import BaseModel
+from django.utils import timezone
+from .base import BaseModel, ATIVOS
 from .cliente import Cliente
 from .produto import Produto
 from .empresa import Empresa
 from .sessao_caixa import SessaoCaixa
 from .usuario import Usuario
 
+class FormaPagamento(models.TextChoices):
+    DINHEIRO = 'DIN', 'Dinheiro'
+    CREDITO = 'CRED', 'Cartão de Crédito'
+    DEBITO = 'DEB', 'Cartão de Débito'
+    PIX = 'PIX', 'Pix'
+    OUTRO = 'OUT', 'Outro'
+
 class Venda(BaseModel):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
-    data_venda = models.DateTimeField(auto_now_add=True)
+    data_venda = models.DateTimeField(default=timezone.now, editable=False)  # vendas offline chegam com a hora do terminal
     total = models.DecimalField(max_digits=10, decimal_places=2)
+    forma_pagamento = models.CharField(max_length=4, choices=FormaPagamento.choices, default=FormaPagamento.DINHEIRO)
     sessao_caixa = models.ForeignKey( # <-- Nova FK para SessaoCaixa
         SessaoCaixa,
         on_delete=models.PROTECT, # Não permite apagar sessão se houver vendas
@@ -23,6 +32,15 @@ class Venda(BaseModel):
         related_name='vendas_como_vendedor'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'data_venda', 'id'], name='venda_empresa_data_idx', condition=ATIVOS),
+            # Vendas da sessão aberta (vendas-abertas-sessao)
+            models.Index(fields=['sessao_caixa', 'data_venda'], name='venda_sessao_data_idx', condition=ATIVOS),
+            # Vendas alteradas desde a última atualização dos relatórios
+            models.Index(fields=['empresa', 'atualizado_em'], name='venda_empresa_atualiz_idx'),
+        ]
+
     def __str__(self):
         return f"Venda #{self.id} - {self.cliente.nome}"
 
@@ -56,3 +74,21 @@ class Fatura(BaseModel):
 
     def __str__(self):
         return f"Fatura #{self.id} - Venda #{self.venda.id}"
+
+
+class ResumoPagamentoSessao(models.Model):
+    # Totais da sessão por forma de pagamento, mantidos junto com cada venda (vendas/fechamento.py)
+    sessao_caixa = models.ForeignKey(SessaoCaixa, on_delete=models.CASCADE, related_name='resumo_pagamentos')
+    forma_pagamento = models.CharField(max_length=4, choices=FormaPagamento.choices)
+    quantidade = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Resumo de Pagamento da Sessão"
+        verbose_name_plural = "Resumos de Pagamento das Sessões"
+        constraints = [
+            models.UniqueConstraint(fields=['sessao_caixa', 'forma_pagamento'], name='resumo_pagamento_sessao_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_forma_pagamento_display()}: {self.quantidade} venda(s), {self.total}"
@@ -0,0 +1,279 @@
+# vendas/notificacoes.py
+# Avisos de alteração do catálogo para os caixas conectados (Server-Sent Events).
+#
+# Cada alteração de Produto, Cliente ou Caixa vira um evento {"recurso", "uuids", "removido"}
+# no canal da empresa. O terminal mantém aberto GET empresas/<pk>/eventos/ e, a cada aviso,
+# busca dados-atualizados com o seu cursor; ao (re)conectar ou receber "ressincronizar",
+# também, porque os avisos não são guardados.
+#
+# PDV_NOTIFICACOES:
+#   'postgres' (padrão): pg_notify na própria transação. O PostgreSQL só entrega no commit,
+#       e a todos os processos; em cada um, uma thread com LISTEN repassa aos assinantes locais.
+#   'local': entrega no commit aos assinantes deste processo (um único worker, testes).
+#   '': desligado.
+#
+# As gravações em lote do BaseQuerySet são avisadas pelo sinal alteracao_em_lote; a baixa
+# de estoque (vendas/estoque.py) usa sem_avisos() e publica por conta própria.
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+from .renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+CANAL = 'pdv_alteracoes'
+# O payload do NOTIFY tem limite de 8000 bytes; os uuids vão em grupos
+UUIDS_POR_AVISO = 100
+
+_assinaturas = {}
+_lock = threading.Lock()
+_ouvinte = None
+_ouvindo = threading.Event()
+_parar = threading.Event()
+
+
+def _modo():
+    return getattr(settings, 'PDV_NOTIFICACOES', 'postgres')
+
+
+def publicar(empresa_id, recurso, uuids, removido=False):
+    """Avisa os terminais da empresa, no commit da transação atual."""
+    modo = _modo()
+    if not modo:
+        return
+    uuids = [str(uuid) for uuid in uuids]
+    for inicio in range(0, len(uuids), UUIDS_POR_AVISO):
+        evento = {'recurso': recurso, 'uuids': uuids[inicio:inicio + UUIDS_POR_AVISO], 'removido': removido}
+        if modo == 'postgres':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [CANAL, dumps({'empresa': empresa_id, **evento}).decode()])
+        else:
+            transaction.on_commit(lambda evento=evento: entregar(empresa_id, evento))
+
+
+def entregar(empresa_id, evento):
+    with _lock:
+        assinaturas = list(_assinaturas.get(empresa_id, ()))
+    for assinatura in assinaturas:
+        assinatura.entregar(evento)
+
+
+def _ressincronizar_todos():
+    with _lock:
+        assinaturas = [assinatura for grupo in _assinaturas.values() for assinatura in grupo]
+    for assinatura in assinaturas:
+        assinatura.entregar(None)
+
+
+class Assinatura:
+    """Fila de eventos de uma conexão, consumida por uma thread (WSGI) ou pelo event loop (ASGI).
+
+    Os eventos chegam pela thread do LISTEN ou pelo commit de outra requisição. Se a fila
+    passar de PDV_EVENTOS_FILA (terminal lento), ela é descartada e o terminal recebe
+    "ressincronizar".
+    """
+
+    def __init__(self, empresa_id):
+        self.empresa_id = empresa_id
+        self.limite = getattr(settings, 'PDV_EVENTOS_FILA', 1000)
+        self._pendentes = deque()
+        self._perdeu = False
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._acordar_async = None  # (loop, asyncio.Event), criado no primeiro aguardar()
+
+    def entregar(self, evento):
+        # evento None: avisos podem ter se perdido (fila cheia, LISTEN reconectado)
+        with self._lock:
+            if evento is None or len(self._pendentes) >= self.limite:
+                self._pendentes.clear()
+                self._perdeu = True
+            else:
+                self._pendentes.append(evento)
+            assincrono = self._acordar_async
+        self._acordar.set()
+        if assincrono is not None:
+            loop, acordar = assincrono
+            try:
+                loop.call_soon_threadsafe(acordar.set)
+            except RuntimeError:
+                pass  # loop já encerrado; a conexão está sendo fechada
+
+    def _retirar(self):
+        with self._lock:
+            eventos, perdeu = list(self._pendentes), self._perdeu
+            self._pendentes.clear()
+            self._perdeu = False
+        return eventos, perdeu
+
+    def esperar(self, timeout):
+        self._acordar.wait(timeout)
+        self._acordar.clear()
+        return self._retirar()
+
+    async def aguardar(self, timeout):
+        if self._acordar_async is None:
+            with self._lock:
+                self._acordar_async = (asyncio.get_running_loop(), asyncio.Event())
+            if self._pendentes or self._perdeu:
+                self._acordar_async[1].set()
+        acordar = self._acordar_async[1]
+        try:
+            await asyncio.wait_for(acordar.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        acordar.clear()
+        return self._retirar()
+
+
+def assinar(empresa_id):
+    if _modo() == 'postgres':
+        _iniciar_ouvinte()
+    assinatura = Assinatura(empresa_id)
+    with _lock:
+        _assinaturas.setdefault(empresa_id, set()).add(assinatura)
+    return assinatura
+
+
+def cancelar(assinatura):
+    with _lock:
+        grupo = _assinaturas.get(assinatura.empresa_id)
+        if grupo is not None:
+            grupo.discard(assinatura)
+            if not grupo:
+                del _assinaturas[assinatura.empresa_id]
+
+
+def assinantes():
+    with _lock:
+        return sum(len(grupo) for grupo in _assinaturas.values())
+
+
+# LISTEN
+
+def _iniciar_ouvinte():
+    global _ouvinte
+    with _lock:
+        if _ouvinte is None or not _ouvinte.is_alive():
+            _parar.clear()
+            _ouvinte = threading.Thread(target=_ouvir, name='pdv-notificacoes', daemon=True)
+            _ouvinte.start()
+    # Só na primeira assinatura do processo: espera o LISTEN valer
+    _ouvindo.wait(5)
+
+
+def parar_ouvinte():
+    # Encerra a thread do LISTEN e a conexão dela (testes, encerramento do processo)
+    global _ouvinte
+    with _lock:
+        ouvinte, _ouvinte = _ouvinte, None
+    if ouvinte is not None:
+        _parar.set()
+        ouvinte.join()
+
+
+def _avisos(bruta):
+    # Payloads recebidos em até 1 s; a API de notificações muda entre psycopg 3 e psycopg2
+    if is_psycopg3:
+        return [aviso.payload for aviso in bruta.notifies(timeout=1)]
+    if select.select([bruta], [], [], 1) == ([], [], []):
+        return []
+    bruta.poll()
+    payloads = [aviso.payload for aviso in bruta.notifies]
+    bruta.notifies.clear()
+    return payloads
+
+
+def _ouvir():
+    while not _parar.is_set():
+        conexao = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            conexao.ensure_connection()
+            bruta = conexao.connection
+            with bruta.cursor() as cursor:
+                cursor.execute(f'LISTEN {CANAL}')
+            _ouvindo.set()
+            while not _parar.is_set():
+                for payload in _avisos(bruta):
+                    aviso = json.loads(payload)
+                    entregar(aviso.pop('empresa'), aviso)
+        except Exception:
+            logger.exception("Conexão do LISTEN %s perdida; reconectando", CANAL)
+        finally:
+            _ouvindo.clear()
+            conexao.close()
+        if not _parar.is_set():
+            # Os avisos feitos enquanto a conexão estava caída não chegam
+            _ressincronizar_todos()
+            _parar.wait(1)
+
+
+# Conteúdo de StreamingHttpResponse
+
+RETRY = b'retry: 3000\n\n'
+PING = b': ping\n\n'
+RESSINCRONIZAR = b'event: ressincronizar\ndata: {}\n\n'
+
+
+def _liberar_conexoes():
+    # O fluxo não usa o banco; não segura a conexão desta thread enquanto espera
+    for conexao in connections.all(initialized_only=True):
+        if not conexao.in_atomic_block:
+            conexao.close()
+
+
+def _bloco(eventos, perdeu):
+    if perdeu:
+        return RESSINCRONIZAR
+    if not eventos:
+        return PING
+    return b''.join(b'event: alteracao\ndata: ' + dumps(evento) + b'\n\n' for evento in eventos)
+
+
+class _Fluxo:
+    # Assina na criação, ainda na view: o que mudar entre a resposta e a primeira leitura
+    # não se perde. O Django chama close() ao fim da resposta, inclusive se ela nunca for lida.
+    def __init__(self, empresa_id):
+        self.assinatura = assinar(empresa_id)
+        self.ping = getattr(settings, 'PDV_EVENTOS_PING', 15)
+        # A conexão é encerrada depois de PDV_EVENTOS_DURACAO: o terminal reconecta e o
+        # token é conferido de novo
+        self.fim = time.monotonic() + getattr(settings, 'PDV_EVENTOS_DURACAO', 600)
+
+    def close(self):
+        cancelar(self.assinatura)
+
+    def _restante(self):
+        return min(self.ping, self.fim - time.monotonic())
+
+
+class FluxoEventos(_Fluxo):
+    """Para WSGI: ocupa a thread do worker enquanto a conexão estiver aberta."""
+
+    def __iter__(self):
+        _liberar_conexoes()
+        yield RETRY
+        while (restante := self._restante()) > 0:
+            yield _bloco(*self.assinatura.esperar(restante))
+
+
+class FluxoEventosAsync(_Fluxo):
+    """Para ASGI: cada conexão aberta custa só uma corrotina à espera."""
+
+    async def __aiter__(self):
+        # A conexão aberta pela autenticação é da thread da requisição (sync_to_async) e só
+        # seria fechada quando a resposta terminasse
+        await sync_to_async(_liberar_conexoes)()
+        yield RETRY
+        while (restante := self._restante()) > 0:
+            yield _bloco(*await self.assinatura.aguardar(restante))
@@ -0,0 +1,26 @@
+# vendas/pagination.py
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """Paginação por chave (seek) em vez de OFFSET.
+
+    Cada página filtra a partir da posição do cursor no primeiro campo da ordenação
+    (`criado_em`) e lê só `page_size` linhas pelo índice, então a página 1000 custa o
+    mesmo que a 1. O `id` só fixa a ordem: linhas com o mesmo `criado_em` que a posição
+    são puladas por um deslocamento guardado no cursor (CursorPagination do DRF), não
+    pela chave; muitas linhas com o mesmo instante voltam a custar como OFFSET.
+    A view pode trocar a ordenação com `ordenacao_paginacao` e o teto de linhas por
+    página com `tamanho_maximo_pagina`.
+    """
+    ordering = ('-criado_em', '-id')
+    page_size_query_param = 'page_size'
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'ordenacao_paginacao', self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = getattr(settings, 'PDV_PAGINACAO_TAMANHO', 50)
+        self.max_page_size = getattr(view, 'tamanho_maximo_pagina', None) or getattr(settings, 'PDV_PAGINACAO_MAXIMO', 500)
+        return super().paginate_queryset(queryset, request, view)
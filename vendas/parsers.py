@@ -0,0 +1,26 @@
+# vendas/parsers.py
+# Corpo JSON das requisições com orjson, se o pacote estiver instalado (ver vendas/renderers.py).
+#
+# Como o JSONParser do DRF em modo estrito, recusa NaN/Infinity e devolve números com
+# ponto como float. Sem o orjson, ou com corpo em outra codificação que não UTF-8 ou
+# STRICT_JSON desligado, vale o parser do DRF.
+import codecs
+
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from .renderers import JSONRapidoRenderer, orjson
+
+
+class JSONRapidoParser(parsers.JSONParser):
+    renderer_class = JSONRapidoRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
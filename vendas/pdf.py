@@ -0,0 +1,99 @@
+# vendas/pdf.py
+# Geração do PDF das faturas dentro dos processos do pool de vendas/documentos.py.
+#
+# Este módulo é importado pelos processos filhos antes de o Django estar configurado,
+# por isso não importa models: recebe só dicionários e devolve bytes. O template, as
+# fontes e o certificado são carregados uma vez por processo, no initializer.
+import base64
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+# Estado de cada processo gerador (preenchido por _iniciar_processo)
+_template = None
+_assinador = None
+
+
+def configuracao_assinatura():
+    return (
+        getattr(settings, 'PDV_DOCUMENTOS_CERTIFICADO', '') or None,
+        getattr(settings, 'PDV_DOCUMENTOS_CERTIFICADO_SENHA', '') or None,
+    )
+
+
+def _iniciar_processo(certificado=None, senha=None):
+    global _template, _assinador
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    from django.template.loader import get_template
+
+    _template = get_template('vendas/fatura.html')
+    _assinador = None
+    if certificado:
+        from pyhanko.sign import signers
+        _assinador = signers.SimpleSigner.load_pkcs12(certificado, passphrase=senha.encode() if senha else None)
+        if _assinador is None:
+            raise ValueError(f"Não foi possível carregar o certificado {certificado}.")
+    # Um PDF de aquecimento carrega as métricas das fontes e os módulos do xhtml2pdf
+    _html_para_pdf(_template.render({**_CONTEXTO_AQUECIMENTO, 'qrcode': _qrcode('-')}))
+
+
+def _html_para_pdf(html):
+    from xhtml2pdf import pisa
+    saida = io.BytesIO()
+    resultado = pisa.CreatePDF(html, dest=saida, encoding='utf-8')
+    if resultado.err:
+        raise ValueError(f"Falha ao gerar o PDF ({resultado.err} erro(s) no HTML).")
+    return saida.getvalue()
+
+
+def _assinar(pdf):
+    from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
+    from pyhanko.sign import signers
+    escritor = IncrementalPdfFileWriter(io.BytesIO(pdf))
+    assinado = signers.sign_pdf(
+        escritor, signers.PdfSignatureMetadata(field_name='Assinatura', reason='Fatura'), signer=_assinador,
+    )
+    return assinado.getvalue()
+
+
+def _qrcode(texto):
+    import qrcode
+    imagem = io.BytesIO()
+    qrcode.make(texto, box_size=4, border=1).save(imagem)
+    return 'data:image/png;base64,' + base64.b64encode(imagem.getvalue()).decode()
+
+
+def renderizar_pdf(contexto):
+    """Gera o PDF da fatura a partir do `contexto` (só tipos simples). Retorna (pdf, assinado)."""
+    if _template is None:
+        _iniciar_processo(*configuracao_assinatura())
+    contexto = {**contexto, 'qrcode': _qrcode(contexto['fatura']['uuid'])}
+    pdf = _html_para_pdf(_template.render(contexto))
+    if _assinador is None:
+        return pdf, False
+    return _assinar(pdf), True
+
+
+def criar_pool(processos, certificado=None, senha=None):
+    # spawn: o processo do servidor tem threads, e fork copiaria locks e conexões abertas
+    return ProcessPoolExecutor(
+        max_workers=processos,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_iniciar_processo,
+        initargs=(certificado, senha),
+    )
+
+
+_CONTEXTO_AQUECIMENTO = {
+    'empresa': {'nome': 'Empresa', 'cnpj': '00.000.000/0000-00'},
+    'cliente': {'nome': 'Cliente', 'cpf': '000.000.000-00', 'endereco': None},
+    'venda': {'uuid': '-', 'data_venda': None, 'caixa': 'Caixa', 'vendedor': None, 'forma_pagamento': 'Dinheiro'},
+    'fatura': {'uuid': '-', 'data_emissao': None, 'data_vencimento': None, 'valor_total': 0, 'paga': False},
+    'itens': [{'produto': 'Produto', 'quantidade': 1, 'preco_unitario': 0, 'subtotal': 0}],
+    'gerado_em': None,
+}
@@ -0,0 +1,160 @@
+# vendas/relatorios.py
+# Resumos de vendas para os relatórios.
+#
+# Os resumos (ResumoVendasHora, ResumoProdutoDia) são refeitos por dia inteiro: apaga as
+# linhas do dia e grava o agregado das vendas daquele dia. A atualização incremental
+# refaz só os dias que tiveram vendas alteradas desde a última passada (pelo índice
+# (empresa, atualizado_em) de Venda); o backfill percorre o histórico em blocos de dias.
+# As consultas da API leem apenas os resumos.
+import datetime
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum, F, Q, Min, Max, DecimalField, ExpressionWrapper
+from django.db.models.functions import TruncDate, ExtractHour
+from django.utils import timezone
+
+from .models import Venda, ItemVenda, ResumoVendasHora, ResumoProdutoDia, AtualizacaoRelatorio
+
+
+def _margem():
+    # Vendas gravadas em transações que começaram antes da última passada e terminaram depois
+    return timedelta(seconds=getattr(settings, 'PDV_RELATORIOS_MARGEM', 300))
+
+
+def _inicio_do_dia(dia):
+    return timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+
+
+def _filtro_dias(campo, dias):
+    # Dias consecutivos viram uma única faixa, para o índice (empresa, data_venda) ler em sequência
+    faixas = []
+    for dia in sorted(dias):
+        if faixas and faixas[-1][1] == dia:
+            faixas[-1][1] = dia + timedelta(days=1)
+        else:
+            faixas.append([dia, dia + timedelta(days=1)])
+    filtro = Q()
+    for inicio, fim in faixas:
+        filtro |= Q(**{f'{campo}__gte': _inicio_do_dia(inicio), f'{campo}__lt': _inicio_do_dia(fim)})
+    return filtro
+
+
+def atualizar_dias(empresa_id, dias):
+    """Refaz os resumos da empresa nos `dias` informados."""
+    dias = sorted(set(dias))
+    if not dias:
+        return
+    vendas = Venda.objects.filter(_filtro_dias('data_venda', dias), empresa_id=empresa_id)
+    itens = ItemVenda.objects.filter(venda__in=vendas)
+    chave = dict(
+        dia=TruncDate('venda__data_venda'), hora=ExtractHour('venda__data_venda'),
+        caixa_ref=F('venda__sessao_caixa__caixa_id'), vendedor_ref=F('venda__vendedor_id'),
+    )
+
+    horas = {}
+    for linha in (
+        vendas.order_by()
+        .values(dia=TruncDate('data_venda'), hora=ExtractHour('data_venda'), caixa_ref=F('sessao_caixa__caixa_id'), vendedor_ref=F('vendedor_id'))
+        .annotate(quantidade=Count('pk'), soma=Sum('total'))
+    ):
+        horas[(linha['dia'], linha['hora'], linha['caixa_ref'], linha['vendedor_ref'])] = ResumoVendasHora(
+            empresa_id=empresa_id, dia=linha['dia'], hora=linha['hora'], caixa_id=linha['caixa_ref'],
+            vendedor_id=linha['vendedor_ref'], quantidade_vendas=linha['quantidade'], total=linha['soma'],
+        )
+    for linha in itens.order_by().values(**chave).annotate(unidades=Sum('quantidade')):
+        resumo = horas.get((linha['dia'], linha['hora'], linha['caixa_ref'], linha['vendedor_ref']))
+        if resumo is not None:
+            resumo.itens_vendidos = linha['unidades']
+
+    subtotal = ExpressionWrapper(F('quantidade') * F('preco_unitario'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    produtos = [
+        ResumoProdutoDia(empresa_id=empresa_id, dia=linha['dia'], produto_id=linha['produto_id'],
+                         quantidade=linha['unidades'], total=linha['soma'])
+        for linha in itens.order_by().values('produto_id', dia=TruncDate('venda__data_venda'))
+        .annotate(unidades=Sum('quantidade'), soma=Sum(subtotal))
+    ]
+
+    with transaction.atomic():
+        ResumoVendasHora.objects.filter(empresa_id=empresa_id, dia__in=dias).delete()
+        ResumoProdutoDia.objects.filter(empresa_id=empresa_id, dia__in=dias).delete()
+        ResumoVendasHora.objects.bulk_create(horas.values(), batch_size=2000)
+        ResumoProdutoDia.objects.bulk_create(produtos, batch_size=2000)
+
+
+def atualizar_pendentes(empresa_id, dias_por_lote=31):
+    """Refaz os dias com vendas alteradas desde a última atualização; retorna quantos foram refeitos."""
+    with transaction.atomic():
+        agora = timezone.now()
+        controle = AtualizacaoRelatorio.objects.select_for_update().filter(empresa_id=empresa_id).first()
+        # Inclui as excluídas: o dia delas também precisa ser refeito
+        vendas = Venda.todos.filter(empresa_id=empresa_id)
+        if controle is not None:
+            vendas = vendas.filter(atualizado_em__gt=controle.processado_ate - _margem())
+        dias = sorted(
+            vendas.order_by().annotate(dia=TruncDate('data_venda')).values_list('dia', flat=True).distinct()
+        )
+        for inicio in range(0, len(dias), dias_por_lote):
+            atualizar_dias(empresa_id, dias[inicio:inicio + dias_por_lote])
+        AtualizacaoRelatorio.objects.update_or_create(empresa_id=empresa_id, defaults={'processado_ate': agora})
+    return len(dias)
+
+
+def periodo_com_vendas(empresa_id):
+    limites = Venda.objects.filter(empresa_id=empresa_id).aggregate(inicio=Min('data_venda'), fim=Max('data_venda'))
+    if limites['inicio'] is None:
+        return None, None
+    return timezone.localdate(limites['inicio']), timezone.localdate(limites['fim'])
+
+
+def processado_ate(empresa_id):
+    return AtualizacaoRelatorio.objects.filter(empresa_id=empresa_id).values_list('processado_ate', flat=True).first()
+
+
+# Consultas dos relatórios (só resumos)
+
+def _horas(empresa_id, inicio, fim, caixa_id=None, vendedor_id=None):
+    linhas = ResumoVendasHora.objects.filter(empresa_id=empresa_id, dia__gte=inicio, dia__lte=fim)
+    if caixa_id is not None:
+        linhas = linhas.filter(caixa_id=caixa_id)
+    if vendedor_id is not None:
+        linhas = linhas.filter(vendedor_id=vendedor_id)
+    return linhas.order_by()
+
+
+def _totais():
+    return dict(quantidade_vendas=Sum('quantidade_vendas'), itens_vendidos=Sum('itens_vendidos'), total=Sum('total'))
+
+
+def vendas_por_dia(empresa_id, inicio, fim, caixa_id=None, vendedor_id=None):
+    return list(_horas(empresa_id, inicio, fim, caixa_id, vendedor_id).values('dia').annotate(**_totais()).order_by('dia'))
+
+
+def vendas_por_hora(empresa_id, inicio, fim, caixa_id=None, vendedor_id=None):
+    return list(_horas(empresa_id, inicio, fim, caixa_id, vendedor_id).values('hora').annotate(**_totais()).order_by('hora'))
+
+
+def vendas_por_caixa(empresa_id, inicio, fim):
+    return list(
+        _horas(empresa_id, inicio, fim)
+        .values(caixa_uuid=F('caixa__uuid'), caixa_nome=F('caixa__nome'))
+        .annotate(**_totais()).order_by('-total')
+    )
+
+
+def vendas_por_vendedor(empresa_id, inicio, fim):
+    return list(
+        _horas(empresa_id, inicio, fim)
+        .values(vendedor_uuid=F('vendedor__uuid'), vendedor_username=F('vendedor__username'))
+        .annotate(**_totais()).order_by('-total')
+    )
+
+
+def produtos_mais_vendidos(empresa_id, inicio, fim, limite=10, ordenar='quantidade'):
+    return list(
+        ResumoProdutoDia.objects.filter(empresa_id=empresa_id, dia__gte=inicio, dia__lte=fim).order_by()
+        .values(produto_uuid=F('produto__uuid'), produto_nome=F('produto__nome'))
+        .annotate(quantidade=Sum('quantidade'), total=Sum('total'))
+        .order_by(f'-{ordenar}', 'produto_nome')[:limite]
+    )
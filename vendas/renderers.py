@@ -0,0 +1,62 @@
+# vendas/renderers.py
+# JSON das respostas com orjson, se o pacote estiver instalado.
+#
+# O JSONRenderer do DRF passa cada Decimal, UUID e datetime pelo JSONEncoder em Python;
+# o orjson serializa UUID e datetime nativamente (com o mesmo formato: ISO 8601 e 'Z'
+# para UTC) e só chama `_padrao` para o resto, que é o próprio JSONEncoder do DRF (Decimal
+# vira número, como antes). Sem o orjson, ou nos casos que ele não cobre (indentação,
+# UNICODE_JSON/COMPACT_JSON desligados, inteiros acima de 64 bits), vale o renderer do DRF.
+import json
+
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_padrao = JSONEncoder().default
+
+OPCOES = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+# Os separadores de linha do JavaScript saem escapados, como no DRF
+_SEPARADORES_JS = (('\u2028'.encode(), b'\\u2028'), ('\u2029'.encode(), b'\\u2029'))
+
+
+def dumps(dados):
+    """JSON compacto em UTF-8 (bytes), sem escapar o que não é ASCII."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(dados, default=_padrao, option=OPCOES)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(dados, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class JSONRapidoRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or not self.compact or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_padrao, option=OPCOES)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for separador, escapado in _SEPARADORES_JS:
+            if separador in ret:
+                ret = ret.replace(separador, escapado)
+        return ret
+
+
+class EventosRenderer(renderers.BaseRenderer):
+    # Só para as respostas de erro de quem pediu text/event-stream (vendas/notificacoes.py)
+    media_type = 'text/event-stream'
+    format = 'eventos'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b'event: erro\ndata: ' + dumps(data) + b'\n\n'
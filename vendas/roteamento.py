@@ -0,0 +1,110 @@
+# vendas/roteamento.py
+# Leituras nas réplicas do PostgreSQL (settings.PDV_BANCOS_LEITURA).
+#
+# Só as actions de leitura marcadas nos viewsets (LeituraEmReplicaMixin.acoes_em_replica)
+# vão para uma réplica; o resto, inclusive as leituras das requisições que gravam e as
+# feitas dentro de transações, fica no primário. Quem grava fica preso ao primário por
+# PDV_REPLICA_FIXAR segundos (chave no cache compartilhado), o tempo de a réplica alcançar
+# o que ele acabou de gravar: a venda recém-registrada aparece na próxima listagem do caixa.
+# A réplica é escolhida uma vez por requisição.
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .middleware import usuario_resolvido
+
+_requisicao = contextvars.ContextVar('pdv_roteamento', default=None)
+
+
+class _Roteamento:
+    __slots__ = ('leitura', 'replica', 'fixado')
+
+    def __init__(self, leitura):
+        self.leitura = leitura
+        self.replica = None  # alias escolhido, ou False para o primário
+        self.fixado = False
+
+
+def bancos_leitura():
+    return getattr(settings, 'PDV_BANCOS_LEITURA', [])
+
+
+def _cache():
+    return caches[getattr(settings, 'PDV_CACHE_ALIAS', 'default')]
+
+
+def _chave(usuario_id):
+    return f'pdv:primario:{usuario_id}'
+
+
+def _em_transacao():
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+@contextmanager
+def requisicao(leitura):
+    """Roteamento de uma requisição; com `leitura`, as consultas podem ir para uma réplica."""
+    token = _requisicao.set(_Roteamento(leitura))
+    try:
+        yield
+    finally:
+        _requisicao.reset(token)
+
+
+def fixar_no_primario(usuario_id):
+    _cache().set(_chave(usuario_id), True, getattr(settings, 'PDV_REPLICA_FIXAR', 5))
+
+
+class RoteadorLeitura:
+    def db_for_read(self, model, **hints):
+        roteamento = _requisicao.get()
+        if roteamento is None or not roteamento.leitura or roteamento.replica is False or _em_transacao():
+            return DEFAULT_DB_ALIAS
+        if roteamento.replica is None:
+            replicas = bancos_leitura()
+            usuario = usuario_resolvido()
+            if not replicas or (usuario is not None and _cache().get(_chave(usuario.pk))):
+                roteamento.replica = False
+                return DEFAULT_DB_ALIAS
+            roteamento.replica = random.choice(replicas)
+        return roteamento.replica
+
+    def db_for_write(self, model, **hints):
+        # Explícito: sem isso o Django gravaria no banco de onde a instância foi lida
+        roteamento = _requisicao.get()
+        if roteamento is not None:
+            roteamento.replica = False
+            if not roteamento.fixado and bancos_leitura():
+                usuario = usuario_resolvido()
+                if usuario is not None:
+                    fixar_no_primario(usuario.pk)
+                    roteamento.fixado = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {DEFAULT_DB_ALIAS, *bancos_leitura()}
+        return (obj1._state.db in bancos and obj2._state.db in bancos) or None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db in bancos_leitura() else None
+
+
+class LeituraEmReplicaMixin:
+    """Viewsets: as actions em `acoes_em_replica` leem de uma réplica."""
+    acoes_em_replica = {'list', 'retrieve'}
+
+    def dispatch(self, request, *args, **kwargs):
+        acao = getattr(self, 'action_map', {}).get(request.method.lower())
+        if getattr(self, 'assincrona', False):
+            # vendas/assincrono.py: o roteamento precisa valer enquanto a corrotina roda
+            return self._despachar_roteado(acao in self.acoes_em_replica, request, *args, **kwargs)
+        with requisicao(acao in self.acoes_em_replica):
+            return super().dispatch(request, *args, **kwargs)
+
+    async def _despachar_roteado(self, leitura, request, *args, **kwargs):
+        with requisicao(leitura):
+            return await super().dispatch(request, *args, **kwargs)
@@ -12,4 +12,14 @@ from .sales_serializers import (
     FaturaSerializer,
     DevolucaoItemVendaSerializer,
     VendaSerializer,
-)
\ No newline at end of file
+    ReservaEstoqueSerializer,
+    ItemVendaLoteSerializer,
+    VendaLoteSerializer,
+)
+
+from .relatorios_serializers import (
+    FiltroRelatorioSerializer,
+    ExportacaoSerializer,
+)
+
+from . import leitura
@@ -37,7 +37,7 @@ class ProdutoSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Produto
-        fields = ['uuid', 'empresa', 'empresa_nome', 'nome', 'descricao', 'preco', 'estoque', 'criado_em', 'atualizado_em']
+        fields = ['uuid', 'empresa', 'empresa_nome', 'nome', 'codigo_barras', 'descricao', 'preco', 'estoque', 'criado_em', 'atualizado_em']
         read_only_fields = ['uuid', 'criado_em', 'atualizado_em']
 
 class CaixaSerializer(serializers.ModelSerializer):
@@ -59,6 +59,10 @@ class SessaoCaixaSerializer(serializers.ModelSerializer):
         fields = [
             'uuid', 'caixa', 'caixa_nome', 'vendedor', 'vendedor_username',
             'data_abertura', 'data_fechamento', 'saldo_inicial', 'saldo_final', 'observacoes',
+            'quantidade_vendas', 'total_vendas', 'total_devolvido', 'total_faturado',
             'esta_aberta', 'criado_em', 'atualizado_em'
         ]
-        read_only_fields = ['uuid', 'data_abertura', 'criado_em', 'atualizado_em', 'esta_aberta']
\ No newline at end of file
+        read_only_fields = [
+            'uuid', 'data_abertura', 'criado_em', 'atualizado_em', 'esta_aberta',
+            'quantidade_vendas', 'total_vendas', 'total_devolvido', 'total_faturado',
+        ]
\ No newline at end of file
@@ -0,0 +1,233 @@
+# vendas/serializers/leitura.py
+# Linhas de leitura montadas direto de values(), sem instanciar modelos nem serializers.
+#
+# Nas listagens o tempo vai quase todo para o to_representation de cada campo dos
+# ModelSerializers (e, na venda, para os três serializers aninhados de cada linha). Aqui
+# cada recurso é declarado uma vez como (campo de saída, caminho em values(), conversor) e
+# compilado em uma única função que monta o dict da linha. Os nomes, a ordem e os formatos
+# são os mesmos dos serializers de base_serializers.py/sales_serializers.py, então a
+# resposta não muda para os clientes; LeituraRapidaTests confere isso.
+#
+# Relacionado: objeto da mesma linha, pelo JOIN (o select_related dos serializers).
+# Filhos: lista vinda de uma segunda consulta, agrupada pelo pai em uma passada (o prefetch).
+from django.utils import timezone
+
+from ..models import ItemVenda, DevolucaoItemVenda
+from ..models.caixa import TipoCaixa
+
+
+def texto(valor):
+    return None if valor is None else str(valor)
+
+
+def data_hora(valor, fuso=None):
+    # Mesmo formato do DateTimeField do DRF: horário local, ISO 8601, 'Z' para UTC
+    if valor is None:
+        return None
+    valor = valor.astimezone(fuso or timezone.get_current_timezone()).isoformat()
+    if valor.endswith('+00:00'):
+        valor = valor[:-6] + 'Z'
+    return valor
+
+
+# O fuso atual custa mais que a própria conversão: a linha recebe o da página inteira
+data_hora.usa_fuso = True
+
+
+def data(valor):
+    return None if valor is None else valor.isoformat()
+
+
+def nulo(valor):
+    return valor is None
+
+
+_TIPOS_CAIXA = dict(TipoCaixa.choices)
+
+
+def tipo_caixa(valor):
+    return _TIPOS_CAIXA.get(valor, valor)
+
+
+class Relacionado:
+    def __init__(self, caminho, campos):
+        self.caminho = caminho
+        self.campos = campos
+
+
+class Filhos:
+    def __init__(self, leitura, ligacao, consulta):
+        self.leitura = leitura
+        self.ligacao = ligacao
+        self.consulta = consulta  # queryset base (ex.: só os não excluídos)
+
+    def _valores(self, pks):
+        chave = f'{self.ligacao}_id'
+        return self.leitura.valores(
+            self.consulta.filter(**{f'{chave}__in': pks}).order_by(chave, 'pk'), chave,
+        )
+
+    def _agrupados(self, valores, fuso):
+        grupos, chave, linha = {}, f'{self.ligacao}_id', self.leitura.linha
+        for v in valores:
+            grupos.setdefault(v[chave], []).append(linha(v, fuso))
+        return grupos
+
+    def agrupar(self, pks, fuso):
+        """{pk do pai: [linhas]} em uma consulta."""
+        if not pks:
+            return {}
+        return self._agrupados(self._valores(pks), fuso)
+
+    async def aagrupar(self, pks, fuso):
+        if not pks:
+            return {}
+        return self._agrupados([v async for v in self._valores(pks)], fuso)
+
+
+class Leitura:
+    """Campos de leitura de um recurso: (nome, caminho[, conversor]), Relacionado ou Filhos.
+
+    `linha(valores, fuso)` monta uma linha a partir de um dict de values(); `linhas()` faz o
+    mesmo para uma página inteira e preenche os Filhos. `omitir_se_nulo` ({campo: caminho})
+    reproduz o DRF, que deixa de fora o campo de leitura cujo `source` passa por uma chave
+    estrangeira nula (ex.: vendedor_username de uma venda sem vendedor).
+    """
+
+    def __init__(self, campos, omitir_se_nulo=None):
+        self.filhos = [(nome, especificacao[0]) for nome, *especificacao in campos if isinstance(especificacao[0], Filhos)]
+        caminhos = ['pk', *(omitir_se_nulo or {}).values()]
+        self.linha = self._compilar(campos, caminhos, omitir_se_nulo or {})
+        self.caminhos = list(dict.fromkeys(caminhos))
+
+    @staticmethod
+    def _compilar(campos, caminhos, omitir_se_nulo):
+        # Gera `def linha(v, fuso): return {'nome': conversor(v['caminho']), ...}`: um dict literal
+        # por linha, sem laço sobre os campos nem chamada para os que não precisam de conversão
+        contexto = {}
+
+        def expressao(especificacao, prefixo):
+            if isinstance(especificacao[0], Filhos):
+                return 'None'  # preenchido por linhas()
+            if isinstance(especificacao[0], Relacionado):
+                caminho = prefixo + especificacao[0].caminho
+                caminhos.append(f'{caminho}__pk')
+                return f'(None if v[{caminho + "__pk"!r}] is None else {objeto(especificacao[0].campos, caminho + "__")})'
+            caminho, *conversor = especificacao
+            caminho = prefixo + caminho
+            caminhos.append(caminho)
+            if not conversor:
+                return f'v[{caminho!r}]'
+            nome = f'c{len(contexto)}'
+            contexto[nome] = conversor[0]
+            if getattr(conversor[0], 'usa_fuso', False):
+                return f'{nome}(v[{caminho!r}], fuso)'
+            return f'{nome}(v[{caminho!r}])'
+
+        def objeto(campos, prefixo=''):
+            return '{' + ', '.join(f'{nome!r}: {expressao(especificacao, prefixo)}' for nome, *especificacao in campos) + '}'
+
+        codigo = f'def linha(v, fuso):\n    linha = {objeto(campos)}\n'
+        for nome, caminho in omitir_se_nulo.items():
+            codigo += f'    if v[{caminho!r}] is None:\n        del linha[{nome!r}]\n'
+        exec(codigo + '    return linha\n', contexto)
+        return contexto['linha']
+
+    def valores(self, queryset, *extras):
+        return queryset.prefetch_related(None).values(*self.caminhos, *extras)
+
+    def linhas(self, valores):
+        fuso = timezone.get_current_timezone()
+        valores = list(valores)
+        linha = self.linha
+        linhas = [linha(v, fuso) for v in valores]
+        for nome, filhos in self.filhos:
+            grupos = filhos.agrupar([v['pk'] for v in valores], fuso)
+            for linha, v in zip(linhas, valores):
+                linha[nome] = grupos.get(v['pk'], [])
+        return linhas
+
+    async def alinhas(self, valores):
+        """linhas() com o ORM assíncrono; `valores` é o queryset de valores()."""
+        fuso = timezone.get_current_timezone()
+        valores = [v async for v in valores]
+        linha = self.linha
+        linhas = [linha(v, fuso) for v in valores]
+        for nome, filhos in self.filhos:
+            grupos = await filhos.aagrupar([v['pk'] for v in valores], fuso)
+            for linha, v in zip(linhas, valores):
+                linha[nome] = grupos.get(v['pk'], [])
+        return linhas
+
+
+def _criacao():
+    return [('criado_em', 'criado_em', data_hora), ('atualizado_em', 'atualizado_em', data_hora)]
+
+
+CLIENTE = Leitura([
+    ('uuid', 'uuid', texto), ('empresa', 'empresa_id'), ('empresa_nome', 'empresa__nome'),
+    ('nome', 'nome'), ('cpf', 'cpf'), ('email', 'email'), ('telefone', 'telefone'), ('endereco', 'endereco'),
+    *_criacao(),
+])
+
+PRODUTO = Leitura([
+    ('uuid', 'uuid', texto), ('empresa', 'empresa_id'), ('empresa_nome', 'empresa__nome'),
+    ('nome', 'nome'), ('codigo_barras', 'codigo_barras'), ('descricao', 'descricao'),
+    ('preco', 'preco', texto), ('estoque', 'estoque'),
+    *_criacao(),
+])
+
+CAIXA = Leitura([
+    ('uuid', 'uuid', texto), ('empresa', 'empresa_id'), ('empresa_nome', 'empresa__nome'),
+    ('nome', 'nome'), ('ativo', 'ativo'), ('tipo', 'tipo'), ('tipo_display', 'tipo', tipo_caixa),
+    ('ip_endereco', 'ip_endereco'), ('porta', 'porta'),
+    *_criacao(),
+])
+
+SESSAO_CAIXA = Leitura([
+    ('uuid', 'uuid', texto), ('caixa', 'caixa_id'), ('caixa_nome', 'caixa__nome'),
+    ('vendedor', 'vendedor_id'), ('vendedor_username', 'vendedor__username'),
+    ('data_abertura', 'data_abertura', data_hora), ('data_fechamento', 'data_fechamento', data_hora),
+    ('saldo_inicial', 'saldo_inicial', texto), ('saldo_final', 'saldo_final', texto), ('observacoes', 'observacoes'),
+    ('quantidade_vendas', 'quantidade_vendas'), ('total_vendas', 'total_vendas', texto),
+    ('total_devolvido', 'total_devolvido', texto), ('total_faturado', 'total_faturado', texto),
+    ('esta_aberta', 'data_fechamento', nulo),
+    *_criacao(),
+])
+
+ITEM_VENDA = Leitura([
+    ('uuid', 'uuid', texto), ('produto_nome', 'produto__nome'), ('quantidade', 'quantidade'),
+    ('preco_unitario', 'preco_unitario', texto),
+    *_criacao(),
+])
+
+DEVOLUCAO_ITEM_VENDA = Leitura([
+    ('uuid', 'uuid', texto), ('item_venda_nome', 'item_venda__produto__nome'), ('quantidade', 'quantidade'),
+    ('motivo', 'motivo'),
+    *_criacao(),
+])
+
+VENDA = Leitura([
+    ('uuid', 'uuid', texto), ('empresa', 'empresa_id'), ('cliente', 'cliente_id'), ('sessao_caixa', 'sessao_caixa_id'),
+    ('vendedor', 'vendedor_id'), ('data_venda', 'data_venda', data_hora), ('total', 'total', texto),
+    ('forma_pagamento', 'forma_pagamento'),
+    ('itens', Filhos(ITEM_VENDA, 'venda', ItemVenda.objects.all())),
+    ('fatura', Relacionado('fatura', [
+        ('uuid', 'uuid', texto), ('data_emissao', 'data_emissao', data), ('data_vencimento', 'data_vencimento', data),
+        ('valor_total', 'valor_total', texto), ('paga', 'paga'),
+        *_criacao(),
+    ])),
+    ('devolucoes', Filhos(DEVOLUCAO_ITEM_VENDA, 'venda', DevolucaoItemVenda.objects.all())),
+    ('cliente_nome', 'cliente__nome'), ('vendedor_username', 'vendedor__username'),
+    ('caixa_nome', 'sessao_caixa__caixa__nome'),
+    *_criacao(),
+], omitir_se_nulo={'vendedor_username': 'vendedor_id'})
+
+USUARIO = Leitura([
+    ('uuid', 'uuid', texto), ('username', 'username'), ('email', 'email'),
+    ('first_name', 'first_name'), ('last_name', 'last_name'),
+    ('empresa', 'empresa_id'), ('empresa_nome', 'empresa__nome'),
+    ('caixa_atual', 'caixa_atual_id'), ('caixa_atual_nome', 'caixa_atual__nome'),
+    ('is_staff', 'is_staff'), ('is_active', 'is_active'),
+    ('date_joined', 'date_joined', data_hora), ('last_login', 'last_login', data_hora),
+], omitir_se_nulo={'empresa_nome': 'empresa_id', 'caixa_atual_nome': 'caixa_atual_id'})
@@ -0,0 +1,56 @@
+import datetime
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+
+from ..exportacao import formatos_disponiveis
+from ..models import Exportacao
+
+
+class FiltroRelatorioSerializer(serializers.Serializer):
+    # Parâmetros de consulta dos relatórios; sem período, os últimos 30 dias
+    inicio = serializers.DateField(required=False)
+    fim = serializers.DateField(required=False)
+    caixa = serializers.UUIDField(required=False)
+    vendedor = serializers.UUIDField(required=False)
+    limite = serializers.IntegerField(required=False, default=10, min_value=1, max_value=100)
+    ordenar = serializers.ChoiceField(choices=['quantidade', 'total'], required=False, default='quantidade')
+
+    def validate(self, attrs):
+        attrs.setdefault('fim', timezone.localdate())
+        attrs.setdefault('inicio', attrs['fim'] - datetime.timedelta(days=29))
+        if attrs['inicio'] > attrs['fim']:
+            raise serializers.ValidationError({'inicio': 'O início do período deve ser anterior ao fim.'})
+        if (attrs['fim'] - attrs['inicio']).days > 366:
+            raise serializers.ValidationError({'inicio': 'Período máximo de 366 dias.'})
+        return attrs
+
+
+class ExportacaoSerializer(serializers.ModelSerializer):
+    arquivo_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Exportacao
+        fields = [
+            'uuid', 'formato', 'tipo', 'inicio', 'fim', 'status', 'linhas', 'tamanho', 'erro',
+            'criado_em', 'iniciado_em', 'concluido_em', 'arquivo_url',
+        ]
+        read_only_fields = ['uuid', 'status', 'linhas', 'tamanho', 'erro', 'criado_em', 'iniciado_em', 'concluido_em']
+
+    def get_arquivo_url(self, obj):
+        if obj.status != Exportacao.Status.CONCLUIDA:
+            return None
+        url = reverse('exportacao-arquivo', args=[obj.uuid])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def validate_formato(self, value):
+        if value not in formatos_disponiveis():
+            raise serializers.ValidationError(f"Formato indisponível neste servidor: {value}.")
+        return value
+
+    def validate(self, attrs):
+        if attrs.get('inicio') and attrs.get('fim') and attrs['inicio'] > attrs['fim']:
+            raise serializers.ValidationError({'inicio': 'O início do período deve ser anterior ao fim.'})
+        return attrs
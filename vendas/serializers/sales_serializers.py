@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.db import transaction
-from ..models import Venda, ItemVenda, Fatura, DevolucaoItemVenda, Cliente, Produto, SessaoCaixa, Usuario
+from django.utils import timezone
+from .. import cache, fechamento
+from ..estoque import baixar_estoque, repor_estoque
+from ..middleware import get_current_user
+from ..models import Venda, ItemVenda, Fatura, DevolucaoItemVenda, Cliente, Produto, SessaoCaixa, Usuario, ReservaEstoque, FormaPagamento
 
 class ItemVendaSerializer(serializers.ModelSerializer):
     produto_uuid = serializers.UUIDField(write_only=True, required=True)
@@ -11,14 +15,6 @@ class ItemVendaSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'produto_uuid', 'produto_nome', 'quantidade', 'preco_unitario', 'criado_em', 'atualizado_em']
         read_only_fields = ['uuid', 'criado_em', 'atualizado_em', 'produto_nome', 'preco_unitario']
 
-    def validate_produto_uuid(self, value):
-        try:
-            produto = Produto.objects.get(uuid=value)
-            self.context['product_objects'][str(value)] = produto 
-            return value
-        except Produto.DoesNotExist:
-            raise serializers.ValidationError(f"Produto com o UUID '{value}' fornecido não existe.")
-
 class FaturaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Fatura
@@ -34,30 +30,22 @@ class DevolucaoItemVendaSerializer(serializers.ModelSerializer):
         fields = ['uuid', 'item_venda_uuid', 'item_venda_nome', 'quantidade', 'motivo', 'criado_em', 'atualizado_em']
         read_only_fields = ['uuid', 'criado_em', 'atualizado_em', 'item_venda_nome']
 
-    def validate_item_venda_uuid(self, value):
-        try:
-            item_venda = ItemVenda.objects.get(uuid=value)
-            self.context['item_venda_objects'][str(value)] = item_venda
-            return value
-        except ItemVenda.DoesNotExist:
-            raise serializers.ValidationError(f"Item de venda com o UUID '{value}' fornecido não existe.")
-
 class VendaSerializer(serializers.ModelSerializer):
     itens = ItemVendaSerializer(many=True, required=False)
     fatura = FaturaSerializer(required=False, allow_null=True)
-    devolucoes = DevolucaoItemVendaSerializer(many=True, required=False)
+    devolucoes = DevolucaoItemVendaSerializer(many=True, required=False, source='devolucoes_itens')
     cliente_nome = serializers.CharField(source='cliente.nome', read_only=True)
     vendedor_username = serializers.CharField(source='vendedor.username', read_only=True)
     caixa_nome = serializers.CharField(source='sessao_caixa.caixa.nome', read_only=True)
     cliente_uuid = serializers.UUIDField(write_only=True, required=True)
-    vendedor_uuid = serializers.UUIDField(write_only=True, required=True)
+    vendedor_uuid = serializers.UUIDField(write_only=True, required=False)
     sessao_caixa_uuid = serializers.UUIDField(write_only=True, required=True)
 
     class Meta:
         model = Venda
         fields = [
             'uuid', 'empresa', 'cliente', 'cliente_uuid', 'sessao_caixa', 'sessao_caixa_uuid',
-            'vendedor', 'vendedor_uuid', 'data_venda', 'total',
+            'vendedor', 'vendedor_uuid', 'data_venda', 'total', 'forma_pagamento',
             'itens', 'fatura', 'devolucoes',
             'cliente_nome', 'vendedor_username', 'caixa_nome',
             'criado_em', 'atualizado_em'
@@ -69,92 +57,148 @@ class VendaSerializer(serializers.ModelSerializer):
             'criado_em', 'atualizado_em'
         ]
 
+    def validate_itens(self, value):
+        # Resolve todos os produtos da venda de uma vez: pelo cache do catálogo quando a
+        # empresa é conhecida, senão em uma única consulta IN. O preço cobrado não vem
+        # daqui, e sim das linhas travadas pela baixa de estoque (_baixar_estoque)
+        uuids = {str(item['produto_uuid']) for item in value}
+        request = self.context.get('request')
+        empresa_id = getattr(getattr(request, 'user', None), 'empresa_id', None)
+        if empresa_id:
+            produtos = cache.produtos_por_uuid(empresa_id, uuids)
+        else:
+            produtos = {str(u): p for u, p in Produto.objects.in_bulk(uuids, field_name='uuid').items()}
+        faltando = [u for u in uuids if u not in produtos]
+        if faltando:
+            raise serializers.ValidationError(f"Produto com o UUID '{faltando[0]}' fornecido não existe.")
+        self.context['product_objects'].update(produtos)
+        return value
+
+    def validate_vendedor_uuid(self, value):
+        # Opcional: a venda é sempre do usuário autenticado; se vier, tem que ser ele
+        user = getattr(self.context.get('request'), 'user', None)
+        if user is not None and user.is_authenticated and value != user.uuid:
+            raise serializers.ValidationError('O vendedor da venda deve ser o usuário autenticado.')
+        return value
+
+    def validate_devolucoes(self, value):
+        uuids = {devolucao['item_venda_uuid'] for devolucao in value}
+        itens = ItemVenda.objects.select_related('produto').in_bulk(uuids, field_name='uuid')
+        faltando = [str(u) for u in uuids if u not in itens]
+        if faltando:
+            raise serializers.ValidationError(f"Item de venda com o UUID '{faltando[0]}' fornecido não existe.")
+        self.context['item_venda_objects'].update({str(u): i for u, i in itens.items()})
+        return value
+
+    def _produto(self, item_data):
+        return self.context['product_objects'][str(item_data['produto_uuid'])]
+
+    def _baixar_estoque(self, itens_data, sessao_caixa):
+        # Retorna {produto_id: preço} das linhas travadas pela baixa
+        quantidades = {}
+        for item_data in itens_data:
+            pk = self._produto(item_data).pk
+            quantidades[pk] = quantidades.get(pk, 0) + item_data['quantidade']
+        return baixar_estoque(quantidades, sessao_caixa=sessao_caixa)
+
+    def _criar_itens(self, venda, itens_data, precos):
+        user = get_current_user()
+        itens = []
+        for item_data in itens_data:
+            product_obj = self._produto(item_data)
+            itens.append(ItemVenda(
+                venda=venda,
+                produto=product_obj,
+                quantidade=item_data['quantidade'],
+                preco_unitario=precos[product_obj.pk],
+                criado_por=user,
+                atualizado_por=user,
+            ))
+        ItemVenda.objects.bulk_create(itens)
+        return itens
+
+    def _criar_devolucoes(self, venda, devolucoes_data):
+        user = get_current_user()
+        return DevolucaoItemVenda.objects.bulk_create([
+            DevolucaoItemVenda(
+                venda=venda,
+                item_venda=self.context['item_venda_objects'][str(devolucao_data['item_venda_uuid'])],
+                quantidade=devolucao_data['quantidade'],
+                motivo=devolucao_data.get('motivo'),
+                criado_por=user,
+                atualizado_por=user,
+            )
+            for devolucao_data in devolucoes_data
+        ])
+
     def create(self, validated_data):
         itens_data = validated_data.pop('itens', [])
         fatura_data = validated_data.pop('fatura', None)
-        devolucoes_data = validated_data.pop('devolucoes', [])
+        devolucoes_data = validated_data.pop('devolucoes_itens', [])
         cliente_uuid = validated_data.pop('cliente_uuid')
-        vendedor_uuid = validated_data.pop('vendedor_uuid')
+        vendedor_uuid = validated_data.pop('vendedor_uuid', None)
         sessao_caixa_uuid = validated_data.pop('sessao_caixa_uuid')
 
+        # A view já resolve sessão, cliente e vendedor e os repassa em save(); só consulta o que faltar
         try:
-            cliente = Cliente.objects.get(uuid=cliente_uuid)
-            vendedor = Usuario.objects.get(uuid=vendedor_uuid)
-            sessao_caixa = SessaoCaixa.objects.get(uuid=sessao_caixa_uuid)
-            empresa = sessao_caixa.caixa.empresa 
+            if 'cliente' not in validated_data:
+                validated_data['cliente'] = Cliente.objects.get(uuid=cliente_uuid)
+            if 'vendedor' not in validated_data:
+                validated_data['vendedor'] = Usuario.objects.get(uuid=vendedor_uuid)
+            if 'sessao_caixa' not in validated_data:
+                validated_data['sessao_caixa'] = SessaoCaixa.objects.select_related('caixa__empresa').get(uuid=sessao_caixa_uuid)
+            if 'empresa' not in validated_data:
+                validated_data['empresa'] = validated_data['sessao_caixa'].caixa.empresa
 
         except (Cliente.DoesNotExist, Usuario.DoesNotExist, SessaoCaixa.DoesNotExist) as e:
             raise serializers.ValidationError(f"Erro de dados relacionados: {e}")
 
-        validated_data['cliente'] = cliente
-        validated_data['vendedor'] = vendedor
-        validated_data['sessao_caixa'] = sessao_caixa
-        validated_data['empresa'] = empresa
-
-        total_venda = 0
-        for item_data in itens_data:
-            product_obj = self.context['product_objects'][str(item_data['produto_uuid'])]
-            total_venda += product_obj.preco * item_data['quantidade']
-        validated_data['total'] = total_venda
-
         with transaction.atomic():
+            precos = self._baixar_estoque(itens_data, validated_data['sessao_caixa'])
+            total_venda = sum(
+                (precos[self._produto(item_data).pk] * item_data['quantidade'] for item_data in itens_data), 0
+            )
+            validated_data['total'] = total_venda
             venda = Venda.objects.create(**validated_data)
+            self._criar_itens(venda, itens_data, precos)
 
-            for item_data in itens_data:
-                product_obj = self.context['product_objects'][str(item_data['produto_uuid'])]
-                ItemVenda.objects.create(
-                    venda=venda,
-                    produto=product_obj,
-                    quantidade=item_data['quantidade'],
-                    preco_unitario=product_obj.preco
-                )
-                product_obj.estoque -= item_data['quantidade']
-                product_obj.save()
-
+            fatura = None
             if fatura_data:
                 if 'valor_total' not in fatura_data:
                      fatura_data['valor_total'] = total_venda
-                Fatura.objects.create(venda=venda, **fatura_data)
-            
-            for devolucao_data in devolucoes_data:
-                item_venda_obj = self.context['item_venda_objects'][str(devolucao_data['item_venda_uuid'])]
-                DevolucaoItemVenda.objects.create(
-                    venda=venda,
-                    item_venda=item_venda_obj,
-                    quantidade=devolucao_data['quantidade'],
-                    motivo=devolucao_data['motivo']
-                )
+                fatura = Fatura.objects.create(venda=venda, **fatura_data)
+
+            devolucoes = self._criar_devolucoes(venda, devolucoes_data)
+            fechamento.registrar([fechamento.Movimento(
+                venda.sessao_caixa_id, venda.forma_pagamento, 1, venda.total,
+                sum((d.quantidade * d.item_venda.preco_unitario for d in devolucoes), fechamento.ZERO),
+                fatura.valor_total if fatura else fechamento.ZERO,
+            )], exigir_aberta=True)
         return venda
     
     def update(self, instance, validated_data):
         itens_data = validated_data.pop('itens', None)
         fatura_data = validated_data.pop('fatura', None)
-        devolucoes_data = validated_data.pop('devolucoes', None)
-
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        devolucoes_data = validated_data.pop('devolucoes_itens', None)
 
         with transaction.atomic():
+            anterior = fechamento.movimento_da_venda(instance)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
             if itens_data is not None:
                 current_items = instance.itens.all()
-                for item in current_items:
-                    item.produto.estoque += item.quantidade
-                    item.produto.save()
-                current_items.delete()
-
-                for item_data in itens_data:
-                    product_obj = self.context['product_objects'][str(item_data['produto_uuid'])]
-                    ItemVenda.objects.create(
-                        venda=instance,
-                        produto=product_obj,
-                        quantidade=item_data['quantidade'],
-                        preco_unitario=product_obj.preco
-                    )
-                    product_obj.estoque -= item_data['quantidade']
-                    product_obj.save()
-                
-                instance.total = sum((item.produto.preco * item.quantidade) for item in instance.itens.all())
+                devolvidos = {}
+                for produto_id, quantidade in current_items.values_list('produto_id', 'quantidade'):
+                    devolvidos[produto_id] = devolvidos.get(produto_id, 0) + quantidade
+                repor_estoque(devolvidos)
+                # Os itens substituídos saem de vez (com as devoluções deles), como antes
+                current_items.hard_delete()
+
+                precos = self._baixar_estoque(itens_data, instance.sessao_caixa)
+                itens = self._criar_itens(instance, itens_data, precos)
+                instance.total = sum((item.preco_unitario * item.quantidade) for item in itens)
                 instance.save()
 
             if fatura_data is not None:
@@ -168,26 +212,46 @@ class VendaSerializer(serializers.ModelSerializer):
                     Fatura.objects.create(venda=instance, **fatura_data)
             
             if devolucoes_data is not None:
-                for devolucao_data in devolucoes_data:
-                    item_venda_obj = self.context['item_venda_objects'][str(devolucao_data['item_venda_uuid'])]
-                    DevolucaoItemVenda.objects.create(
-                        venda=instance,
-                        item_venda=item_venda_obj,
-                        quantidade=devolucao_data['quantidade'],
-                        motivo=devolucao_data['motivo']
-                    )
+                self._criar_devolucoes(instance, devolucoes_data)
+
+            fechamento.registrar([fechamento.negativo(anterior), fechamento.movimento_da_venda(instance)], exigir_aberta=True)
 
         return instance
 
     def run_validation(self, data):
         self.context['product_objects'] = {}
         self.context['item_venda_objects'] = {}
+        return super().run_validation(data)
+
+class ReservaEstoqueSerializer(serializers.ModelSerializer):
+    produto_uuid = serializers.UUIDField(write_only=True, required=True)
+    sessao_caixa_uuid = serializers.UUIDField(write_only=True, required=True)
+    produto_nome = serializers.CharField(source='produto.nome', read_only=True)
+    quantidade = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = ReservaEstoque
+        fields = ['uuid', 'produto_uuid', 'produto_nome', 'sessao_caixa_uuid', 'quantidade', 'expira_em', 'criado_em']
+        read_only_fields = ['uuid', 'produto_nome', 'expira_em', 'criado_em']
+
+
+class ItemVendaLoteSerializer(serializers.Serializer):
+    produto_uuid = serializers.UUIDField()
+    quantidade = serializers.IntegerField(min_value=1)
+    # Preço cobrado no terminal; fora de PDV_INGESTAO_TOLERANCIA_PRECO vale o preço atual do produto
+    preco_unitario = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+
 
-        for item_data in data.get('itens', []):
-            if 'produto_uuid' in item_data:
-                pass 
+class VendaLoteSerializer(serializers.Serializer):
+    # Venda registrada offline; o uuid é gerado no terminal e serve de chave de idempotência
+    uuid = serializers.UUIDField()
+    sessao_caixa_uuid = serializers.UUIDField()
+    cliente_uuid = serializers.UUIDField()
+    data_venda = serializers.DateTimeField(required=False)
+    forma_pagamento = serializers.ChoiceField(choices=FormaPagamento.choices, default=FormaPagamento.DINHEIRO)
+    itens = ItemVendaLoteSerializer(many=True, allow_empty=False)
 
-        for devolucao_data in data.get('devolucoes', []):
-            if 'item_venda_uuid' in devolucao_data:
-                pass
-        return super().run_validation(data)
\ No newline at end of file
+    def validate_data_venda(self, value):
+        if value > timezone.now():
+            raise serializers.ValidationError('A data da venda não pode estar no futuro.')
+        return value
@@ -0,0 +1,108 @@
+# vendas/signals.py
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from . import cache, documentos, esquemas, notificacoes
+from .models import Produto, Cliente, Caixa, SessaoCaixa, Fatura, Empresa
+from .models.base import alteracao_em_lote
+from .sync import RECURSOS
+
+
+def _empresa_id(instance):
+    if isinstance(instance, SessaoCaixa):
+        return instance.caixa.empresa_id
+    return instance.empresa_id
+
+
+def _invalidar(modelo, empresa_id, uuids):
+    cache.invalidar(modelo, empresa_id, uuids)
+    # De novo no commit: outra requisição pode ter relido a versão antiga antes dele
+    transaction.on_commit(lambda: cache.invalidar(modelo, empresa_id, uuids))
+
+
+def invalidar_cache(sender, instance, **kwargs):
+    # post_save também cobre a exclusão lógica (SoftDeleteModel.delete chama save)
+    empresa_id = _empresa_id(instance)
+    _invalidar(sender, empresa_id, [instance.uuid])
+    if sender is Caixa:
+        # As sessões em cache carregam o caixa junto
+        _invalidar(SessaoCaixa, empresa_id, list(instance.sessoes.values_list('uuid', flat=True)))
+
+
+for modelo in (Produto, Cliente, Caixa, SessaoCaixa):
+    post_save.connect(invalidar_cache, sender=modelo, dispatch_uid=f'invalidar_cache_{modelo.__name__}')
+    post_delete.connect(invalidar_cache, sender=modelo, dispatch_uid=f'invalidar_cache_delete_{modelo.__name__}')
+
+
+# Terminais avisados pelo canal de eventos (vendas/notificacoes.py), com o nome do recurso no feed
+NOTIFICADOS = {Produto: 'produtos', Cliente: 'clientes', Caixa: 'caixas'}
+
+
+def registrar_alteracao(sender, instance, created=None, **kwargs):
+    # `created` só vem no post_save; no post_delete a linha saiu de vez
+    if instance.empresa_id is None:
+        return
+    excluida = created is None
+    cache.renovar_versao(sender, instance.empresa_id, None if excluida else instance.versao)
+    if sender in NOTIFICADOS:
+        removido = excluida or instance.deletado_em is not None
+        notificacoes.publicar(instance.empresa_id, NOTIFICADOS[sender], [instance.uuid], removido=removido)
+
+
+for _, modelo, _, _, _ in RECURSOS:
+    post_save.connect(registrar_alteracao, sender=modelo, dispatch_uid=f'registrar_alteracao_{modelo.__name__}')
+    post_delete.connect(registrar_alteracao, sender=modelo, dispatch_uid=f'registrar_alteracao_delete_{modelo.__name__}')
+
+
+def registrar_alteracao_em_lote(sender, linhas, **kwargs):
+    # O mesmo que invalidar_cache + registrar_alteracao, de uma vez para as linhas de
+    # bulk_create/bulk_update/update/delete do BaseQuerySet
+    por_empresa = {}
+    for empresa_id, uuid, removido in linhas:
+        if empresa_id is not None:
+            por_empresa.setdefault(empresa_id, []).append((uuid, removido))
+    versionado = any(sender is modelo for _, modelo, _, _, _ in RECURSOS)
+    for empresa_id, itens in por_empresa.items():
+        uuids = [uuid for uuid, _ in itens]
+        _invalidar(sender, empresa_id, uuids)
+        if sender is Caixa:
+            _invalidar(SessaoCaixa, empresa_id, list(
+                SessaoCaixa.objects.filter(caixa__uuid__in=uuids).values_list('uuid', flat=True)
+            ))
+        if versionado:
+            cache.renovar_versao(sender, empresa_id)
+        if sender in NOTIFICADOS:
+            for removido in (False, True):
+                selecionados = [uuid for uuid, r in itens if r is removido]
+                if selecionados:
+                    notificacoes.publicar(empresa_id, NOTIFICADOS[sender], selecionados, removido=removido)
+
+
+for modelo in (Produto, Cliente, Caixa, SessaoCaixa):
+    alteracao_em_lote.connect(registrar_alteracao_em_lote, sender=modelo, dispatch_uid=f'alteracao_em_lote_{modelo.__name__}')
+
+
+def gerar_pdf_fatura(sender, instance, **kwargs):
+    # Fora da transação da venda: o PDF é gerado pelo pool de vendas/documentos.py
+    if getattr(settings, 'PDV_DOCUMENTOS_ATIVO', True):
+        transaction.on_commit(lambda: documentos.solicitar_pdf(instance.pk))
+
+
+post_save.connect(gerar_pdf_fatura, sender=Fatura, dispatch_uid='gerar_pdf_fatura')
+
+
+def lembrar_esquema(sender, instance, created=False, **kwargs):
+    esquemas.lembrar_empresa(instance.pk, instance.schema_name)
+    if not created:
+        # O nome da empresa sai em todas as linhas do catálogo
+        for _, modelo, _, _, _ in RECURSOS:
+            cache.renovar_versao(modelo, instance.pk)
+
+
+def esquecer_esquema(sender, instance, **kwargs):
+    esquemas.esquecer_empresa(instance.pk)
+
+
+post_save.connect(lembrar_esquema, sender=Empresa, dispatch_uid='lembrar_esquema_empresa')
+post_delete.connect(esquecer_esquema, sender=Empresa, dispatch_uid='esquecer_esquema_empresa')
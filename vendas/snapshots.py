@@ -0,0 +1,146 @@
+# vendas/snapshots.py
+# Snapshots pré-computados da carga inicial de cada empresa.
+#
+# O snapshot é o NDJSON de dados-iniciais, comprimido e gravado em disco com o número
+# da marca d'água de versões (vendas/sync.py) no nome. Provisionar vários caixas passa a custar uma
+# geração + leituras de arquivo; o que mudou depois do snapshot vem do feed incremental.
+import gzip
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+
+from .bootstrap import gerar_ndjson
+from .sync import RECURSOS, marca_dagua
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EXTENSOES = {'gzip': '.ndjson.gz', 'zstd': '.ndjson.zst'}
+TAMANHO_LEITURA = 64 * 1024
+_NOME_ARQUIVO = re.compile(r'^(\d+)\.ndjson\.(gz|zst)$')
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _diretorio(empresa):
+    return Path(getattr(settings, 'PDV_SNAPSHOT_DIR', Path(settings.BASE_DIR) / 'snapshots')) / str(empresa.uuid)
+
+
+def _compressao():
+    compressao = getattr(settings, 'PDV_SNAPSHOT_COMPRESSAO', 'gzip')
+    if compressao == 'zstd' and zstandard is None:
+        return 'gzip'
+    return compressao
+
+
+def _abrir_para_escrita(arquivo, compressao):
+    if compressao == 'zstd':
+        return zstandard.ZstdCompressor(level=10).stream_writer(arquivo)
+    return gzip.GzipFile(fileobj=arquivo, mode='wb', compresslevel=6)
+
+
+def snapshot_mais_recente(empresa):
+    """Retorna (versao, caminho) do snapshot mais novo da empresa, ou (None, None)."""
+    diretorio = _diretorio(empresa)
+    if not diretorio.is_dir():
+        return None, None
+    encontrados = []
+    for nome in os.listdir(diretorio):
+        match = _NOME_ARQUIVO.match(nome)
+        if match:
+            encontrados.append((int(match.group(1)), diretorio / nome))
+    return max(encontrados, default=(None, None))
+
+
+def versao_empresa(empresa):
+    # Maior versão entre os dados sincronizados da empresa (varredura só no índice (empresa, versao))
+    return max(
+        (model._base_manager.filter(empresa=empresa).aggregate(v=Max('versao'))['v'] or 0)
+        for _, model, _, _, _ in RECURSOS
+    )
+
+
+def gerar_snapshot(empresa, manter=2):
+    versao = marca_dagua()
+    compressao = _compressao()
+    diretorio = _diretorio(empresa)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    destino = diretorio / f'{versao}{EXTENSOES[compressao]}'
+
+    # Grava em arquivo temporário e renomeia: quem está baixando nunca vê um arquivo pela metade
+    fd, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as arquivo:
+            saida = _abrir_para_escrita(arquivo, compressao)
+            for bloco in gerar_ndjson(empresa, versao):
+                saida.write(bloco)
+            saida.close()
+        os.replace(temporario, destino)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+
+    antigos = sorted(
+        (int(m.group(1)), diretorio / nome)
+        for nome in os.listdir(diretorio)
+        if (m := _NOME_ARQUIVO.match(nome))
+    )[:-manter]
+    for _, caminho in antigos:
+        caminho.unlink(missing_ok=True)
+    return versao, destino
+
+
+def etag_snapshot(empresa, versao):
+    return f'"{empresa.uuid.hex}-{versao}"'
+
+
+def responder_arquivo(request, caminho, etag, content_type):
+    """Serve o arquivo com ETag, If-None-Match e um único intervalo de Range."""
+    # Como em vendas/condicional.py: `*`, validadores fracos e If-Match pelas regras do Django
+    resposta = get_conditional_response(request, etag=etag)
+    if resposta is not None:
+        resposta['ETag'] = etag
+        return resposta
+
+    tamanho = caminho.stat().st_size
+    inicio, fim, status = 0, tamanho - 1, 200
+    match = _RANGE.match(request.headers.get('Range', ''))
+    if match and any(match.groups()) and request.headers.get('If-Range', etag) == etag:
+        primeiro, ultimo = match.groups()
+        if primeiro:
+            inicio = int(primeiro)
+            fim = min(int(ultimo), tamanho - 1) if ultimo else tamanho - 1
+        else:
+            inicio = max(tamanho - int(ultimo), 0)
+        if inicio > fim or inicio >= tamanho:
+            resposta = HttpResponse(status=416)
+            resposta['Content-Range'] = f'bytes */{tamanho}'
+            return resposta
+        status = 206
+
+    def ler():
+        with open(caminho, 'rb') as arquivo:
+            arquivo.seek(inicio)
+            restante = fim - inicio + 1
+            while restante > 0:
+                bloco = arquivo.read(min(TAMANHO_LEITURA, restante))
+                if not bloco:
+                    break
+                restante -= len(bloco)
+                yield bloco
+
+    resposta = StreamingHttpResponse(ler(), status=status, content_type=content_type)
+    resposta['Content-Length'] = str(fim - inicio + 1)
+    resposta['Accept-Ranges'] = 'bytes'
+    resposta['ETag'] = etag
+    resposta['Content-Disposition'] = f'attachment; filename="{caminho.name}"'
+    if status == 206:
+        resposta['Content-Range'] = f'bytes {inicio}-{fim}/{tamanho}'
+    return resposta
@@ -0,0 +1,115 @@
+# vendas/sync.py
+# Feed de sincronização incremental dos caixas satélite.
+#
+# Cada gravação de Cliente, Produto, Caixa e Usuario recebe uma versão global
+# (vendas/models/base.py). O feed devolve as linhas com versão maior que a do
+# cursor, em ordem, paginadas; cada consulta usa o índice (empresa, versao) e custa
+# proporcionalmente ao número de alterações, não ao tamanho da empresa.
+#
+# A versão é atribuída antes do commit. Para que uma transação ainda em andamento
+# não faça commit com versão menor que a de um cursor já entregue, o feed só lê até
+# a marca d'água `marca_dagua()`, de onde também saem os cursores da carga inicial
+# e dos snapshots; o que passar dela sai nas páginas seguintes.
+import base64
+import binascii
+
+from asgiref.sync import sync_to_async
+from django.db import router
+
+from .models import Cliente, Produto, Caixa, Usuario
+from .models.base import versao_atual
+from .serializers import ClienteSerializer, ProdutoSerializer, CaixaSerializer, UsuarioSerializer
+
+LIMITE_PADRAO = 500
+LIMITE_MAXIMO = 2000
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def _soft_deletado(obj):
+    return obj.deletado_em is not None
+
+
+def _inativo(obj):
+    return not obj.is_active
+
+
+# (nome, modelo, serializer, é tombstone?, select_related)
+RECURSOS = [
+    ('clientes', Cliente, ClienteSerializer, _soft_deletado, ('empresa',)),
+    ('produtos', Produto, ProdutoSerializer, _soft_deletado, ('empresa',)),
+    ('caixas', Caixa, CaixaSerializer, _soft_deletado, ('empresa',)),
+    ('usuarios', Usuario, UsuarioSerializer, _inativo, ('empresa', 'caixa_atual')),
+]
+
+
+def codificar_cursor(versao):
+    return base64.urlsafe_b64encode(f'v={versao}'.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        chave, valor = bruto.split('=', 1)
+        if chave != 'v':
+            raise ValueError
+        return int(valor)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorInvalido(cursor)
+
+
+def marca_dagua():
+    # No mesmo banco das consultas do feed (vendas/roteamento.py escolhe um por requisição)
+    return versao_atual(router.db_for_read(Produto))
+
+
+def _consultas(empresa, versao_inicial, limite, desde, teto):
+    for nome, model, _, _, relacionados in RECURSOS:
+        # _base_manager: as exclusões lógicas também entram no feed
+        qs = model._base_manager.select_related(*relacionados).filter(
+            empresa=empresa, versao__gt=versao_inicial, versao__lte=teto
+        )
+        if desde is not None:
+            qs = qs.filter(atualizado_em__gt=desde)
+        # limite + 1 por recurso: se sobrar algo após o merge, há mais páginas
+        yield nome, qs.order_by('versao')[:limite + 1]
+
+
+def _pagina(candidatos, versao_inicial, limite):
+    candidatos.sort(key=lambda c: c[0])
+    pagina = candidatos[:limite]
+    tem_mais = len(candidatos) > limite
+    ultima_versao = pagina[-1][0] if pagina else versao_inicial
+
+    data = {}
+    for nome, _, serializer_class, removido, _ in RECURSOS:
+        objetos = [obj for _, recurso, obj in pagina if recurso == nome]
+        data[f'{nome}_atualizados'] = serializer_class(
+            [obj for obj in objetos if not removido(obj)], many=True
+        ).data
+        data[f'{nome}_removidos'] = [str(obj.uuid) for obj in objetos if removido(obj)]
+    data['cursor'] = codificar_cursor(ultima_versao)
+    data['tem_mais'] = tem_mais
+    return data
+
+
+def montar_feed(empresa, versao_inicial=0, limite=LIMITE_PADRAO, desde=None):
+    """Retorna uma página de alterações da empresa a partir de `versao_inicial`.
+
+    `desde` (datetime) mantém compatibilidade com o antigo `last_sync_timestamp`.
+    """
+    candidatos = []
+    for nome, qs in _consultas(empresa, versao_inicial, limite, desde, marca_dagua()):
+        candidatos.extend((obj.versao, nome, obj) for obj in qs)
+    return _pagina(candidatos, versao_inicial, limite)
+
+
+async def amontar_feed(empresa, versao_inicial=0, limite=LIMITE_PADRAO, desde=None):
+    """montar_feed com o ORM assíncrono (views assíncronas, vendas/assincrono.py)."""
+    candidatos = []
+    teto = await sync_to_async(marca_dagua)()
+    for nome, qs in _consultas(empresa, versao_inicial, limite, desde, teto):
+        candidatos.extend([(obj.versao, nome, obj) async for obj in qs])
+    return _pagina(candidatos, versao_inicial, limite)
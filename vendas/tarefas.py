@@ -0,0 +1,56 @@
+# vendas/tarefas.py
+# Execução de tarefas em segundo plano dentro do próprio processo do servidor.
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_em_andamento = set()
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PDV_TAREFAS_WORKERS', 2),
+                thread_name_prefix='pdv-tarefa',
+            )
+        return _executor
+
+
+def agendar(func, *args, chave=None, **kwargs):
+    """Executa `func` em uma thread do pool.
+
+    Com `chave`, ignora o pedido se já houver uma tarefa com a mesma chave em
+    andamento (ex.: dois caixas pedindo o mesmo snapshot ao mesmo tempo).
+    A tarefa roda com uma cópia do contexto de quem agendou (ex.: o usuário da
+    auditoria, vendas/middleware.py). Retorna o Future, ou None se o pedido foi ignorado.
+    """
+    if chave is not None:
+        with _lock:
+            if chave in _em_andamento:
+                return None
+            _em_andamento.add(chave)
+
+    def executar():
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            logger.exception("Falha na tarefa em segundo plano %s", getattr(func, '__name__', func))
+            raise
+        finally:
+            # As conexões são por thread; fecha as abertas por esta tarefa
+            connections.close_all()
+            if chave is not None:
+                with _lock:
+                    _em_andamento.discard(chave)
+
+    return _get_executor().submit(contextvars.copy_context().run, executar)
@@ -1,3 +1,1521 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from pyhanko.pdf_utils.reader import PdfFileReader
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import cache, esquemas, exportacao, fechamento, notificacoes, relatorios
+from .benchmark import certificado_autoassinado
+from .manutencao_esquemas import esquemas_existentes, migrar_esquemas
+from .parsers import JSONRapidoParser
+from .renderers import JSONRapidoRenderer
+from .middleware import CurrentUserMiddleware, get_current_user, usuario_atual
+from .roteamento import RoteadorLeitura, requisicao
+from .tarefas import agendar
+from .estoque import baixar_estoque, repor_estoque, reservar, EstoqueInsuficiente
+from .snapshots import gerar_snapshot
+from .sync import codificar_cursor, decodificar_cursor, montar_feed
+from .models import Empresa, Usuario, Cliente, Produto, Caixa, SessaoCaixa, Venda, ItemVenda, DevolucaoItemVenda, Fatura, ReservaEstoque
+from .serializers import ClienteSerializer, ProdutoSerializer, CaixaSerializer, SessaoCaixaSerializer, VendaSerializer
+
+
+def criar_empresa(sufixo='1'):
+    empresa = Empresa.objects.create(nome=f'Empresa {sufixo}', cnpj=f'cnpj-{sufixo}', schema_name=f'empresa_{sufixo}')
+    vendedor = Usuario.objects.create_user(username=f'vendedor_{sufixo}', password='senha', empresa=empresa)
+    caixa = Caixa.objects.create(empresa=empresa, nome=f'Caixa {sufixo}')
+    sessao = SessaoCaixa.objects.create(caixa=caixa, vendedor=vendedor)
+    cliente = Cliente.objects.create(empresa=empresa, nome='Cliente', cpf=f'cpf-{sufixo}')
+    return empresa, vendedor, caixa, sessao, cliente
+
+
+class EstoqueTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, self.sessao, _ = criar_empresa()
+        self.produto = Produto.objects.create(empresa=self.empresa, nome='Arroz', preco=Decimal('10.00'), estoque=5)
+
+    def test_baixa_insuficiente_nao_altera_estoque(self):
+        with self.assertRaises(EstoqueInsuficiente):
+            baixar_estoque({self.produto.pk: 6})
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 5)
+
+    def test_baixa_e_reposicao(self):
+        baixar_estoque({self.produto.pk: 3})
+        repor_estoque({self.produto.pk: 1})
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 3)
+
+    def test_reserva_segura_estoque_para_a_propria_sessao(self):
+        outra_sessao = SessaoCaixa.objects.create(
+            caixa=Caixa.objects.create(empresa=self.empresa, nome='Caixa 2'),
+            vendedor=self.vendedor,
+        )
+        reservar(self.sessao, self.produto, 4)
+        with self.assertRaises(EstoqueInsuficiente):
+            baixar_estoque({self.produto.pk: 2}, sessao_caixa=outra_sessao)
+
+        baixar_estoque({self.produto.pk: 4}, sessao_caixa=self.sessao)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 1)
+        self.assertFalse(self.sessao.reservas_estoque.exists())
+
+
+class DadosAtualizadosTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, _, self.cliente = criar_empresa()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        self.url = f'/api/pdv/empresas/{self.empresa.pk}/dados-atualizados/'
+
+    def _sincronizar(self, cursor, limite):
+        response = self.client.get(self.url, {'cursor': cursor, 'limite': limite})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_paginacao_por_cursor_retoma_de_onde_parou(self):
+        produtos = [
+            Produto.objects.create(empresa=self.empresa, nome=f'P{i}', preco=Decimal('1.00'))
+            for i in range(5)
+        ]
+        vistos, cursor, paginas = [], codificar_cursor(0), 0
+        while True:
+            data = self._sincronizar(cursor, 2)
+            paginas += 1
+            for recurso in ('clientes', 'produtos', 'caixas', 'usuarios'):
+                vistos += [item['uuid'] for item in data[f'{recurso}_atualizados']]
+            cursor = data['cursor']
+            if not data['tem_mais']:
+                break
+        # 1 cliente + 1 caixa + 1 usuário + 5 produtos, em páginas de 2
+        self.assertEqual(len(vistos), 8)
+        self.assertEqual(len(set(vistos)), 8)
+        self.assertEqual(paginas, 4)
+
+        produtos[0].delete()
+        data = self._sincronizar(cursor, 100)
+        self.assertEqual(data['produtos_removidos'], [str(produtos[0].uuid)])
+        self.assertEqual(data['produtos_atualizados'], [])
+
+        data = self._sincronizar(data['cursor'], 100)
+        self.assertFalse(data['tem_mais'])
+        self.assertEqual(data['produtos_removidos'], [])
+
+    def test_cursor_invalido(self):
+        response = self.client.get(self.url, {'cursor': '%%%'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_gravacao_da_propria_transacao_entra_no_feed(self):
+        with transaction.atomic():
+            produto = Produto.objects.create(empresa=self.empresa, nome='Novo', preco=Decimal('1.00'))
+            data = montar_feed(self.empresa)
+            produto.refresh_from_db()
+        self.assertIn(str(produto.uuid), [p['uuid'] for p in data['produtos_atualizados']])
+        self.assertGreaterEqual(decodificar_cursor(data['cursor']), produto.versao)
+
+
+class MarcaDaguaFeedTests(TransactionTestCase):
+    # Duas transações de verdade: a mais antiga faz commit depois da mais nova
+    def test_transacao_em_andamento_nao_fica_para_tras_do_cursor(self):
+        empresa, *_ = criar_empresa()
+        gravou, liberar, erros = threading.Event(), threading.Event(), []
+
+        def gravar_devagar():
+            try:
+                with transaction.atomic():
+                    Produto.objects.create(empresa=empresa, nome='Lento', preco=Decimal('1.00'))
+                    gravou.set()
+                    liberar.wait(5)
+            except Exception as exc:
+                erros.append(exc)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=gravar_devagar)
+        thread.start()
+        gravou.wait(5)
+        Produto.objects.create(empresa=empresa, nome='Rápido', preco=Decimal('1.00'))
+        data = montar_feed(empresa)
+        self.assertEqual([p['nome'] for p in data['produtos_atualizados']], [])
+        liberar.set()
+        thread.join()
+
+        self.assertEqual(erros, [])
+        nomes = [p['nome'] for p in montar_feed(empresa, versao_inicial=decodificar_cursor(data['cursor']))['produtos_atualizados']]
+        self.assertEqual(sorted(nomes), ['Lento', 'Rápido'])
+
+    def test_gravacao_propria_espera_transacao_anterior_em_andamento(self):
+        empresa, *_ = criar_empresa()
+        gravou, liberar, erros = threading.Event(), threading.Event(), []
+
+        def gravar_devagar():
+            try:
+                with transaction.atomic():
+                    Produto.objects.create(empresa=empresa, nome='Lento', preco=Decimal('1.00'))
+                    gravou.set()
+                    liberar.wait(5)
+            except Exception as exc:
+                erros.append(exc)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=gravar_devagar)
+        thread.start()
+        gravou.wait(5)
+        try:
+            with transaction.atomic():
+                Produto.objects.create(empresa=empresa, nome='Rápido', preco=Decimal('1.00'))
+                data = montar_feed(empresa)
+        finally:
+            liberar.set()
+            thread.join()
+
+        # A anterior ainda não fez commit: o cursor não pode passar dela nem da própria gravação
+        self.assertEqual(erros, [])
+        self.assertEqual(data['produtos_atualizados'], [])
+        nomes = [p['nome'] for p in montar_feed(empresa, versao_inicial=decodificar_cursor(data['cursor']))['produtos_atualizados']]
+        self.assertEqual(sorted(nomes), ['Lento', 'Rápido'])
+
+
+class DadosIniciaisTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, _, self.cliente = criar_empresa()
+        Produto.objects.create(empresa=self.empresa, nome='Feijão', preco=Decimal('7.90'), estoque=3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        self.url = f'/api/pdv/empresas/{self.empresa.pk}/dados-iniciais/'
+
+    def test_json_em_streaming_mantem_o_formato_dos_serializers(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        esperado = {
+            'clientes': ClienteSerializer(Cliente.objects.filter(empresa=self.empresa), many=True).data,
+            'produtos': ProdutoSerializer(Produto.objects.filter(empresa=self.empresa), many=True).data,
+            'caixas': CaixaSerializer(Caixa.objects.filter(empresa=self.empresa), many=True).data,
+        }
+        for recurso, linhas in esperado.items():
+            self.assertEqual(data[recurso], json.loads(json.dumps(linhas)))
+        self.assertEqual([u['username'] for u in data['usuarios']], [self.vendedor.username])
+        self.assertEqual(data['empresa']['uuid'], str(self.empresa.uuid))
+        self.assertIn('cursor', data)
+
+    def test_ndjson(self):
+        response = self.client.get(self.url, {'formato': 'ndjson'})
+        linhas = [json.loads(linha) for linha in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([linha['tipo'] for linha in linhas], ['cabecalho', 'clientes', 'produtos', 'caixas', 'usuarios'])
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        configuracao = override_settings(PDV_SNAPSHOT_DIR=self.diretorio.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.empresa, self.vendedor, _, _, _ = criar_empresa()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        self.url = f'/api/pdv/empresas/{self.empresa.pk}/snapshot/'
+
+    def _baixar(self, **headers):
+        return self.client.get(self.url + 'arquivo/', headers=headers)
+
+    def test_snapshot_com_etag_range_e_delta(self):
+        versao, caminho = gerar_snapshot(self.empresa)
+        manifesto = self.client.get(self.url).json()
+        self.assertEqual(manifesto['versao'], versao)
+        self.assertFalse(manifesto['desatualizado'])
+
+        response = self._baixar()
+        conteudo = b''.join(response.streaming_content)
+        self.assertEqual(conteudo, caminho.read_bytes())
+        linhas = gzip.decompress(conteudo).decode().splitlines()
+        self.assertEqual(json.loads(linhas[0])['dados']['cursor'], manifesto['cursor'])
+
+        self.assertEqual(self._baixar(if_none_match=response['ETag']).status_code, 304)
+        self.assertEqual(self._baixar(if_none_match=f'W/{response["ETag"]}').status_code, 304)
+        self.assertEqual(self._baixar(if_none_match='*').status_code, 304)
+        parcial = self._baixar(range='bytes=10-19')
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(b''.join(parcial.streaming_content), conteudo[10:20])
+        self.assertEqual(parcial['Content-Range'], f'bytes 10-19/{len(conteudo)}')
+
+        produto = Produto.objects.create(empresa=self.empresa, nome='Novo', preco=Decimal('2.00'))
+        with mock.patch('vendas.views.agendar') as agendar:
+            manifesto = self.client.get(self.url).json()
+        self.assertTrue(manifesto['desatualizado'])
+        agendar.assert_called_once()
+        self.assertEqual([p['uuid'] for p in manifesto['delta']['produtos_atualizados']], [str(produto.uuid)])
+
+    def test_sem_snapshot_agenda_geracao(self):
+        with mock.patch('vendas.views.agendar') as agendar:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 202)
+        agendar.assert_called_once()
+
+
+class ConsultasPorListagemTests(TestCase):
+    # As listagens devem fazer o mesmo número de queries com 2 ou 20 linhas
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, self.sessao, self.cliente = criar_empresa()
+        self.vendedor.is_staff = True
+        self.vendedor.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        self.produto = Produto.objects.create(empresa=self.empresa, nome='Açúcar', preco=Decimal('5.00'), estoque=10**6)
+        self.ordem = 0
+
+    def _criar_linhas(self, quantidade):
+        for _ in range(quantidade):
+            self.ordem += 1
+            n = self.ordem
+            Cliente.objects.create(empresa=self.empresa, nome=f'C{n}', cpf=f'{n:011d}')
+            Produto.objects.create(empresa=self.empresa, nome=f'P{n}', preco=Decimal('1.00'))
+            caixa = Caixa.objects.create(empresa=self.empresa, nome=f'Extra {n}')
+            SessaoCaixa.objects.create(caixa=caixa, vendedor=self.vendedor, data_fechamento=timezone.now())
+            venda = Venda.objects.create(
+                empresa=self.empresa, cliente=self.cliente, sessao_caixa=self.sessao, vendedor=self.vendedor, total=Decimal('10.00')
+            )
+            item = ItemVenda.objects.create(venda=venda, produto=self.produto, quantidade=2, preco_unitario=Decimal('5.00'))
+            DevolucaoItemVenda.objects.create(venda=venda, item_venda=item, quantidade=1)
+            if n % 2:
+                Fatura.objects.create(venda=venda, data_emissao=timezone.now().date(), data_vencimento=timezone.now().date(), valor_total=Decimal('10.00'))
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_numero_de_queries_nao_depende_do_numero_de_linhas(self):
+        urls = ['/api/pdv/clientes/', '/api/pdv/produtos/', '/api/pdv/caixas/', '/api/pdv/sessoes-caixa/', '/api/pdv/vendas/']
+        self._criar_linhas(2)
+        poucas = {url: self._queries(url) for url in urls}
+        self._criar_linhas(18)
+        muitas = {url: self._queries(url) for url in urls}
+        self.assertEqual(poucas, muitas)
+        self.assertLessEqual(muitas['/api/pdv/vendas/'], 3)
+
+    def test_detalhe_da_venda(self):
+        self._criar_linhas(1)
+        venda = Venda.objects.get(itens__isnull=False)
+        response = self.client.get(f'/api/pdv/vendas/{venda.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['itens']), 1)
+        self.assertEqual(len(response.json()['devolucoes']), 1)
+        self.assertIsNotNone(response.json()['fatura'])
+
+
+class LeituraRapidaTests(TestCase):
+    # As listagens montadas de values() devolvem exatamente o que os serializers devolviam
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, self.sessao, self.cliente = criar_empresa()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        Caixa.objects.create(empresa=self.empresa, nome='Principal', tipo='PRIN', ip_endereco='10.0.0.2', porta=8000)
+        SessaoCaixa.objects.create(
+            caixa=self.caixa, vendedor=self.vendedor, data_fechamento=timezone.now(), saldo_final=Decimal('12.50'),
+        )
+        produtos = [Produto.objects.create(empresa=self.empresa, nome=f'P{n}', preco=Decimal('2.50'), codigo_barras=f'{n}') for n in range(3)]
+        for n in range(3):
+            venda = Venda.objects.create(
+                empresa=self.empresa, cliente=self.cliente, sessao_caixa=self.sessao, vendedor=self.vendedor if n else None,
+                total=Decimal('7.50'), forma_pagamento='PIX',
+            )
+            itens = [ItemVenda.objects.create(venda=venda, produto=produto, quantidade=n + 1, preco_unitario=produto.preco) for produto in produtos[:n + 1]]
+            if n == 1:
+                DevolucaoItemVenda.objects.create(venda=venda, item_venda=itens[0], quantidade=1, motivo='Avaria')
+                Fatura.objects.create(venda=venda, data_emissao=datetime.date(2026, 1, 2), data_vencimento=datetime.date(2026, 2, 2), valor_total=Decimal('7.50'))
+        ItemVenda.objects.filter(venda__forma_pagamento='PIX', quantidade=3).first().delete()
+
+    def _conferir(self, url, serializer_class, queryset, *prefetch):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        linhas = response.json()['results'] if 'results' in response.json() else response.json()
+        esperado = json.loads(json.dumps(serializer_class(queryset.prefetch_related(*prefetch), many=True).data))
+        self.assertEqual(linhas, esperado)
+        self.assertEqual([list(linha) for linha in linhas], [list(linha) for linha in esperado])
+
+    def test_mesma_saida_dos_serializers(self):
+        self._conferir('/api/pdv/clientes/', ClienteSerializer, Cliente.objects.filter(empresa=self.empresa).order_by('-criado_em', '-id'))
+        self._conferir('/api/pdv/produtos/', ProdutoSerializer, Produto.objects.filter(empresa=self.empresa).order_by('-criado_em', '-id'))
+        self._conferir('/api/pdv/caixas/', CaixaSerializer, Caixa.objects.filter(empresa=self.empresa).order_by('-criado_em', '-id'))
+        self._conferir(
+            '/api/pdv/sessoes-caixa/', SessaoCaixaSerializer,
+            SessaoCaixa.objects.filter(vendedor=self.vendedor).order_by('-data_abertura', '-id'),
+        )
+        vendas = Venda.objects.filter(empresa=self.empresa)
+        itens = Prefetch('itens', queryset=ItemVenda.objects.order_by('pk'))
+        self._conferir('/api/pdv/vendas/', VendaSerializer, vendas.order_by('-data_venda', '-id'), itens, 'devolucoes_itens')
+
+        self.vendedor.caixa_atual = self.caixa
+        self.vendedor.save()
+        self._conferir('/api/pdv/vendas/vendas-abertas-sessao/', VendaSerializer, vendas.order_by('-data_venda'), itens, 'devolucoes_itens')
+
+
+class PaginacaoTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, _, _, _ = criar_empresa()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        for n in range(6):
+            Cliente.objects.create(empresa=self.empresa, nome=f'C{n}', cpf=f'{n:011d}')
+
+    def test_percorre_todas_as_paginas_pelo_cursor(self):
+        url, vistos = '/api/pdv/clientes/?page_size=3', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            vistos += [c['uuid'] for c in response.data['results']]
+            url = response.data['next']
+        esperados = Cliente.objects.filter(empresa=self.empresa).order_by('-criado_em', '-id').values_list('uuid', flat=True)
+        self.assertEqual(vistos, [str(u) for u in esperados])
+
+    @override_settings(PDV_PAGINACAO_MAXIMO=2)
+    def test_tamanho_da_pagina_respeita_o_maximo(self):
+        response = self.client.get('/api/pdv/clientes/?page_size=1000')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+
+class ConsultaProdutoTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, _, _, _ = criar_empresa()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        for nome, codigo in [('Café Pilão 500g', '7891234567895'), ('Cafeteira', None), ('Açúcar', '7890000000011')]:
+            Produto.objects.create(empresa=self.empresa, nome=nome, codigo_barras=codigo, preco=Decimal('1.00'))
+
+    def test_codigo_de_barras(self):
+        response = self.client.get('/api/pdv/produtos/lookup/', {'codigo': '7891234567895'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['nome'], 'Café Pilão 500g')
+        self.assertEqual(self.client.get('/api/pdv/produtos/lookup/', {'codigo': '000'}).status_code, 404)
+
+    def test_codigo_de_outra_empresa_nao_aparece(self):
+        outra, *_ = criar_empresa('2')
+        Produto.objects.create(empresa=outra, nome='Outro', codigo_barras='123', preco=Decimal('1.00'))
+        self.assertEqual(self.client.get('/api/pdv/produtos/lookup/', {'codigo': '123'}).status_code, 404)
+
+    def test_codigo_unico_por_empresa(self):
+        outra, *_ = criar_empresa('2')
+        Produto.objects.create(empresa=outra, nome='Outro', codigo_barras='7890000000011', preco=Decimal('1.00'))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Produto.objects.create(empresa=self.empresa, nome='Repetido', codigo_barras='7890000000011', preco=Decimal('1.00'))
+
+    def test_busca_por_prefixo(self):
+        response = self.client.get('/api/pdv/produtos/lookup/', {'q': 'CAF'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['nome'] for p in response.data], ['Cafeteira', 'Café Pilão 500g'])  # ordem de bytes (collation "C")
+        self.assertEqual(self.client.get('/api/pdv/produtos/lookup/').status_code, 400)
+
+
+class CacheCatalogoTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        cache.limpar()
+        self.empresa, self.vendedor, self.caixa, self.sessao, self.cliente = criar_empresa()
+        self.produto = Produto.objects.create(empresa=self.empresa, nome='Café', preco=Decimal('10.00'), estoque=100)
+
+    def test_lru_com_ttl(self):
+        local = cache.CacheLocal(max_itens=2, ttl=60)
+        local.set('a', 1)
+        local.set('b', 2)
+        local.get('a')
+        local.set('c', 3)
+        self.assertIsNone(local.get('b'))
+        self.assertEqual((local.get('a'), local.despejos), (1, 1))
+        with mock.patch('vendas.cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(local.get('a'))
+        self.assertEqual(local.expirados, 1)
+
+    def test_leitura_pelo_cache_e_invalidacao_ao_gravar(self):
+        produto_uuid = str(self.produto.uuid)
+        self.assertEqual(cache.produtos_por_uuid(self.empresa.pk, [produto_uuid])[produto_uuid].preco, Decimal('10.00'))
+        with self.assertNumQueries(0):
+            cache.produtos_por_uuid(self.empresa.pk, [produto_uuid])
+
+        self.produto.preco = Decimal('12.00')
+        self.produto.save()
+        self.assertEqual(cache.produtos_por_uuid(self.empresa.pk, [produto_uuid])[produto_uuid].preco, Decimal('12.00'))
+
+        # O nível compartilhado atende quando o LRU do processo não tem a chave
+        cache.limpar()
+        with self.assertNumQueries(0):
+            cache.produtos_por_uuid(self.empresa.pk, [produto_uuid])
+        self.assertEqual(cache.estatisticas()['acertos_compartilhado'], 1)
+
+    def test_venda_cobra_o_preco_das_linhas_travadas(self):
+        cache.produtos_por_uuid(self.empresa.pk, [str(self.produto.uuid)])
+        # Alterado sem avisos: o cache ainda tem o preço antigo
+        Produto.objects.filter(pk=self.produto.pk).sem_avisos().update(preco=Decimal('15.00'))
+        client = APIClient()
+        client.force_authenticate(self.vendedor)
+        response = client.post('/api/pdv/vendas/', {
+            'cliente_uuid': str(self.cliente.uuid),
+            'sessao_caixa_uuid': str(self.sessao.uuid),
+            'itens': [{'produto_uuid': str(self.produto.uuid), 'quantidade': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.data['total']), Decimal('30.00'))
+        self.assertEqual(ItemVenda.objects.get(venda__uuid=response.data['uuid']).preco_unitario, Decimal('15.00'))
+
+    def test_chaves_separadas_por_empresa(self):
+        outra, *_ = criar_empresa('2')
+        self.assertEqual(cache.produtos_por_uuid(outra.pk, [self.produto.uuid]), {})
+        self.assertIsNone(cache.cliente_por_uuid(outra.pk, self.cliente.uuid))
+
+    def test_sessao_fechada_e_invalidada(self):
+        self.assertTrue(cache.sessao_por_uuid(self.empresa.pk, self.sessao.uuid).esta_aberta)
+        self.sessao.fechar_sessao()
+        self.assertFalse(cache.sessao_por_uuid(self.empresa.pk, self.sessao.uuid).esta_aberta)
+
+    def test_estatisticas(self):
+        cache.cliente_por_uuid(self.empresa.pk, self.cliente.uuid)
+        cache.cliente_por_uuid(self.empresa.pk, self.cliente.uuid)
+        client = APIClient()
+        client.force_authenticate(self.vendedor)
+        self.assertEqual(client.get('/api/pdv/cache/').status_code, 403)
+        self.vendedor.is_staff = True
+        self.vendedor.save()
+        response = client.get('/api/pdv/cache/')
+        self.assertEqual((response.data['faltas'], response.data['acertos_local']), (1, 1))
+
+
+class IngestaoLoteTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, self.sessao, self.cliente = criar_empresa()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        self.produto = Produto.objects.create(empresa=self.empresa, nome='Café', preco=Decimal('10.00'), estoque=5)
+
+    def _venda(self, quantidade=1, **extra):
+        return {
+            'uuid': str(uuid.uuid4()),
+            'sessao_caixa_uuid': str(self.sessao.uuid),
+            'cliente_uuid': str(self.cliente.uuid),
+            'itens': [{'produto_uuid': str(self.produto.uuid), 'quantidade': quantidade}],
+            **extra,
+        }
+
+    def _enviar(self, vendas):
+        response = self.client.post('/api/pdv/vendas/lote/', {'vendas': vendas}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    @override_settings(PDV_INGESTAO_TOLERANCIA_PRECO='0.10')
+    def test_reenvio_nao_duplica(self):
+        vendas = [self._venda(data_venda='2026-01-02T10:00:00Z'), self._venda(2, itens=[
+            {'produto_uuid': str(self.produto.uuid), 'quantidade': 2, 'preco_unitario': '9.50'},
+        ])]
+        self.assertEqual(self._enviar(vendas)['criadas'], 2)
+        resposta = self._enviar(vendas)
+        self.assertEqual((resposta['criadas'], resposta['ja_registradas']), (0, 2))
+
+        self.assertEqual(Venda.objects.filter(empresa=self.empresa).count(), 2)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 2)
+        venda = Venda.objects.get(uuid=vendas[0]['uuid'])
+        self.assertEqual((venda.data_venda.year, venda.vendedor, venda.total), (2026, self.vendedor, Decimal('10.00')))
+        self.assertEqual(Venda.objects.get(uuid=vendas[1]['uuid']).total, Decimal('19.00'))
+
+    def test_resultado_por_venda(self):
+        outra, *_ = criar_empresa('2')
+        produto_alheio = Produto.objects.create(empresa=outra, nome='Alheio', preco=Decimal('1.00'), estoque=10)
+        vendas = [
+            self._venda(4),
+            self._venda(4),  # sem saldo depois da primeira
+            self._venda(itens=[{'produto_uuid': str(produto_alheio.uuid), 'quantidade': 1}]),
+            {'uuid': 'invalido'},
+        ]
+        resposta = self._enviar(vendas)
+        self.assertEqual([r['status'] for r in resposta['resultados']], ['criada', 'rejeitada', 'rejeitada', 'rejeitada'])
+        self.assertIn('estoque', resposta['resultados'][1]['erros'])
+        self.assertIn('itens', resposta['resultados'][2]['erros'])
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque, 1)
+
+    def test_sessao_fechada_de_outro_vendedor_e_preco_fora_da_tolerancia(self):
+        SessaoCaixa.objects.filter(pk=self.sessao.pk).update(data_fechamento=timezone.now())
+        outro = Usuario.objects.create_user(username='outro', password='senha', empresa=self.empresa)
+        sessao_alheia = SessaoCaixa.objects.create(caixa=self.caixa, vendedor=outro)
+        vendas = [
+            self._venda(),
+            self._venda(data_venda='2026-01-02T10:00:00Z', itens=[
+                {'produto_uuid': str(self.produto.uuid), 'quantidade': 1, 'preco_unitario': '0.00'},
+            ]),
+            self._venda(data_venda=(timezone.now() + datetime.timedelta(days=1)).isoformat()),
+            self._venda(sessao_caixa_uuid=str(sessao_alheia.uuid)),
+        ]
+        resultados = self._enviar(vendas)['resultados']
+        self.assertEqual([r['status'] for r in resultados], ['rejeitada', 'criada', 'rejeitada', 'rejeitada'])
+        self.assertIn('sessao_caixa_uuid', resultados[0]['erros'])
+        self.assertIn('data_venda', resultados[2]['erros'])
+        self.assertIn('sessao_caixa_uuid', resultados[3]['erros'])
+        self.assertEqual(resultados[1]['precos_divergentes'][0]['preco_cobrado'], '10.00')
+        self.assertEqual(Venda.objects.get(uuid=vendas[1]['uuid']).total, Decimal('10.00'))
+
+    def test_consultas_nao_crescem_com_o_lote(self):
+        self.produto.estoque = 10**6
+        self.produto.save()
+        with CaptureQueriesContext(connection) as poucas:
+            self._enviar([self._venda() for _ in range(2)])
+        with CaptureQueriesContext(connection) as muitas:
+            self._enviar([self._venda() for _ in range(100)])
+        self.assertEqual(len(poucas), len(muitas))
+
+
+class FechamentoSessaoTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, self.sessao, self.cliente = criar_empresa()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        self.produto = Produto.objects.create(empresa=self.empresa, nome='Café', preco=Decimal('10.00'), estoque=100)
+
+    def _vender(self, quantidade, forma='DIN', **extra):
+        return self.client.post('/api/pdv/vendas/', {
+            'cliente_uuid': str(self.cliente.uuid),
+            'sessao_caixa_uuid': str(self.sessao.uuid),
+            'forma_pagamento': forma,
+            'itens': [{'produto_uuid': str(self.produto.uuid), 'quantidade': quantidade}],
+            **extra,
+        }, format='json')
+
+    def test_vendedor_diferente_do_usuario_e_recusado(self):
+        _, outro_vendedor, *_ = criar_empresa('2')
+        response = self._vender(1, vendedor_uuid=str(outro_vendedor.uuid))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('vendedor_uuid', response.data)
+        self.assertEqual(self._vender(1, vendedor_uuid=str(self.vendedor.uuid)).status_code, 201)
+
+    def test_totais_e_relatorio_z(self):
+        self.assertEqual(self._vender(2).status_code, 201)
+        self.assertEqual(self._vender(1, 'PIX').status_code, 201)
+        self.client.post('/api/pdv/vendas/lote/', {'vendas': [{
+            'uuid': str(uuid.uuid4()), 'sessao_caixa_uuid': str(self.sessao.uuid), 'cliente_uuid': str(self.cliente.uuid),
+            'forma_pagamento': 'PIX', 'itens': [{'produto_uuid': str(self.produto.uuid), 'quantidade': 3}],
+        }]}, format='json')
+        item = ItemVenda.objects.filter(venda__forma_pagamento='DIN').get()
+        self.assertEqual(self._vender(1, devolucoes=[{'item_venda_uuid': str(item.uuid), 'quantidade': 1}]).status_code, 201)
+
+        self.sessao.saldo_inicial = Decimal('50.00')
+        self.sessao.save()
+        with self.assertNumQueries(2):
+            relatorio = fechamento.relatorio_z(SessaoCaixa.objects.select_related('caixa', 'vendedor').get(pk=self.sessao.pk))
+        self.assertEqual(relatorio['quantidade_vendas'], 4)
+        self.assertEqual(relatorio['total_vendas'], Decimal('70.00'))
+        self.assertEqual(relatorio['total_devolvido'], Decimal('10.00'))
+        self.assertEqual(
+            [(f['forma_pagamento'], f['quantidade'], f['total']) for f in relatorio['por_forma_pagamento']],
+            [('DIN', 2, Decimal('30.00')), ('PIX', 2, Decimal('40.00'))],
+        )
+        self.assertEqual(relatorio['saldo_esperado'], Decimal('80.00'))
+
+        response = self.client.get(f'/api/pdv/sessoes-caixa/{self.sessao.pk}/relatorio-z/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_exclusao_e_alteracao_da_venda(self):
+        venda = Venda.objects.get(uuid=self._vender(2).data['uuid'])
+        self.client.patch(f'/api/pdv/vendas/{venda.pk}/', {'forma_pagamento': 'DEB'}, format='json')
+        self.sessao.refresh_from_db()
+        self.assertEqual(
+            list(self.sessao.resumo_pagamentos.filter(quantidade__gt=0).values_list('forma_pagamento', 'total')),
+            [('DEB', Decimal('20.00'))],
+        )
+        self.client.delete(f'/api/pdv/vendas/{venda.pk}/')
+        self.sessao.refresh_from_db()
+        self.assertEqual((self.sessao.quantidade_vendas, self.sessao.total_vendas), (0, Decimal('0.00')))
+
+    def test_venda_em_sessao_ja_fechada(self):
+        self._vender(1)
+        # Fechada por fora (sem avisos): o cache ainda vê a sessão aberta, a gravação dos totais não
+        SessaoCaixa.objects.filter(pk=self.sessao.pk).sem_avisos().update(data_fechamento=timezone.now())
+        self.assertEqual(self._vender(1).status_code, 409)
+        self.assertEqual(Venda.objects.filter(sessao_caixa=self.sessao).count(), 1)
+
+    def test_venda_de_sessao_fechada_nao_muda(self):
+        venda = Venda.objects.get(uuid=self._vender(2).data['uuid'])
+        SessaoCaixa.objects.filter(pk=self.sessao.pk).update(data_fechamento=timezone.now())
+        response = self.client.patch(f'/api/pdv/vendas/{venda.pk}/', {'forma_pagamento': 'DEB'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.delete(f'/api/pdv/vendas/{venda.pk}/').status_code, 409)
+        venda.refresh_from_db()
+        self.sessao.refresh_from_db()
+        self.assertEqual((venda.forma_pagamento, venda.deletado_em), ('DIN', None))
+        self.assertEqual((self.sessao.quantidade_vendas, self.sessao.total_vendas), (1, Decimal('20.00')))
+
+    def test_reconciliacao(self):
+        self._vender(2)
+        SessaoCaixa.objects.filter(pk=self.sessao.pk).update(total_vendas=Decimal('999.00'))
+        saida = StringIO()
+        call_command('reconciliar_sessoes', stdout=saida)
+        self.assertIn('total_vendas: 999.00 -> 20.00', saida.getvalue())
+        call_command('reconciliar_sessoes', '--corrigir', stdout=StringIO())
+        self.sessao.refresh_from_db()
+        self.assertEqual(self.sessao.total_vendas, Decimal('20.00'))
+        saida = StringIO()
+        call_command('reconciliar_sessoes', stdout=saida)
+        self.assertIn('0 divergente(s)', saida.getvalue())
+
+
+class RelatoriosTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, self.sessao, self.cliente = criar_empresa()
+        self.vendedor.is_staff = True
+        self.vendedor.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        self.cafe = Produto.objects.create(empresa=self.empresa, nome='Café', preco=Decimal('10.00'), estoque=100)
+        self.leite = Produto.objects.create(empresa=self.empresa, nome='Leite', preco=Decimal('4.00'), estoque=100)
+        self.dia = timezone.localdate() - datetime.timedelta(days=1)
+        self.vendas = [
+            self._venda(datetime.time(9, 15), [(self.cafe, 2)]),
+            self._venda(datetime.time(9, 40), [(self.cafe, 1), (self.leite, 3)]),
+            self._venda(datetime.time(17, 5), [(self.leite, 1)]),
+        ]
+
+    def _venda(self, hora, itens):
+        venda = Venda.objects.create(
+            empresa=self.empresa, cliente=self.cliente, sessao_caixa=self.sessao, vendedor=self.vendedor,
+            data_venda=timezone.make_aware(datetime.datetime.combine(self.dia, hora)),
+            total=sum(produto.preco * quantidade for produto, quantidade in itens),
+        )
+        for produto, quantidade in itens:
+            ItemVenda.objects.create(venda=venda, produto=produto, quantidade=quantidade, preco_unitario=produto.preco)
+        return venda
+
+    def _get(self, relatorio, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/pdv/relatorios/{relatorio}/', params)
+        self.assertEqual(response.status_code, 200)
+        # Só as tabelas de resumo (e cadastros) são lidas, nunca as de vendas
+        self.assertFalse([q['sql'] for q in ctx.captured_queries if 'vendas_venda' in q['sql'] or 'vendas_itemvenda' in q['sql']])
+        return response.data['resultados']
+
+    def test_resumos_e_api(self):
+        self.assertEqual(relatorios.atualizar_pendentes(self.empresa.pk), 1)
+        self.assertEqual(
+            [(l['dia'], l['quantidade_vendas'], l['itens_vendidos'], l['total']) for l in self._get('vendas-por-dia')],
+            [(self.dia, 3, 7, Decimal('46.00'))],
+        )
+        self.assertEqual(
+            [(l['hora'], l['quantidade_vendas']) for l in self._get('vendas-por-hora', inicio=self.dia, fim=self.dia)],
+            [(9, 2), (17, 1)],
+        )
+        self.assertEqual(
+            [(l['produto_nome'], l['quantidade'], l['total']) for l in self._get('produtos-mais-vendidos', ordenar='total')],
+            [('Café', 3, Decimal('30.00')), ('Leite', 4, Decimal('16.00'))],
+        )
+        self.assertEqual(self._get('vendas-por-caixa')[0]['caixa_nome'], self.caixa.nome)
+        self.assertEqual(self._get('vendas-por-vendedor')[0]['vendedor_username'], self.vendedor.username)
+
+    def test_atualizacao_incremental(self):
+        relatorios.atualizar_pendentes(self.empresa.pk)
+        self.vendas[0].delete()
+        relatorios.atualizar_pendentes(self.empresa.pk)
+        self.assertEqual(self._get('vendas-por-dia')[0]['total'], Decimal('26.00'))
+
+    def test_backfill(self):
+        saida = StringIO()
+        call_command('backfill_relatorios', '--dias-por-lote', '1', stdout=saida)
+        self.assertEqual(self._get('vendas-por-dia')[0]['quantidade_vendas'], 3)
+        self.assertIsNotNone(relatorios.processado_ate(self.empresa.pk))
+
+
+class ExportacaoTests(TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        configuracao = override_settings(PDV_EXPORTACAO_DIR=self.diretorio.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.empresa, self.vendedor, _, self.sessao, self.cliente = criar_empresa()
+        self.produto = Produto.objects.create(empresa=self.empresa, nome='Café', preco=Decimal('10.00'), codigo_barras='7890000000017')
+        hoje = timezone.localdate()
+        self.vendas = [self._venda(hoje - datetime.timedelta(days=dias), quantidade) for dias, quantidade in [(10, 1), (2, 2), (1, 3)]]
+        outra = criar_empresa('2')
+        Venda.objects.create(empresa=outra[0], cliente=outra[4], sessao_caixa=outra[3], total=Decimal('1.00'))
+
+    def _venda(self, dia, quantidade):
+        venda = Venda.objects.create(
+            empresa=self.empresa, cliente=self.cliente, sessao_caixa=self.sessao, vendedor=self.vendedor,
+            data_venda=timezone.make_aware(datetime.datetime.combine(dia, datetime.time(12))),
+            total=self.produto.preco * quantidade,
+        )
+        ItemVenda.objects.create(venda=venda, produto=self.produto, quantidade=quantidade, preco_unitario=self.produto.preco)
+        return venda
+
+    def _ler(self, conteudo):
+        return list(csv.DictReader(io.StringIO(gzip.decompress(conteudo).decode())))
+
+    def test_exportar_csv_em_blocos(self):
+        destino = f'{self.diretorio.name}/itens.csv.gz'
+        progresso = []
+        linhas = exportacao.exportar(
+            self.empresa.pk, destino, inicio=timezone.localdate() - datetime.timedelta(days=5), lote=1, progresso=progresso.append,
+        )
+        self.assertEqual(linhas, 2)
+        self.assertEqual(progresso, [1, 2])
+        with open(destino, 'rb') as arquivo:
+            itens = self._ler(arquivo.read())
+        self.assertEqual([i['venda'] for i in itens], [str(v.uuid) for v in self.vendas[1:]])
+        self.assertEqual((itens[1]['codigo_barras'], itens[1]['quantidade'], itens[1]['subtotal']), ('7890000000017', '3', '30.00'))
+
+        saida = StringIO()
+        call_command('exportar_vendas', f'{self.diretorio.name}/vendas.csv.gz', '--empresa', str(self.empresa.uuid),
+                     '--tipo', 'vendas', stdout=saida)
+        self.assertIn('3 linha(s)', saida.getvalue())
+
+    def test_exportacao_pela_api(self):
+        self.vendedor.is_staff = True
+        self.vendedor.save()
+        client = APIClient()
+        client.force_authenticate(self.vendedor)
+        with mock.patch('vendas.views.agendar') as agendar, self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/pdv/exportacoes/', {'tipo': 'vendas'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pendente')
+        agendar.assert_called_once()
+        url = f"/api/pdv/exportacoes/{response.data['uuid']}/"
+        self.assertEqual(client.get(url + 'arquivo/').status_code, 409)
+
+        exportacao.executar_exportacao(*agendar.call_args.args[1:])
+        dados = client.get(url).json()
+        self.assertEqual((dados['status'], dados['linhas']), ('concluida', 3))
+        arquivo = client.get(url + 'arquivo/')
+        self.assertEqual(len(self._ler(b''.join(arquivo.streaming_content))), 3)
+        self.assertEqual(client.get('/api/pdv/exportacoes/').json()['results'][0]['uuid'], dados['uuid'])
+
+
+class DocumentoFaturaTests(TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        configuracao = override_settings(PDV_DOCUMENTOS_DIR=self.diretorio.name, PDV_DOCUMENTOS_PROCESSOS=0)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        # Na própria thread do teste, para enxergar os dados da transação
+        agendar = mock.patch('vendas.documentos.agendar', side_effect=lambda func, *args: func(*args))
+        agendar.start()
+        self.addCleanup(agendar.stop)
+
+        self.empresa, self.vendedor, _, self.sessao, self.cliente = criar_empresa()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        produto = Produto.objects.create(empresa=self.empresa, nome='Café', preco=Decimal('10.00'))
+        self.venda = Venda.objects.create(
+            empresa=self.empresa, cliente=self.cliente, sessao_caixa=self.sessao, vendedor=self.vendedor, total=Decimal('20.00'),
+        )
+        ItemVenda.objects.create(venda=self.venda, produto=produto, quantidade=2, preco_unitario=produto.preco)
+        self.url = f'/api/pdv/vendas/{self.venda.pk}/fatura/pdf/'
+
+    def _faturar(self):
+        hoje = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            return Fatura.objects.create(
+                venda=self.venda, data_emissao=hoje, data_vencimento=hoje + datetime.timedelta(days=30), valor_total=Decimal('20.00'),
+            )
+
+    def test_pdf_gerado_depois_do_commit(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        fatura = self._faturar()
+        situacao = self.client.get(self.url).json()
+        self.assertEqual((situacao['status'], situacao['assinado'], situacao['desatualizado']), ('gerado', False, False))
+
+        arquivo = self.client.get(self.url + 'arquivo/')
+        self.assertEqual(arquivo['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(arquivo.streaming_content).startswith(b'%PDF'))
+
+        # Nova versão da fatura: o PDF é refeito e o arquivo anterior removido
+        anterior = fatura.documento.arquivo
+        fatura.paga = True
+        with self.captureOnCommitCallbacks(execute=True):
+            fatura.save()
+        fatura.documento.refresh_from_db()
+        self.assertNotEqual(fatura.documento.arquivo, anterior)
+        self.assertFalse(os.path.exists(anterior))
+
+    def test_pdf_assinado(self):
+        certificado = certificado_autoassinado(os.path.join(self.diretorio.name, 'teste.pfx'), 'senha')
+        with mock.patch.multiple('vendas.pdf', _template=None, _assinador=None), \
+                override_settings(PDV_DOCUMENTOS_CERTIFICADO=certificado, PDV_DOCUMENTOS_CERTIFICADO_SENHA='senha'):
+            fatura = self._faturar()
+        fatura.documento.refresh_from_db()
+        self.assertTrue(fatura.documento.assinado)
+        with open(fatura.documento.arquivo, 'rb') as arquivo:
+            self.assertEqual(len(PdfFileReader(arquivo).embedded_signatures), 1)
+
+
+class AuditoriaTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, _, _, _ = criar_empresa()
+        self.outro = Usuario.objects.create_user(username='outro', password='senha', empresa=self.empresa)
+
+    def test_usuario_da_requisicao_autenticada_pelo_drf(self):
+        client = APIClient()
+        client.force_authenticate(self.vendedor)
+        response = client.post('/api/pdv/clientes/', {'empresa': self.empresa.pk, 'nome': 'Novo', 'cpf': '123'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        cliente = Cliente.objects.get(uuid=response.data['uuid'])
+        self.assertEqual((cliente.criado_por, cliente.atualizado_por), (self.vendedor, self.vendedor))
+        # Nada fica para a próxima requisição (nem para o resto da thread)
+        self.assertIsNone(get_current_user())
+
+    def test_contextos_isolados_entre_corrotinas(self):
+        async def registrar(usuario, espera):
+            with usuario_atual(usuario):
+                await asyncio.sleep(espera)
+                return get_current_user()
+
+        async def concorrentes():
+            return await asyncio.gather(registrar(self.vendedor, 0.02), registrar(self.outro, 0.01))
+
+        self.assertEqual(asyncio.run(concorrentes()), [self.vendedor, self.outro])
+        self.assertIsNone(get_current_user())
+
+    def test_middleware_async(self):
+        vistos = []
+
+        async def view(request):
+            vistos.append(get_current_user())
+            return HttpResponse()
+
+        middleware = CurrentUserMiddleware(view)
+        request = RequestFactory().get('/')
+        request.user = self.vendedor
+        asyncio.run(middleware(request))
+        self.assertEqual(vistos, [self.vendedor])
+        self.assertIsNone(get_current_user())
+
+    def test_tarefa_herda_o_usuario(self):
+        with usuario_atual(self.outro):
+            futuro = agendar(get_current_user)
+        self.assertEqual(futuro.result(timeout=5), self.outro)
+
+
+class EsquemasEmpresaTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, self.sessao, self.cliente = criar_empresa('1')
+        self.outra, self.outro_vendedor, _, _, _ = criar_empresa('2')
+        self.vendedor.caixa_atual = self.caixa
+        self.vendedor.save()
+        self.produto = Produto.objects.create(empresa=self.empresa, nome='Arroz', preco=Decimal('10.00'), estoque=5)
+        Produto.objects.create(empresa=self.outra, nome='Feijão', preco=Decimal('7.00'))
+
+    def _listar(self, usuario, url):
+        client = APIClient()
+        client.force_authenticate(usuario)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [linha['nome'] for linha in response.json()['results']]
+
+    def test_search_path_segue_a_empresa_do_usuario(self):
+        def search_path():
+            with connection.cursor() as cursor:
+                cursor.execute('SHOW search_path')
+                return cursor.fetchone()[0]
+
+        self.assertEqual(search_path(), 'public')
+        with usuario_atual(self.vendedor):
+            self.assertEqual(search_path(), 'empresa_1, public')
+            with esquemas.da_empresa(self.outra):
+                self.assertEqual(search_path(), 'empresa_2, public')
+        self.assertEqual(search_path(), 'public')
+
+    def test_mover_empresa_para_o_proprio_esquema(self):
+        saida = StringIO()
+        call_command('mover_empresa', str(self.empresa.uuid), stdout=saida)
+        self.assertIn('vendas_produto: 1 linha(s)', saida.getvalue())
+        self.assertEqual(esquemas_existentes(), ['empresa_1'])
+
+        # Em public só ficaram as linhas da outra empresa
+        with esquemas.usar_esquema(''):
+            self.assertFalse(Produto.todos.filter(empresa=self.empresa).exists())
+            self.assertFalse(SessaoCaixa.objects.filter(caixa__empresa=self.empresa).exists())
+            self.assertTrue(Produto.objects.filter(empresa=self.outra).exists())
+
+        # As requisições de cada empresa vão para o seu esquema, com os mesmos ids
+        self.assertEqual(self._listar(self.vendedor, '/api/pdv/produtos/'), ['Arroz'])
+        self.assertEqual(self._listar(self.outro_vendedor, '/api/pdv/produtos/'), ['Feijão'])
+        client = APIClient()
+        client.force_authenticate(self.vendedor)
+        response = client.post('/api/pdv/produtos/', {'empresa': self.empresa.pk, 'nome': 'Café', 'preco': '15.00'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        with esquemas.da_empresa(self.empresa):
+            self.assertEqual(Produto.objects.get(pk=self.produto.pk).nome, 'Arroz')
+            self.assertGreater(Produto.objects.get(nome='Café').pk, self.produto.pk)
+            self.vendedor.refresh_from_db()
+            self.assertEqual(self.vendedor.caixa_atual, self.caixa)
+
+        # O esquema novo já tem todas as migrações; uma segunda mudança é recusada
+        self.assertEqual(migrar_esquemas(['empresa_1'], paralelo=1), {'empresa_1': ([], None)})
+        with self.assertRaises(CommandError):
+            call_command('mover_empresa', str(self.empresa.uuid), stdout=StringIO())
+
+    def test_roteador_so_migra_tabelas_da_empresa_no_esquema(self):
+        roteador = esquemas.RoteadorEsquemas()
+        self.assertIsNone(roteador.allow_migrate('default', 'vendas', model_name='usuario'))
+        with esquemas.usar_esquema('empresa_1'):
+            self.assertTrue(roteador.allow_migrate('default', 'vendas', model_name='produto'))
+            self.assertFalse(roteador.allow_migrate('default', 'vendas', model_name='usuario'))
+            self.assertFalse(roteador.allow_migrate('default', 'auth', model_name='group'))
+            self.assertFalse(roteador.allow_migrate('default', 'vendas'))
+            self.assertTrue(roteador.allow_migrate('default', 'vendas', esquema_da_empresa=True))
+
+
+@override_settings(PDV_BANCOS_LEITURA=['replica_1', 'replica_2'])
+class RoteadorLeituraTests(SimpleTestCase):
+    def test_so_as_leituras_marcadas_vao_para_replica(self):
+        self.assertEqual(Produto.objects.all().db, 'default')
+        with requisicao(leitura=False):
+            self.assertEqual(Produto.objects.all().db, 'default')
+        with requisicao(leitura=True):
+            replica = Produto.objects.all().db
+            self.assertIn(replica, ['replica_1', 'replica_2'])
+            # Uma réplica por requisição; gravações e select_for_update sempre no primário
+            self.assertEqual(Cliente.objects.all().db, replica)
+            self.assertEqual(Produto.objects.select_for_update().db, 'default')
+            self.assertEqual(Produto.objects.all().db, 'default')
+
+    def test_quem_grava_fica_no_primario(self):
+        vendedor, outro = Usuario(pk=10_001), Usuario(pk=10_002)
+        with usuario_atual(vendedor), requisicao(leitura=False):
+            RoteadorLeitura().db_for_write(Venda)
+        with usuario_atual(vendedor), requisicao(leitura=True):
+            self.assertEqual(Produto.objects.all().db, 'default')
+        with usuario_atual(outro), requisicao(leitura=True):
+            self.assertNotEqual(Produto.objects.all().db, 'default')
+
+    def test_instancias_da_replica_se_relacionam_com_as_do_primario(self):
+        cliente, venda = Cliente(), Venda()
+        cliente._state.db, venda._state.db = 'replica_1', 'default'
+        venda.cliente = cliente
+        self.assertIs(venda.cliente, cliente)
+
+
+@override_settings(PDV_BANCOS_LEITURA=['default'])
+class LeituraEmReplicaTests(TestCase):
+    # A "réplica" é o próprio banco de teste; o que se confere é a decisão de cada requisição
+    def setUp(self):
+        self.empresa, self.vendedor, _, self.sessao, self.cliente = criar_empresa()
+        self.produto = Produto.objects.create(empresa=self.empresa, nome='Café', preco=Decimal('10.00'), estoque=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        fora_da_transacao = mock.patch('vendas.roteamento._em_transacao', return_value=False)
+        fora_da_transacao.start()
+        self.addCleanup(fora_da_transacao.stop)
+
+    def _replica_escolhida(self, metodo, url, dados=None):
+        with mock.patch('vendas.roteamento.random.choice', side_effect=lambda bancos: bancos[0]) as escolha:
+            response = getattr(self.client, metodo)(url, dados, format='json')
+        self.assertLess(response.status_code, 300)
+        return escolha.called
+
+    def test_leitura_depois_de_uma_venda_vai_para_o_primario(self):
+        self.assertTrue(self._replica_escolhida('get', '/api/pdv/produtos/'))
+        self.assertTrue(self._replica_escolhida('get', f'/api/pdv/empresas/{self.empresa.pk}/dados-atualizados/', {'cursor': codificar_cursor(0)}))
+        self.assertFalse(self._replica_escolhida('post', '/api/pdv/vendas/', {
+            'cliente_uuid': str(self.cliente.uuid),
+            'sessao_caixa_uuid': str(self.sessao.uuid),
+            'forma_pagamento': 'DIN',
+            'itens': [{'produto_uuid': str(self.produto.uuid), 'quantidade': 1}],
+        }))
+        self.assertFalse(self._replica_escolhida('get', '/api/pdv/vendas/'))
+
+
+class ExclusaoLogicaLoteTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, _, _, _ = criar_empresa()
+        with usuario_atual(self.vendedor):
+            self.produtos = Produto.objects.bulk_create(
+                Produto(empresa=self.empresa, nome=f'P{i}', preco=Decimal('1.00')) for i in range(5)
+            )
+
+    def test_bulk_create_preenche_auditoria_e_versao(self):
+        produto = Produto.objects.get(pk=self.produtos[0].pk)
+        self.assertEqual((produto.criado_por, produto.atualizado_por), (self.vendedor, self.vendedor))
+        versoes = Produto.objects.filter(empresa=self.empresa).values_list('versao', flat=True)
+        self.assertEqual(len(set(versoes)), 5)
+        self.assertNotIn(0, versoes)
+
+    def test_bulk_update_preenche_auditoria_e_versao(self):
+        antes = dict(Produto.objects.values_list('pk', 'versao'))
+        outro = Usuario.objects.create_user(username='outro', password='senha', empresa=self.empresa)
+        for produto in self.produtos:
+            produto.preco = Decimal('2.00')
+        with usuario_atual(outro):
+            Produto.objects.bulk_update(self.produtos, ['preco'])
+        for produto in Produto.objects.filter(empresa=self.empresa):
+            self.assertEqual((produto.preco, produto.atualizado_por), (Decimal('2.00'), outro))
+            self.assertGreater(produto.versao, antes[produto.pk])
+
+    def test_exclusao_em_lote_e_um_unico_update(self):
+        with CaptureQueriesContext(connection) as consultas:
+            linhas, _ = Produto.objects.filter(pk__in=[p.pk for p in self.produtos[:3]]).delete()
+        self.assertEqual(linhas, 3)
+        self.assertEqual(len([c for c in consultas if c['sql'].startswith('UPDATE')]), 1)
+
+        self.assertEqual(Produto.objects.filter(empresa=self.empresa).count(), 2)
+        self.assertEqual(Produto.todos.filter(empresa=self.empresa).count(), 5)
+        # Excluir de novo não mexe nas linhas já excluídas
+        self.assertEqual(Produto.todos.filter(empresa=self.empresa).delete()[0], 2)
+
+    @override_settings(PDV_NOTIFICACOES='local')
+    def test_alteracao_em_lote_invalida_cache_e_avisa(self):
+        cache.limpar()
+        self.addCleanup(cache.limpar)
+        uuids = [str(p.uuid) for p in self.produtos]
+        cache.produtos_por_uuid(self.empresa.pk, uuids)
+        versao = cache.versoes(self.empresa.pk, [Produto])[Produto][0]
+        assinatura = notificacoes.assinar(self.empresa.pk)
+        self.addCleanup(notificacoes.cancelar, assinatura)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Produto.objects.filter(empresa=self.empresa).update(preco=Decimal('3.00'))
+        precos = {p.preco for p in cache.produtos_por_uuid(self.empresa.pk, uuids).values()}
+        self.assertEqual(precos, {Decimal('3.00')})
+        self.assertNotEqual(cache.versoes(self.empresa.pk, [Produto])[Produto][0], versao)
+        eventos, _ = assinatura.esperar(0)
+        self.assertEqual((eventos[0]['recurso'], sorted(eventos[0]['uuids'])), ('produtos', sorted(uuids)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Produto.objects.filter(pk=self.produtos[0].pk).delete()
+        eventos, _ = assinatura.esperar(0)
+        self.assertEqual(eventos, [{'recurso': 'produtos', 'uuids': [uuids[0]], 'removido': True}])
+
+    def test_exclusao_em_lote_aparece_no_feed(self):
+        client = APIClient()
+        client.force_authenticate(self.vendedor)
+        url = f'/api/pdv/empresas/{self.empresa.pk}/dados-atualizados/'
+        cursor = client.get(url, {'cursor': codificar_cursor(0), 'limite': 100}).json()['cursor']
+        Produto.objects.filter(pk__in=[p.pk for p in self.produtos[:2]]).delete()
+        data = client.get(url, {'cursor': cursor, 'limite': 100}).json()
+        self.assertCountEqual(data['produtos_removidos'], [str(p.uuid) for p in self.produtos[:2]])
+
+
+class PlanosConsultaTests(TestCase):
+    # As tabelas de teste são pequenas demais para o planejador preferir um índice por conta
+    # própria; com enable_seqscan desligado ele só faz Seq Scan quando não há índice que sirva
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, self.sessao, self.cliente = criar_empresa()
+        self.produto = Produto.objects.create(empresa=self.empresa, nome='Café', preco=Decimal('10.00'))
+
+    def consultas_quentes(self):
+        agora = timezone.now()
+        return {
+            # SessaoCaixaViewSet.abrir_sessao / VendaViewSet.vendas_abertas_sessao
+            'sessao_caixa_aberta_unica': SessaoCaixa.objects.filter(
+                caixa=self.caixa, vendedor=self.vendedor, data_fechamento__isnull=True,
+            ),
+            'venda_sessao_data_idx': Venda.objects.filter(sessao_caixa=self.sessao).order_by('-data_venda'),
+            # Listagem paginada de vendas (KeysetPagination)
+            'venda_empresa_data_idx': Venda.objects.filter(empresa=self.empresa).order_by('-data_venda', '-id')[:50],
+            # relatorios.atualizar_pendentes
+            'venda_empresa_atualiz_idx': Venda.todos.filter(empresa=self.empresa, atualizado_em__gt=agora),
+            # sync.montar_feed
+            'produto_empresa_versao_idx': Produto._base_manager.filter(empresa=self.empresa, versao__gt=0).order_by('versao')[:101],
+            'cliente_empresa_versao_idx': Cliente._base_manager.filter(empresa=self.empresa, versao__gt=0).order_by('versao')[:101],
+            # estoque.reservar
+            'reserva_produto_expira_idx': ReservaEstoque.objects.filter(produto=self.produto, expira_em__gt=agora),
+        }
+
+    def test_consultas_quentes_usam_indice(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for indice, consulta in self.consultas_quentes().items():
+            with self.subTest(indice):
+                plano = consulta.explain()
+                self.assertNotIn('Seq Scan', plano)
+                self.assertIn(indice, plano)
+
+    def test_uma_sessao_aberta_por_caixa(self):
+        client = APIClient()
+        client.force_authenticate(self.vendedor)
+        response = client.post('/api/pdv/sessoes-caixa/abrir/', {'caixa_uuid': str(self.caixa.uuid)}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.sessao.fechar_sessao()
+        response = client.post('/api/pdv/sessoes-caixa/abrir/', {'caixa_uuid': str(self.caixa.uuid)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SessaoCaixa.objects.create(caixa=self.caixa, vendedor=self.vendedor)
+
+
+class BenchmarkCheckoutTests(TestCase):
+    def test_resultado_em_json_e_comparacao(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            saida = os.path.join(diretorio, 'checkout.json')
+            argumentos = ['--produtos', '10', '--clientes', '3', '--caixas', '2', '--historico', '5',
+                          '--cestas', '1', '3', '--repeticoes', '2']
+            call_command('benchmark_checkout', *argumentos, '--saida', saida, stdout=StringIO())
+            with open(saida) as arquivo:
+                resultado = json.load(arquivo)
+            self.assertEqual(
+                list(resultado['cenarios']),
+                ['abrir_sessao', 'venda_1_itens', 'venda_3_itens', 'listar_vendas', 'vendas_abertas_sessao',
+                 'sync_completo', 'sync_incremental'],
+            )
+            self.assertGreater(resultado['cenarios']['listar_vendas']['linhas_por_segundo'], 0)
+            self.assertGreater(resultado['cenarios']['sync_incremental']['linhas_por_segundo'], 0)
+
+            # Uma execução anterior com menos queries acusa regressão
+            resultado['cenarios']['listar_vendas']['queries_por_requisicao'] = 0
+            with open(saida, 'w') as arquivo:
+                json.dump(resultado, arquivo)
+            with self.assertRaisesMessage(CommandError, 'regressão'):
+                call_command('benchmark_checkout', *argumentos, '--comparar', saida, '--tolerancia', '1000',
+                             stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(Empresa.objects.exists())
+
+
+class BenchmarkVendasTests(TestCase):
+    def test_caminho_por_item_como_referencia(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            saida = os.path.join(diretorio, 'vendas.json')
+            call_command('benchmark_vendas', '--tamanhos', '1', '10', '--repeticoes', '2', '--por-item',
+                         '--saida', saida, stdout=StringIO())
+            with open(saida) as arquivo:
+                cenarios = json.load(arquivo)['cenarios']
+        self.assertEqual(sorted(cenarios), ['lote_10_itens', 'lote_1_itens', 'por_item_10_itens', 'por_item_1_itens'])
+        # Em lote as queries não crescem com a cesta; item a item, sim
+        self.assertEqual(cenarios['lote_10_itens']['queries_por_venda'], cenarios['lote_1_itens']['queries_por_venda'])
+        self.assertGreater(cenarios['por_item_10_itens']['queries_por_venda'], cenarios['lote_10_itens']['queries_por_venda'])
+
+
+class BenchmarkBuscaProdutosTests(TestCase):
+    def test_executa_com_catalogo_pequeno(self):
+        saida = StringIO()
+        call_command('benchmark_busca_produtos', '--produtos', '20', '--repeticoes', '2', stdout=saida)
+        self.assertIn('codigo (leitor)', saida.getvalue())
+        self.assertFalse(Empresa.objects.exists())
+
+
+class JSONRapidoTests(SimpleTestCase):
+    DADOS = {
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'total': Decimal('10.50'),
+        'data_venda': datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+        'data': datetime.date(2024, 5, 1),
+        'nome': 'Pão de queijo \u2028 ç',
+        'grande': 2 ** 70,
+        'itens': [{'quantidade': 2, 'preco': 1.5}, None, True],
+    }
+
+    def test_mesmos_bytes_que_o_drf(self):
+        self.assertEqual(JSONRapidoRenderer().render(self.DADOS), JSONRenderer().render(self.DADOS))
+        self.assertEqual(JSONRapidoRenderer().render(None), b'')
+
+    def test_parser(self):
+        corpo = JSONRenderer().render(self.DADOS)
+        self.assertEqual(JSONRapidoParser().parse(io.BytesIO(corpo)), JSONParser().parse(io.BytesIO(corpo)))
+        with self.assertRaises(ParseError):
+            JSONRapidoParser().parse(io.BytesIO(b'{"total": NaN}'))
+
+    def test_sem_orjson(self):
+        with mock.patch('vendas.renderers.orjson', None), mock.patch('vendas.parsers.orjson', None):
+            self.assertEqual(JSONRapidoRenderer().render(self.DADOS), JSONRenderer().render(self.DADOS))
+            self.assertEqual(JSONRapidoParser().parse(io.BytesIO(b'{"a": 1}')), {'a': 1})
+
+
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.empresa, self.vendedor, self.caixa, self.sessao, self.cliente = criar_empresa()
+        self.produto = Produto.objects.create(empresa=self.empresa, nome='Arroz', preco=Decimal('10.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        # Sem a carência depois da última alteração (vendas/condicional.py)
+        carencia = mock.patch('vendas.condicional._carencia', return_value=0)
+        carencia.start()
+        self.addCleanup(carencia.stop)
+
+    def _alterar(self, funcao):
+        with self.captureOnCommitCallbacks(execute=True):
+            funcao()
+
+    def test_lista_responde_304_sem_consultar(self):
+        response = self.client.get('/api/pdv/produtos/')
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/pdv/produtos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse([q for q in queries if 'vendas_produto' in q['sql']])
+        response = self.client.get('/api/pdv/produtos/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        # Gravação, exclusão lógica e exclusão física mudam a versão
+        etags = {etag}
+        for alteracao in (
+            lambda: Produto.objects.create(empresa=self.empresa, nome='Feijão', preco=Decimal('8.00')),
+            self.produto.delete,
+            self.produto.hard_delete,
+        ):
+            self._alterar(alteracao)
+            response = self.client.get('/api/pdv/produtos/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(response['ETag'], etags)
+            etag = response['ETag']
+            etags.add(etag)
+
+        # Outro recurso não afeta a listagem de produtos
+        self._alterar(lambda: Cliente.objects.create(empresa=self.empresa, nome='Outro', cpf='cpf-2'))
+        self.assertEqual(self.client.get('/api/pdv/produtos/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_sem_validadores_logo_apos_alteracao(self):
+        with mock.patch('vendas.condicional._carencia', return_value=1):
+            response = self.client.get('/api/pdv/clientes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_sincronizacao(self):
+        url = f'/api/pdv/empresas/{self.empresa.pk}/dados-atualizados/?cursor={codificar_cursor(0)}'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        iniciais = f'/api/pdv/empresas/{self.empresa.pk}/dados-iniciais/'
+        self.assertEqual(self.client.get(iniciais, HTTP_IF_NONE_MATCH=self.client.get(iniciais)['ETag']).status_code, 304)
+
+        self.cliente.nome = 'Cliente renomeado'
+        self._alterar(self.cliente.save)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['nome'] for c in response.json()['clientes_atualizados']], ['Cliente renomeado'])
+
+        # O nome da empresa sai nas linhas: renomeá-la também muda a versão
+        etag = response['ETag']
+        self.empresa.nome = 'Empresa renomeada'
+        self._alterar(self.empresa.save)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+def _eventos(bloco):
+    return [json.loads(linha[len(b'data: '):]) for linha in bloco.split(b'\n') if linha.startswith(b'data: {"')]
+
+
+@override_settings(PDV_NOTIFICACOES='local', PDV_EVENTOS_PING=0.05, PDV_EVENTOS_DURACAO=2)
+class NotificacoesTests(TestCase):
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, self.sessao, _ = criar_empresa()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendedor)
+        self.url = f'/api/pdv/empresas/{self.empresa.pk}/eventos/'
+
+    def test_fluxo_de_eventos(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        conteudo = iter(response.streaming_content)
+        self.assertEqual(next(conteudo), notificacoes.RETRY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            produto = Produto.objects.create(empresa=self.empresa, nome='Arroz', preco=Decimal('10.00'), estoque=5)
+        self.assertEqual(_eventos(next(conteudo)), [{'recurso': 'produtos', 'uuids': [str(produto.uuid)], 'removido': False}])
+        self.assertEqual(next(conteudo), notificacoes.PING)
+
+        # A baixa de estoque é um UPDATE, sem sinais: avisa por conta própria
+        with self.captureOnCommitCallbacks(execute=True):
+            baixar_estoque({produto.pk: 2})
+            produto.delete()
+        self.assertEqual(
+            _eventos(next(conteudo)),
+            [{'recurso': 'produtos', 'uuids': [str(produto.uuid)], 'removido': False},
+             {'recurso': 'produtos', 'uuids': [str(produto.uuid)], 'removido': True}],
+        )
+
+        # Outra empresa não recebe; a assinatura termina com a resposta
+        outra, *_ = criar_empresa('2')
+        with self.captureOnCommitCallbacks(execute=True):
+            Cliente.objects.create(empresa=outra, nome='Outro', cpf='cpf-outro')
+        self.assertEqual(next(conteudo), notificacoes.PING)
+        # Depois de PDV_EVENTOS_DURACAO a resposta termina (o terminal reconecta)
+        self.assertEqual(set(conteudo), {notificacoes.PING})
+        self.assertEqual(notificacoes.assinantes(), 0)
+
+    def test_fila_cheia_pede_ressincronizacao(self):
+        with override_settings(PDV_EVENTOS_FILA=2):
+            assinatura = notificacoes.assinar(self.empresa.pk)
+        self.addCleanup(notificacoes.cancelar, assinatura)
+        for _ in range(3):
+            notificacoes.entregar(self.empresa.pk, {'recurso': 'produtos', 'uuids': [], 'removido': False})
+        self.assertEqual(assinatura.esperar(0), ([], True))
+
+    def test_fluxo_assincrono(self):
+        fluxo = notificacoes.FluxoEventosAsync(self.empresa.pk)
+        evento = {'recurso': 'caixas', 'uuids': [str(self.caixa.uuid)], 'removido': False}
+
+        async def ler():
+            conteudo = aiter(fluxo)
+            blocos = [await anext(conteudo)]
+            # Entregue de outra thread, como faz a do LISTEN
+            threading.Timer(0.01, notificacoes.entregar, [self.empresa.pk, evento]).start()
+            blocos.append(await anext(conteudo))
+            return blocos
+
+        try:
+            self.assertEqual(asyncio.run(ler()), [notificacoes.RETRY, b'event: alteracao\ndata: ' + json.dumps(evento, separators=(',', ':')).encode() + b'\n\n'])
+        finally:
+            fluxo.close()
+
+    def test_sem_acesso(self):
+        outra, *_ = criar_empresa('2')
+        response = self.client.get(f'/api/pdv/empresas/{outra.pk}/eventos/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(response.content.startswith(b'event: erro\ndata: '))
+
+
+class NotificacoesPostgresTests(TransactionTestCase):
+    # NOTIFY só é entregue no commit: precisa de transações de verdade
+    def test_listen_notify(self):
+        self.addCleanup(notificacoes.parar_ouvinte)
+        empresa, *_ = criar_empresa()
+        assinatura = notificacoes.assinar(empresa.pk)
+        self.addCleanup(notificacoes.cancelar, assinatura)
+        with transaction.atomic():
+            cliente = Cliente.objects.create(empresa=empresa, nome='Novo', cpf='cpf-novo')
+            self.assertEqual(assinatura.esperar(0.2), ([], False))
+        eventos, _ = assinatura.esperar(5)
+        self.assertEqual(eventos, [{'recurso': 'clientes', 'uuids': [str(cliente.uuid)], 'removido': False}])
+
+
+class ViewsAssincronasTests(TestCase):
+    # As actions de leitura da sincronização rodam no event loop sob ASGI (vendas/assincrono.py)
+    def setUp(self):
+        self.empresa, self.vendedor, self.caixa, self.sessao, self.cliente = criar_empresa()
+        self.vendedor.caixa_atual = self.caixa
+        self.vendedor.save()
+        self.produto = Produto.objects.create(empresa=self.empresa, nome='Café', codigo_barras='789', preco=Decimal('8.50'))
+        Venda.objects.create(empresa=self.empresa, cliente=self.cliente, sessao_caixa=self.sessao, vendedor=self.vendedor, total=Decimal('8.50'))
+        self.async_client = AsyncClient()
+        self.empresa_url = f'/api/pdv/empresas/{self.empresa.pk}'
+
+    def _get(self, url, dados=None):
+        # Os cabeçalhos passados ao construtor do AsyncClient não entram nos cabeçalhos ASGI
+        return self.async_client.get(url, dados, headers={'Authorization': f'Bearer {AccessToken.for_user(self.vendedor)}'})
+
+    def test_rotas(self):
+        for url in ['dados-iniciais/', 'dados-atualizados/']:
+            self.assertTrue(iscoroutinefunction(resolve(f'{self.empresa_url}/{url}').func))
+        self.assertTrue(iscoroutinefunction(resolve('/api/pdv/produtos/lookup/').func))
+        self.assertTrue(iscoroutinefunction(resolve('/api/pdv/vendas/vendas-abertas-sessao/').func))
+        self.assertFalse(iscoroutinefunction(resolve('/api/pdv/produtos/').func))
+        self.assertFalse(iscoroutinefunction(resolve(f'{self.empresa_url}/eventos/').func))
+
+    async def test_dados_iniciais_em_streaming_assincrono(self):
+        response = await self._get(f'{self.empresa_url}/dados-iniciais/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        data = json.loads(b''.join([parte async for parte in response.streaming_content]))
+        self.assertEqual([p['uuid'] for p in data['produtos']], [str(self.produto.uuid)])
+        self.assertEqual([u['username'] for u in data['usuarios']], [self.vendedor.username])
+
+    async def test_feed_e_consultas(self):
+        response = await self._get(f'{self.empresa_url}/dados-atualizados/', {'cursor': codificar_cursor(0)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['uuid'] for p in response.json()['produtos_atualizados']], [str(self.produto.uuid)])
+
+        response = await self._get('/api/pdv/produtos/lookup/', {'codigo': '789'})
+        self.assertEqual(response.json()['nome'], 'Café')
+        response = await self._get('/api/pdv/produtos/lookup/', {'q': 'caf'})
+        self.assertEqual([p['nome'] for p in response.json()], ['Café'])
+
+        response = await self._get('/api/pdv/vendas/vendas-abertas-sessao/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+    async def test_sem_acesso_e_sem_autenticacao(self):
+        outra, *_ = await sync_to_async(criar_empresa)('2')
+        response = await self._get(f'/api/pdv/empresas/{outra.pk}/dados-atualizados/', {'cursor': codificar_cursor(0)})
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get(f'{self.empresa_url}/dados-atualizados/', {'cursor': codificar_cursor(0)})
+        self.assertEqual(response.status_code, 403)
+
+
+class EstoqueConcorrenciaTests(TransactionTestCase):
+    THREADS = 8
+    VENDAS_POR_THREAD = 25
+
+    def test_vendas_concorrentes_nao_perdem_baixas(self):
+        empresa, _, _, _, _ = criar_empresa()
+        estoque_inicial = self.THREADS * self.VENDAS_POR_THREAD + 10
+        produto = Produto.objects.create(empresa=empresa, nome='Café', preco=Decimal('8.50'), estoque=estoque_inicial)
+        outro = Produto.objects.create(empresa=empresa, nome='Leite', preco=Decimal('4.20'), estoque=estoque_inicial)
+        erros = []
+
+        def vender(ordem):
+            try:
+                for _ in range(self.VENDAS_POR_THREAD):
+                    # Metade das threads informa os produtos em ordem inversa para provocar deadlocks
+                    itens = [(produto.pk, 1), (outro.pk, 1)]
+                    baixar_estoque(dict(itens[::ordem]))
+            except Exception as exc:
+                erros.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vender, args=(1 if i % 2 else -1,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erros, [])
+        total = self.THREADS * self.VENDAS_POR_THREAD
+        produto.refresh_from_db()
+        outro.refresh_from_db()
+        self.assertEqual(produto.estoque, estoque_inicial - total)
+        self.assertEqual(outro.estoque, estoque_inicial - total)
+
+
+class BenchmarkEstoqueTests(TransactionTestCase):
+    def test_resultado_em_json_e_comparacao(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            saida = os.path.join(diretorio, 'estoque.json')
+            argumentos = ['--threads', '1', '3', '--produtos', '2', '--itens', '2', '--baixas', '5']
+            call_command('benchmark_estoque', *argumentos, '--saida', saida, stdout=StringIO())
+            with open(saida) as arquivo:
+                resultado = json.load(arquivo)
+            self.assertEqual(list(resultado['cenarios']), ['threads_1', 'threads_3'])
+            self.assertEqual(resultado['cenarios']['threads_3']['baixas'], 15)
+            self.assertGreater(resultado['cenarios']['threads_3']['baixas_por_segundo'], 0)
+
+            # Uma execução anterior muito mais rápida acusa regressão
+            resultado['cenarios']['threads_3']['baixas_por_segundo'] *= 1000
+            with open(saida, 'w') as arquivo:
+                json.dump(resultado, arquivo)
+            with self.assertRaisesMessage(CommandError, 'regressão'):
+                call_command('benchmark_estoque', *argumentos, '--comparar', saida, '--tolerancia', '0.5',
+                             stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(Empresa.objects.exists())
@@ -8,6 +8,10 @@ from .views import (
     ClienteViewSet,
     ProdutoViewSet,
     VendaViewSet,
+    ReservaEstoqueViewSet,
+    CacheViewSet,
+    RelatorioViewSet,
+    ExportacaoViewSet,
 )
 
 router = DefaultRouter()
@@ -17,6 +21,10 @@ router.register(r'sessoes-caixa', SessaoCaixaViewSet)
 router.register(r'clientes', ClienteViewSet)
 router.register(r'produtos', ProdutoViewSet)
 router.register(r'vendas', VendaViewSet)
+router.register(r'reservas-estoque', ReservaEstoqueViewSet)
+router.register(r'cache', CacheViewSet, basename='cache')
+router.register(r'relatorios', RelatorioViewSet, basename='relatorio')
+router.register(r'exportacoes', ExportacaoViewSet)
 
 urlpatterns = [
     path('pdv/', include(router.urls)),
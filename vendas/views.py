@@ -1,12 +1,34 @@
 
+import datetime
+from collections import Counter
+from pathlib import Path
+from django.conf import settings
 from django.utils import timezone
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework import viewsets, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import mixins, viewsets, status
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.viewsets import ModelViewSet
-from .models import Cliente, Produto, Venda, Empresa, Caixa, SessaoCaixa, Usuario
+from asgiref.sync import sync_to_async
+from .assincrono import AcoesAssincronasMixin
+from .bootstrap import gerar_json, gerar_ndjson
+from . import busca_produtos, cache, condicional, documentos, esquemas, fechamento, notificacoes, relatorios
+from .estoque import reservar
+from .exportacao import executar_exportacao, CONTENT_TYPES
+from .ingestao import ingerir_vendas, CRIADA, JA_REGISTRADA, REJEITADA
+from .middleware import aiterar_no_contexto, iterar_no_contexto
+from .pagination import KeysetPagination
+from .renderers import EventosRenderer, JSONRapidoRenderer
+from .roteamento import LeituraEmReplicaMixin
+from .snapshots import snapshot_mais_recente, gerar_snapshot, versao_empresa, etag_snapshot, responder_arquivo
+from .sync import montar_feed, amontar_feed, codificar_cursor, decodificar_cursor, CursorInvalido, LIMITE_PADRAO, LIMITE_MAXIMO, RECURSOS
+from .tarefas import agendar
+from .models import Cliente, Produto, Venda, ItemVenda, DevolucaoItemVenda, Empresa, Caixa, SessaoCaixa, Usuario, ReservaEstoque, Exportacao, Fatura, DocumentoFatura
 from .serializers import (
     EmpresaSerializer,
     CaixaSerializer,
@@ -14,7 +36,10 @@ from .serializers import (
     ClienteSerializer,
     ProdutoSerializer,
     VendaSerializer,
-    UsuarioSerializer,
+    ReservaEstoqueSerializer,
+    FiltroRelatorioSerializer,
+    ExportacaoSerializer,
+    leitura,
 )
 
 class ClienteViewSet(ModelViewSet):
@@ -32,14 +57,51 @@ class VendaViewSet(ModelViewSet):
     serializer_class = VendaSerializer
     permission_classes = [IsAuthenticated]
 
-class EmpresaFilteredViewSet(viewsets.ModelViewSet):
+class EmpresaFilteredViewSet(LeituraEmReplicaMixin, AcoesAssincronasMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    campo_empresa = 'empresa'
+    # Plano de consulta por action: {'list': {'select_related': [...], 'prefetch_related': [...], 'only': [...]}}.
+    # A chave '*' vale para as actions sem plano próprio.
+    planos_consulta = {}
+    # Listagem montada direto de values() (vendas/serializers/leitura.py), no lugar do serializer
+    leitura_rapida = None
+    # Listagem com ETag/Last-Modified pela versão do modelo na empresa (vendas/condicional.py)
+    get_condicional = False
 
     def get_queryset(self):
         user = self.request.user
         if not user.is_authenticated or not user.empresa:
             return self.queryset.none()
-        return self.queryset.filter(empresa=user.empresa)
+        return self.aplicar_plano(self.queryset.filter(**{self.campo_empresa: user.empresa}))
+
+    def aplicar_plano(self, queryset):
+        plano = self.planos_consulta.get(self.action, self.planos_consulta.get('*', {}))
+        if plano.get('select_related'):
+            queryset = queryset.select_related(*plano['select_related'])
+        if plano.get('prefetch_related'):
+            queryset = queryset.prefetch_related(*plano['prefetch_related'])
+        if plano.get('only'):
+            queryset = queryset.only(*plano['only'])
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        etag = last_modified = None
+        if self.get_condicional and request.user.is_authenticated and request.user.empresa_id:
+            etag, last_modified = condicional.validadores(request.user.empresa_id, [self.queryset.model])
+            resposta = condicional.nao_modificado(request, etag, last_modified)
+            if resposta is not None:
+                return resposta
+        return condicional.marcar(self._listar(request, *args, **kwargs), etag, last_modified)
+
+    def _listar(self, request, *args, **kwargs):
+        if self.leitura_rapida is None:
+            return super().list(request, *args, **kwargs)
+        valores = self.leitura_rapida.valores(self.filter_queryset(self.get_queryset()))
+        pagina = self.paginate_queryset(valores)
+        if pagina is not None:
+            return self.get_paginated_response(self.leitura_rapida.linhas(pagina))
+        return Response(self.leitura_rapida.linhas(valores))
 
     def perform_create(self, serializer):
         serializer.save(empresa=self.request.user.empresa)
@@ -47,83 +109,158 @@ class EmpresaFilteredViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save(empresa=self.request.user.empresa)
 
-class EmpresaViewSet(viewsets.ReadOnlyModelViewSet):
+class EmpresaViewSet(LeituraEmReplicaMixin, AcoesAssincronasMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Empresa.objects.all()
     serializer_class = EmpresaSerializer
     permission_classes = [IsAuthenticated]
+    acoes_em_replica = {'list', 'retrieve', 'dados_iniciais', 'dados_atualizados'}
+
+    def _sem_acesso(self, request, empresa):
+        # Pelo id: request.user.empresa seria uma consulta, síncrona, nas actions assíncronas
+        return not request.user.is_superuser and (not request.user.is_authenticated or request.user.empresa_id != empresa.pk)
+
+    async def _validadores(self, empresa):
+        # Os dois payloads de sincronização juntam as linhas de todos os RECURSOS
+        return await condicional.avalidadores(empresa.pk, [modelo for _, modelo, _, _, _ in RECURSOS])
 
     @action(detail=True, methods=['get'], url_path='dados-iniciais')
-    def dados_iniciais(self, request, pk=None):
-        try:
-            empresa = self.get_object()
-            if not request.user.is_superuser and (not request.user.is_authenticated or request.user.empresa != empresa):
-                return Response({'detail': 'Não autorizado a acessar dados desta empresa.'}, status=status.HTTP_403_FORBIDDEN)
-            clientes = Cliente.objects.filter(empresa=empresa)
-            produtos = Produto.objects.filter(empresa=empresa)
-            caixas = Caixa.objects.filter(empresa=empresa)
-            usuarios = Usuario.objects.filter(empresa=empresa, is_active=True)
-
-            data = {
-                'empresa': EmpresaSerializer(empresa).data,
-                'clientes': ClienteSerializer(clientes, many=True).data,
-                'produtos': ProdutoSerializer(produtos, many=True).data,
-                'caixas': CaixaSerializer(caixas, many=True).data,
-                'usuarios': UsuarioSerializer(usuarios, many=True).data,
-                'current_server_time': timezone.now().timestamp()
-            }
-            return Response(data)
-        except Empresa.DoesNotExist:
-            return Response({'detail': 'Empresa não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+    async def dados_iniciais(self, request, pk=None):
+        empresa = await self.aget_object()
+        if self._sem_acesso(request, empresa):
+            return Response({'detail': 'Não autorizado a acessar dados desta empresa.'}, status=status.HTTP_403_FORBIDDEN)
+
+        # O conteúdo é gerado depois que a view retorna; leva junto o esquema e a réplica
+        with esquemas.da_empresa(empresa):
+            etag, last_modified = await self._validadores(empresa)
+            resposta = condicional.nao_modificado(request, etag, last_modified)
+            if resposta is not None:
+                return resposta
+            if request.query_params.get('formato') == 'ndjson':
+                gerar, content_type = gerar_ndjson, 'application/x-ndjson'
+            else:
+                gerar, content_type = gerar_json, 'application/json'
+            # O cabeçalho já consulta o banco
+            partes = await sync_to_async(gerar)(empresa)
+            # Sob ASGI o Django juntaria um iterador síncrono inteiro na memória antes de enviar
+            if isinstance(request._request, ASGIRequest):
+                conteudo = aiterar_no_contexto(partes)
+            else:
+                conteudo = iterar_no_contexto(partes)
+            return condicional.marcar(StreamingHttpResponse(conteudo, content_type=content_type), etag, last_modified)
 
     @action(detail=True, methods=['get'], url_path='dados-atualizados')
-    def dados_atualizados(self, request, pk=None):
-        try:
-            empresa = self.get_object()
-            if not request.user.is_superuser and (not request.user.is_authenticated or request.user.empresa != empresa):
-                return Response({'detail': 'Não autorizado a acessar dados desta empresa.'}, status=status.HTTP_403_FORBIDDEN)
-            
-            last_sync_timestamp = request.query_params.get('last_sync_timestamp')
-            
-            if not last_sync_timestamp:
-                return Response({'detail': 'Parâmetro "last_sync_timestamp" é obrigatório.'}, status=status.HTTP_400_BAD_REQUEST)
-
-            try:
-                last_sync_dt = timezone.datetime.fromtimestamp(float(last_sync_timestamp), tz=timezone.utc)
-            except ValueError:
-                return Response({'detail': 'Formato de timestamp inválido. Deve ser um número unix timestamp.'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            updated_clientes = Cliente.objects.filter(empresa=empresa).filter(
-                models.Q(criado_em__gt=last_sync_dt) | models.Q(atualizado_em__gt=last_sync_dt)
-            )
-            updated_produtos = Produto.objects.filter(empresa=empresa).filter(
-                models.Q(criado_em__gt=last_sync_dt) | models.Q(atualizado_em__gt=last_sync_dt)
-            )
-            updated_caixas = Caixa.objects.filter(empresa=empresa).filter(
-                models.Q(criado_em__gt=last_sync_dt) | models.Q(atualizado_em__gt=last_sync_dt)
-            )
-            updated_usuarios = Usuario.objects.filter(empresa=empresa, is_active=True).filter(
-                models.Q(date_joined__gt=last_sync_dt) | models.Q(atualizado_em__gt=last_sync_dt)
-            )
+    async def dados_atualizados(self, request, pk=None):
+        empresa = await self.aget_object()
+        if self._sem_acesso(request, empresa):
+            return Response({'detail': 'Não autorizado a acessar dados desta empresa.'}, status=status.HTTP_403_FORBIDDEN)
+
+        cursor = request.query_params.get('cursor')
+        last_sync_timestamp = request.query_params.get('last_sync_timestamp')
 
-            data = {
-                'clientes_atualizados': ClienteSerializer(updated_clientes, many=True).data,
-                'produtos_atualizados': ProdutoSerializer(updated_produtos, many=True).data,
-                'caixas_atualizados': CaixaSerializer(updated_caixas, many=True).data,
-                'usuarios_atualizados': UsuarioSerializer(updated_usuarios, many=True).data,
-                'current_server_time': timezone.now().timestamp()
-            }
-            return Response(data)
+        if not cursor and not last_sync_timestamp:
+            return Response({'detail': 'Informe o parâmetro "cursor" ou "last_sync_timestamp".'}, status=status.HTTP_400_BAD_REQUEST)
 
-        except Empresa.DoesNotExist:
-            return Response({'detail': 'Empresa não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        versao_inicial, last_sync_dt = 0, None
+        try:
+            if cursor:
+                versao_inicial = decodificar_cursor(cursor)
+            else:
+                last_sync_dt = datetime.datetime.fromtimestamp(float(last_sync_timestamp), tz=datetime.timezone.utc)
+        except CursorInvalido:
+            return Response({'detail': 'Cursor de sincronização inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({'detail': 'Formato de timestamp inválido. Deve ser um número unix timestamp.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limite = min(int(request.query_params.get('limite', LIMITE_PADRAO)), LIMITE_MAXIMO)
+        except ValueError:
+            limite = LIMITE_PADRAO
+
+        with esquemas.da_empresa(empresa):
+            etag, last_modified = await self._validadores(empresa)
+            resposta = condicional.nao_modificado(request, etag, last_modified)
+            if resposta is not None:
+                return resposta
+            data = await amontar_feed(empresa, versao_inicial=versao_inicial, limite=max(limite, 1), desde=last_sync_dt)
+        data['current_server_time'] = timezone.now().timestamp()
+        return condicional.marcar(Response(data), etag, last_modified)
+
+    @action(detail=True, methods=['get'], url_path='eventos', renderer_classes=[JSONRapidoRenderer, EventosRenderer])
+    def eventos(self, request, pk=None):
+        # Server-Sent Events com as alterações do catálogo da empresa (vendas/notificacoes.py)
+        empresa = self.get_object()
+        if self._sem_acesso(request, empresa):
+            return Response({'detail': 'Não autorizado a acessar dados desta empresa.'}, status=status.HTTP_403_FORBIDDEN)
+        if not getattr(settings, 'PDV_NOTIFICACOES', 'postgres'):
+            return Response({'detail': 'Notificações desativadas.'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Sob ASGI o conteúdo precisa ser assíncrono: o Django consumiria um iterador síncrono inteiro antes de enviar
+        fluxo = notificacoes.FluxoEventosAsync if isinstance(request._request, ASGIRequest) else notificacoes.FluxoEventos
+        resposta = StreamingHttpResponse(fluxo(empresa.pk), content_type='text/event-stream')
+        resposta['Cache-Control'] = 'no-cache'
+        resposta['X-Accel-Buffering'] = 'no'
+        return resposta
+
+    @action(detail=True, methods=['get'], url_path='snapshot')
+    def snapshot(self, request, pk=None):
+        empresa = self.get_object()
+        if self._sem_acesso(request, empresa):
+            return Response({'detail': 'Não autorizado a acessar dados desta empresa.'}, status=status.HTTP_403_FORBIDDEN)
+
+        with esquemas.da_empresa(empresa):
+            return self._snapshot(request, empresa)
+
+    def _snapshot(self, request, empresa):
+        versao, caminho = snapshot_mais_recente(empresa)
+        if versao is None:
+            agendar(gerar_snapshot, empresa, chave=('snapshot', empresa.pk))
+            return Response({'detail': 'Snapshot em geração. Tente novamente em instantes.'}, status=status.HTTP_202_ACCEPTED)
+
+        desatualizado = versao_empresa(empresa) > versao
+        data = {
+            'versao': versao,
+            'cursor': codificar_cursor(versao),
+            'url': request.build_absolute_uri(reverse('empresa-snapshot-arquivo', args=[empresa.pk])),
+            'etag': etag_snapshot(empresa, versao),
+            'tamanho': caminho.stat().st_size,
+            'desatualizado': desatualizado,
+        }
+        if desatualizado:
+            # Entrega junto a primeira página do feed incremental a partir do snapshot
+            data['delta'] = montar_feed(empresa, versao_inicial=versao)
+            agendar(gerar_snapshot, empresa, chave=('snapshot', empresa.pk))
+        return Response(data)
+
+    @action(detail=True, methods=['get'], url_path='snapshot/arquivo', url_name='snapshot-arquivo')
+    def snapshot_arquivo(self, request, pk=None):
+        empresa = self.get_object()
+        if self._sem_acesso(request, empresa):
+            return Response({'detail': 'Não autorizado a acessar dados desta empresa.'}, status=status.HTTP_403_FORBIDDEN)
+
+        versao, caminho = snapshot_mais_recente(empresa)
+        if versao is None:
+            return Response({'detail': 'Nenhum snapshot disponível para esta empresa.'}, status=status.HTTP_404_NOT_FOUND)
+        content_type = 'application/zstd' if caminho.suffix == '.zst' else 'application/gzip'
+        return responder_arquivo(request, caminho, etag_snapshot(empresa, versao), content_type)
 
 class CaixaViewSet(EmpresaFilteredViewSet):
     queryset = Caixa.objects.all()
     serializer_class = CaixaSerializer
+    leitura_rapida = leitura.CAIXA
+    get_condicional = True
+    planos_consulta = {
+        '*': {'select_related': ['empresa']},
+    }
 
 class SessaoCaixaViewSet(EmpresaFilteredViewSet):
     queryset = SessaoCaixa.objects.all()
     serializer_class = SessaoCaixaSerializer
+    leitura_rapida = leitura.SESSAO_CAIXA
+    campo_empresa = 'caixa__empresa'
+    ordenacao_paginacao = ('-data_abertura', '-id')
+    planos_consulta = {
+        '*': {'select_related': ['caixa', 'vendedor']},
+    }
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -147,18 +284,20 @@ class SessaoCaixaViewSet(EmpresaFilteredViewSet):
         if not caixa.ativo:
             return Response({'detail': 'Caixa inativo.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if SessaoCaixa.objects.filter(caixa=caixa, data_fechamento__isnull=True).exists():
+        # A unicidade é garantida pelo banco (sessao_caixa_aberta_unica): duas aberturas
+        # simultâneas do mesmo caixa não passam as duas
+        try:
+            with transaction.atomic():
+                sessao = SessaoCaixa.objects.create(
+                    caixa=caixa,
+                    vendedor=request.user,
+                    saldo_inicial=saldo_inicial
+                )
+                request.user.caixa_atual = sessao.caixa
+                request.user.save()
+        except IntegrityError:
             return Response({'detail': 'Já existe uma sessão aberta para este caixa.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        with transaction.atomic():
-            sessao = SessaoCaixa.objects.create(
-                caixa=caixa,
-                vendedor=request.user,
-                saldo_inicial=saldo_inicial
-            )
-            request.user.caixa_atual = sessao.caixa
-            request.user.save()
-
         serializer = self.get_serializer(sessao)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -188,17 +327,71 @@ class SessaoCaixaViewSet(EmpresaFilteredViewSet):
         serializer = self.get_serializer(sessao)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='relatorio-z')
+    def relatorio_z(self, request, pk=None):
+        sessao = self.get_object()
+        return Response(fechamento.relatorio_z(sessao))
+
 class ClienteViewSet(EmpresaFilteredViewSet):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
+    leitura_rapida = leitura.CLIENTE
+    get_condicional = True
+    planos_consulta = {
+        '*': {'select_related': ['empresa']},
+    }
 
 class ProdutoViewSet(EmpresaFilteredViewSet):
     queryset = Produto.objects.all()
     serializer_class = ProdutoSerializer
+    leitura_rapida = leitura.PRODUTO
+    get_condicional = True
+    planos_consulta = {
+        '*': {'select_related': ['empresa']},
+    }
+
+    @action(detail=False, methods=['get'], url_path='lookup')
+    async def lookup(self, request):
+        # ?codigo=<código de barras/SKU> para o leitor, ?q=<texto> para a busca por nome
+        empresa = request.user.empresa_id
+        if not empresa:
+            return Response({'detail': 'Usuário sem empresa.'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.aplicar_plano(Produto.objects.all())
+
+        codigo = request.query_params.get('codigo')
+        if codigo is not None:
+            produto = await busca_produtos.apor_codigo(empresa, codigo, queryset)
+            if produto is None:
+                return Response({'detail': 'Produto não encontrado para este código.'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(self.get_serializer(produto).data)
+
+        termo = request.query_params.get('q', '')
+        try:
+            limite = min(int(request.query_params.get('limite', busca_produtos.LIMITE_PADRAO)), busca_produtos.LIMITE_MAXIMO)
+        except ValueError:
+            return Response({'detail': 'limite inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not termo.strip() or limite < 1:
+            return Response({'detail': 'Informe "codigo" ou "q".'}, status=status.HTTP_400_BAD_REQUEST)
+        produtos = await busca_produtos.abuscar(empresa, termo, limite, queryset)
+        return Response(self.get_serializer(produtos, many=True).data)
 
 class VendaViewSet(EmpresaFilteredViewSet):
     queryset = Venda.objects.all()
     serializer_class = VendaSerializer
+    leitura_rapida = leitura.VENDA
+    ordenacao_paginacao = ('-data_venda', '-id')
+    tamanho_maximo_pagina = 200
+    planos_consulta = {
+        '*': {
+            'select_related': ['cliente', 'vendedor', 'sessao_caixa__caixa', 'fatura'],
+            'prefetch_related': [
+                Prefetch('itens', queryset=ItemVenda.objects.select_related('produto')),
+                Prefetch('devolucoes_itens', queryset=DevolucaoItemVenda.objects.select_related('item_venda__produto')),
+            ],
+        },
+        'fatura_pdf': {'select_related': ['fatura__documento']},
+        'fatura_pdf_arquivo': {'select_related': ['fatura__documento']},
+    }
 
     def create(self, request, *args, **kwargs):
         sessao_caixa_uuid = request.data.get('sessao_caixa_uuid')
@@ -206,19 +399,12 @@ class VendaViewSet(EmpresaFilteredViewSet):
         if not all([sessao_caixa_uuid, cliente_uuid]):
             return Response({'detail': 'UUIDs de sessão de caixa e cliente são obrigatórios.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            sessao_caixa = SessaoCaixa.objects.get(
-                uuid=sessao_caixa_uuid, 
-                vendedor=request.user,
-                caixa__empresa=request.user.empresa
-            )
-            cliente = Cliente.objects.get(uuid=cliente_uuid, empresa=request.user.empresa)
-
-            if not sessao_caixa.esta_aberta:
-                return Response({'detail': 'Sessão de caixa não está aberta.'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        except (SessaoCaixa.DoesNotExist, Cliente.DoesNotExist):
+        sessao_caixa = cache.sessao_por_uuid(request.user.empresa_id, sessao_caixa_uuid)
+        cliente = cache.cliente_por_uuid(request.user.empresa_id, cliente_uuid)
+        if sessao_caixa is None or sessao_caixa.vendedor_id != request.user.pk or cliente is None:
             return Response({'detail': 'Dados relacionados (sessão, cliente) inválidos ou não pertencem à sua empresa/usuário.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not sessao_caixa.esta_aberta:
+            return Response({'detail': 'Sessão de caixa não está aberta.'}, status=status.HTTP_400_BAD_REQUEST)
         
         mutable_data = request.data.copy()
         mutable_data['sessao_caixa'] = sessao_caixa.pk
@@ -229,25 +415,231 @@ class VendaViewSet(EmpresaFilteredViewSet):
         serializer.is_valid(raise_exception=True)
 
         with transaction.atomic():
-            venda = serializer.save()
+            venda = serializer.save(
+                sessao_caixa=sessao_caixa,
+                cliente=cliente,
+                vendedor=request.user,
+                empresa=request.user.empresa,
+            )
 
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     @action(detail=False, methods=['get'], url_path='vendas-abertas-sessao')
-    def vendas_abertas_sessao(self, request):
+    async def vendas_abertas_sessao(self, request):
         user = request.user
-        if not user.is_authenticated or not user.caixa_atual:
+        if not user.is_authenticated or not user.caixa_atual_id:
             return Response({'detail': 'Usuário não tem uma sessão de caixa ativa.'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            current_session = SessaoCaixa.objects.get(
-                caixa=user.caixa_atual,
+            current_session = await SessaoCaixa.objects.aget(
+                caixa_id=user.caixa_atual_id,
                 vendedor=user,
                 data_fechamento__isnull=True
             )
             sales = Venda.objects.filter(sessao_caixa=current_session).order_by('-data_venda')
-            serializer = self.get_serializer(sales, many=True)
-            return Response(serializer.data)
+            return Response(await self.leitura_rapida.alinhas(self.leitura_rapida.valores(sales)))
         except SessaoCaixa.DoesNotExist:
             return Response({'detail': 'Nenhuma sessão de caixa aberta encontrada para este usuário.'}, status=status.HTTP_404_NOT_FOUND)
+
+    def perform_destroy(self, instance):
+        # A exclusão é lógica; a venda deixa de contar nos totais da sessão, que precisa estar aberta
+        with transaction.atomic():
+            instance.delete()
+            fechamento.registrar([fechamento.negativo(fechamento.movimento_da_venda(instance))], exigir_aberta=True)
+
+    def _fatura(self):
+        venda = self.get_object()
+        try:
+            return venda.fatura
+        except Fatura.DoesNotExist:
+            return None
+
+    @action(detail=True, methods=['get', 'post'], url_path='fatura/pdf')
+    def fatura_pdf(self, request, pk=None):
+        # GET: situação do PDF da fatura; POST: pede uma nova geração (ex.: depois de um erro)
+        fatura = self._fatura()
+        if fatura is None:
+            return Response({'detail': 'Venda sem fatura.'}, status=status.HTTP_404_NOT_FOUND)
+        if request.method == 'POST':
+            transaction.on_commit(lambda: documentos.solicitar_pdf(fatura.pk))
+            return Response({'status': DocumentoFatura.Status.PENDENTE}, status=status.HTTP_202_ACCEPTED)
+
+        documento = getattr(fatura, 'documento', None)
+        if documento is None:
+            return Response({'status': DocumentoFatura.Status.PENDENTE})
+        gerado = bool(documento.arquivo)
+        return Response({
+            'status': documento.status,
+            'assinado': documento.assinado,
+            'tamanho': documento.tamanho,
+            'gerado_em': documento.gerado_em,
+            # Há PDF de uma versão anterior da fatura; o novo ainda está sendo gerado
+            'desatualizado': gerado and documento.fatura_atualizada_em != fatura.atualizado_em,
+            'erro': documento.erro or None,
+            'url': request.build_absolute_uri(reverse('venda-fatura-pdf-arquivo', args=[pk])) if gerado else None,
+        })
+
+    @action(detail=True, methods=['get'], url_path='fatura/pdf/arquivo', url_name='fatura-pdf-arquivo')
+    def fatura_pdf_arquivo(self, request, pk=None):
+        fatura = self._fatura()
+        documento = getattr(fatura, 'documento', None) if fatura else None
+        if documento is None or not documento.arquivo:
+            return Response({'detail': 'PDF da fatura ainda não gerado.'}, status=status.HTTP_404_NOT_FOUND)
+        caminho = Path(documento.arquivo)
+        if not caminho.is_file():
+            return Response({'detail': 'Arquivo do PDF não está mais disponível.'}, status=status.HTTP_410_GONE)
+        etag = f'"{fatura.uuid.hex}-{int(documento.fatura_atualizada_em.timestamp() * 1_000_000)}"'
+        return responder_arquivo(request, caminho, etag, 'application/pdf')
+
+    @action(detail=False, methods=['post'], url_path='lote')
+    def lote(self, request):
+        # Vendas registradas offline pelo terminal: {"vendas": [{"uuid": ..., ...}, ...]}
+        vendas = request.data.get('vendas') if isinstance(request.data, dict) else None
+        if not isinstance(vendas, list) or not vendas:
+            return Response({'detail': 'Envie a lista "vendas".'}, status=status.HTTP_400_BAD_REQUEST)
+        limite = getattr(settings, 'PDV_INGESTAO_LIMITE', 1000)
+        if len(vendas) > limite:
+            return Response({'detail': f'No máximo {limite} vendas por lote.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not request.user.empresa:
+            return Response({'detail': 'Usuário sem empresa.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultados = ingerir_vendas(request.user.empresa, request.user, vendas)
+        contagem = Counter(resultado['status'] for resultado in resultados)
+        return Response({
+            'criadas': contagem[CRIADA],
+            'ja_registradas': contagem[JA_REGISTRADA],
+            'rejeitadas': contagem[REJEITADA],
+            'resultados': resultados,
+        })
+
+
+class ReservaEstoqueViewSet(EmpresaFilteredViewSet):
+    queryset = ReservaEstoque.objects.all()
+    serializer_class = ReservaEstoqueSerializer
+    planos_consulta = {
+        '*': {'select_related': ['produto']},
+    }
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def get_queryset(self):
+        return super().get_queryset().filter(expira_em__gt=timezone.now())
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            sessao_caixa = SessaoCaixa.objects.get(
+                uuid=serializer.validated_data['sessao_caixa_uuid'],
+                vendedor=request.user,
+                caixa__empresa=request.user.empresa,
+                data_fechamento__isnull=True,
+            )
+            produto = cache.produtos_por_uuid(request.user.empresa_id, [serializer.validated_data['produto_uuid']]).get(
+                str(serializer.validated_data['produto_uuid'])
+            )
+            if produto is None:
+                raise Produto.DoesNotExist
+        except (SessaoCaixa.DoesNotExist, Produto.DoesNotExist):
+            return Response({'detail': 'Sessão de caixa aberta ou produto não encontrados na sua empresa.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        reserva = reservar(sessao_caixa, produto, serializer.validated_data['quantidade'])
+        return Response(self.get_serializer(reserva).data, status=status.HTTP_201_CREATED)
+
+
+class CacheViewSet(viewsets.ViewSet):
+    # Contadores do cache de catálogo deste worker, para dimensionar PDV_CACHE_LOCAL_*
+    permission_classes = [IsAdminUser]
+
+    def list(self, request):
+        return Response(cache.estatisticas())
+
+
+class RelatorioViewSet(LeituraEmReplicaMixin, viewsets.ViewSet):
+    # Relatórios da empresa do usuário, lidos só das tabelas de resumo (vendas/relatorios.py)
+    permission_classes = [IsAdminUser]
+    acoes_em_replica = {
+        'list', 'vendas_por_dia', 'vendas_por_hora', 'vendas_por_caixa', 'vendas_por_vendedor', 'produtos_mais_vendidos',
+    }
+
+    def _consultar(self, request, consulta, *campos):
+        filtros = FiltroRelatorioSerializer(data=request.query_params)
+        filtros.is_valid(raise_exception=True)
+        filtros = filtros.validated_data
+        empresa = request.user.empresa
+        if not empresa:
+            return Response({'detail': 'Usuário sem empresa.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        argumentos = {}
+        if 'caixa' in campos and filtros.get('caixa'):
+            argumentos['caixa_id'] = Caixa.objects.filter(empresa=empresa, uuid=filtros['caixa']).values_list('pk', flat=True).first() or 0
+        if 'vendedor' in campos and filtros.get('vendedor'):
+            argumentos['vendedor_id'] = Usuario.objects.filter(empresa=empresa, uuid=filtros['vendedor']).values_list('pk', flat=True).first() or 0
+        for campo in ('limite', 'ordenar'):
+            if campo in campos:
+                argumentos[campo] = filtros[campo]
+
+        return Response({
+            'inicio': filtros['inicio'],
+            'fim': filtros['fim'],
+            'atualizado_ate': relatorios.processado_ate(empresa.pk),
+            'resultados': consulta(empresa.pk, filtros['inicio'], filtros['fim'], **argumentos),
+        })
+
+    def list(self, request):
+        return Response({
+            nome: request.build_absolute_uri(reverse(f'relatorio-{nome}'))
+            for nome in ('vendas-por-dia', 'vendas-por-hora', 'vendas-por-caixa', 'vendas-por-vendedor', 'produtos-mais-vendidos')
+        })
+
+    @action(detail=False, methods=['get'], url_path='vendas-por-dia')
+    def vendas_por_dia(self, request):
+        return self._consultar(request, relatorios.vendas_por_dia, 'caixa', 'vendedor')
+
+    @action(detail=False, methods=['get'], url_path='vendas-por-hora')
+    def vendas_por_hora(self, request):
+        return self._consultar(request, relatorios.vendas_por_hora, 'caixa', 'vendedor')
+
+    @action(detail=False, methods=['get'], url_path='vendas-por-caixa')
+    def vendas_por_caixa(self, request):
+        return self._consultar(request, relatorios.vendas_por_caixa)
+
+    @action(detail=False, methods=['get'], url_path='vendas-por-vendedor')
+    def vendas_por_vendedor(self, request):
+        return self._consultar(request, relatorios.vendas_por_vendedor)
+
+    @action(detail=False, methods=['get'], url_path='produtos-mais-vendidos')
+    def produtos_mais_vendidos(self, request):
+        return self._consultar(request, relatorios.produtos_mais_vendidos, 'limite', 'ordenar')
+
+
+class ExportacaoViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    # Exportações do histórico de vendas da empresa do usuário, geradas em segundo plano (vendas/exportacao.py)
+    queryset = Exportacao.objects.all()
+    serializer_class = ExportacaoSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+    lookup_field = 'uuid'
+
+    def get_queryset(self):
+        return super().get_queryset().filter(empresa_id=self.request.user.empresa_id)
+
+    def create(self, request, *args, **kwargs):
+        if not request.user.empresa_id:
+            return Response({'detail': 'Usuário sem empresa.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        exportacao = serializer.save(empresa_id=request.user.empresa_id, solicitado_por=request.user)
+        transaction.on_commit(lambda: agendar(executar_exportacao, exportacao.pk, chave=('exportacao', exportacao.pk)))
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'], url_path='arquivo')
+    def arquivo(self, request, uuid=None):
+        exportacao = self.get_object()
+        if exportacao.status != Exportacao.Status.CONCLUIDA:
+            return Response({'detail': 'Exportação ainda não concluída.', 'status': exportacao.status}, status=status.HTTP_409_CONFLICT)
+        caminho = Path(exportacao.arquivo)
+        if not caminho.is_file():
+            return Response({'detail': 'Arquivo da exportação não está mais disponível.'}, status=status.HTTP_410_GONE)
+        return responder_arquivo(request, caminho, f'"{exportacao.uuid.hex}"', CONTENT_TYPES[exportacao.formato])